@@ -0,0 +1,6 @@
+"""A2A通信总线的共享Agent运行时"""
+from .runtime import EXCHANGE_NAME, REPLY_ACCEPT_HEADER, REPLY_PARTIAL_HEADER, AgentRuntime
+from .transport import InMemoryBus, InMemoryTransport, RabbitMQTransport, Transport
+
+__all__ = ['EXCHANGE_NAME', 'REPLY_ACCEPT_HEADER', 'REPLY_PARTIAL_HEADER', 'AgentRuntime',
+           'Transport', 'RabbitMQTransport', 'InMemoryBus', 'InMemoryTransport']
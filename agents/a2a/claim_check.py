@@ -0,0 +1,146 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+
+BLOB_KEY = '$blob'
+
+
+def is_blob_ref(value):
+    """判断值是否为声明检查引用"""
+    return isinstance(value, dict) and BLOB_KEY in value
+
+
+class BlobStore:
+    """基于共享目录的内容寻址存储
+
+    文件名为内容的sha256，相同内容只写一次；读取通过mmap完成。写入、读取和 touch()
+    都会刷新文件时间，超过TTL未被使用的文件由 collect_garbage 删除。
+    """
+
+    def __init__(self, directory, ttl=3600):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, body):
+        """写入数据，返回内容摘要"""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            # 已存在的内容只刷新时间，延长TTL
+            os.utime(path)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            # 原子替换，读取方不会看到写了一半的文件
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def touch(self, digest):
+        """刷新文件时间，延长TTL，文件不存在时返回False"""
+        try:
+            os.utime(self.path_for(digest))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def get(self, digest):
+        """通过mmap读取数据，并刷新文件时间"""
+        path = self.path_for(digest)
+        try:
+            with open(path, 'rb') as f:
+                os.utime(f.fileno())
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b''
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except FileNotFoundError:
+            raise KeyError(f'数据 {digest} 不存在或已过期') from None
+
+    def collect_garbage(self, now=None):
+        """删除超过TTL的文件，返回删除数量"""
+        now = now if now is not None else time.time()
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if now - os.stat(path).st_mtime > self.ttl:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+
+class ClaimCheck:
+    """把消息中过大的字段放入BlobStore，只在消息中传递引用"""
+
+    def __init__(self, store, codec, threshold):
+        self.store = store
+        self.codec = codec
+        self.threshold = threshold
+
+    @classmethod
+    def from_env(cls, codec):
+        """根据环境变量创建，未配置A2A_BLOB_DIR时返回None"""
+        directory = os.environ.get('A2A_BLOB_DIR')
+        if not directory:
+            return None
+        store = BlobStore(directory, ttl=int(os.environ.get('A2A_BLOB_TTL', '3600')))
+        return cls(store, codec, int(os.environ.get('A2A_CLAIM_CHECK_THRESHOLD', '262144')))
+
+    def offload(self, data):
+        """替换data中超过阈值的顶层字段，返回 (新data, 卸载字节数)"""
+        if not isinstance(data, dict):
+            return data, 0
+        result = {}
+        offloaded = 0
+        for key, value in data.items():
+            if is_blob_ref(value) or isinstance(value, (int, float, bool)) or value is None:
+                result[key] = value
+                continue
+            if isinstance(value, str) and len(value) * 4 < self.threshold:
+                # UTF-8每个字符最多4字节，短字符串无需编码即可跳过
+                result[key] = value
+                continue
+            body, content_type = self.codec.encode_payload(value)
+            if len(body) < self.threshold:
+                result[key] = value
+                continue
+            digest = self.store.put(body)
+            result[key] = {BLOB_KEY: digest, 'content_type': content_type, 'size': len(body)}
+            offloaded += len(body)
+        return result, offloaded
+
+    def resolve(self, value):
+        """解析引用，非引用原样返回"""
+        if not is_blob_ref(value):
+            return value
+        return self.codec.decode(self.store.get(value[BLOB_KEY]), value.get('content_type'))
+
+    def touch(self, data):
+        """刷新data中所有顶层引用的TTL（消息进入延迟重试或死信队列时调用）"""
+        if not isinstance(data, dict):
+            return
+        for value in data.values():
+            if is_blob_ref(value):
+                self.store.touch(value[BLOB_KEY])
+
+    def inline(self, data):
+        """解析data中所有顶层引用"""
+        if not isinstance(data, dict):
+            return data
+        return {key: self.resolve(value) for key, value in data.items()}
@@ -0,0 +1,129 @@
+import json
+import os
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖
+    zstandard = None
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+ZSTD_ENCODING = 'zstd'
+
+
+class CodecError(ValueError):
+    """消息无法编码或解码"""
+
+
+class JsonCodec:
+    """JSON编码，兼容未设置content_type的旧版Agent和API网关"""
+    content_type = JSON_CONTENT_TYPE
+
+    def encode(self, message):
+        return json.dumps(message, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, body):
+        return json.loads(body)
+
+
+class MsgpackCodec:
+    """msgpack二进制编码"""
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def __init__(self):
+        if msgpack is None:
+            raise CodecError('未安装msgpack，无法使用msgpack编码')
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, body):
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+
+CODECS = {
+    'json': JsonCodec,
+    'msgpack': MsgpackCodec,
+}
+
+
+class MessageCodec:
+    """按AMQP content_type/content_encoding属性编解码A2A消息
+
+    发送方使用配置的编码，超过阈值的消息体再用zstd压缩；
+    接收方只看消息属性解码，因此滚动升级期间新旧Agent可以混合运行。
+    """
+
+    def __init__(self, codec='json', compress_threshold=None, compress_level=3):
+        if codec not in CODECS:
+            raise CodecError(f'未知的编码: {codec}')
+        self.codec = CODECS[codec]()
+        self.compress_threshold = compress_threshold if zstandard is not None else None
+        self.compress_level = compress_level
+        # 编解码都在事件循环线程中进行，压缩器可以复用
+        self._compressor = None
+        self._decompressor = None
+        self._decoders = {JSON_CONTENT_TYPE: JsonCodec()}
+        if msgpack is not None:
+            self._decoders[MSGPACK_CONTENT_TYPE] = MsgpackCodec()
+
+    @property
+    def content_type(self):
+        """发送消息使用的content_type"""
+        return self.codec.content_type
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建编解码器"""
+        threshold = os.environ.get('A2A_COMPRESS_THRESHOLD', '65536')
+        return cls(
+            codec=os.environ.get('A2A_CODEC', 'json'),
+            compress_threshold=int(threshold) if int(threshold) > 0 else None,
+            compress_level=int(os.environ.get('A2A_COMPRESS_LEVEL', '3'))
+        )
+
+    def encode_payload(self, value):
+        """只编码不压缩，返回 (body, content_type)"""
+        return self.codec.encode(value), self.codec.content_type
+
+    def encode(self, message):
+        """编码消息，返回 (body, content_type, content_encoding)"""
+        return self._compress(self.codec.encode(message), self.codec.content_type)
+
+    def encode_reply(self, message, accept=None):
+        """编码RPC回复，按调用方声明的content_type编码
+
+        未声明accept的调用方（如API网关）只能读取未压缩的JSON。
+        """
+        if accept is None:
+            return self._decoders[JSON_CONTENT_TYPE].encode(message), JSON_CONTENT_TYPE, None
+        codec = self._decoders.get(accept, self.codec)
+        return self._compress(codec.encode(message), codec.content_type)
+
+    def _compress(self, body, content_type):
+        if self.compress_threshold is not None and len(body) >= self.compress_threshold:
+            if self._compressor is None:
+                self._compressor = zstandard.ZstdCompressor(level=self.compress_level)
+            return self._compressor.compress(body), content_type, ZSTD_ENCODING
+        return body, content_type, None
+
+    def decode(self, body, content_type=None, content_encoding=None):
+        """根据消息属性解码消息"""
+        if content_encoding == ZSTD_ENCODING:
+            if zstandard is None:
+                raise CodecError('收到zstd压缩的消息，但未安装zstandard')
+            if self._decompressor is None:
+                self._decompressor = zstandard.ZstdDecompressor()
+            body = self._decompressor.decompress(body)
+        elif content_encoding:
+            raise CodecError(f'不支持的content_encoding: {content_encoding}')
+
+        decoder = self._decoders.get(content_type or JSON_CONTENT_TYPE)
+        if decoder is None:
+            raise CodecError(f'不支持的content_type: {content_type}')
+        return decoder.decode(body)
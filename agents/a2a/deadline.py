@@ -0,0 +1,36 @@
+"""请求的截止时间
+
+消息信封中的 deadline 为绝对时间戳（秒），由调度器按请求类型的SLA设置。AgentRuntime
+处理消息时把它放入 current_deadline，处理期间发出的消息自动带上同一截止时间；
+已过期的请求在处理前直接丢弃，处理中的外部调用用 remaining_time() 作为超时。
+"""
+import contextvars
+import time
+
+# 当前处理的消息的截止时间，None表示没有截止时间
+current_deadline = contextvars.ContextVar('a2a_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求已超过截止时间，调用方不再等待结果"""
+
+
+def is_request(message_type):
+    """只有请求会因过期被丢弃，结果和通知照常处理"""
+    return str(message_type).endswith('_request')
+
+
+def deadline_passed(deadline=None):
+    deadline = current_deadline.get() if deadline is None else deadline
+    return deadline is not None and time.time() >= deadline
+
+
+def remaining_time(default=None):
+    """距截止时间的秒数，与default取较小者；没有截止时间时返回default，已过期时抛出 DeadlineExceeded"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise DeadlineExceeded('请求已超过截止时间')
+    return remaining if default is None else min(remaining, default)
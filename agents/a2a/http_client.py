@@ -0,0 +1,178 @@
+"""对外HTTP调用（MCP注册中心、MCP工具）
+
+所有Agent共用一个 requests.Session，urllib3按目标主机维护keep-alive连接池，避免每次
+调用重新建立TCP/TLS连接。每次调用都带有连接超时和读取超时，读取超时不超过当前请求的
+剩余时间（见 a2a.deadline）。每个端点有独立的熔断器：连续失败达到阈值后熔断，熔断期间
+的调用立即抛出 CircuitOpenError，冷却后放行一个探测请求，成功则恢复。
+
+配置：A2A_HTTP_CONNECT_TIMEOUT、A2A_HTTP_READ_TIMEOUT（秒）、A2A_HTTP_POOL_SIZE（每个主机的
+连接数）、A2A_HTTP_FAILURE_THRESHOLD（连续失败次数）、A2A_HTTP_RESET_TIMEOUT（熔断冷却秒数）。
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .deadline import remaining_time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+# 熔断状态指标的取值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """端点处于熔断状态，调用未发出"""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f'{endpoint} 熔断中，{retry_after:.1f} 秒后重试')
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """单个端点的熔断器，可在多个处理线程中调用
+
+    closed 状态下连续失败 failure_threshold 次后进入 open；open 状态持续 reset_timeout 秒后
+    进入 half_open，只放行一个探测请求，探测成功回到 closed，失败重新进入 open。
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """调用前检查，返回0表示放行，否则返回距下次探测的秒数"""
+        with self.lock:
+            if self.state == CLOSED:
+                return 0
+            if self.state == OPEN:
+                wait = self.opened_at + self.reset_timeout - self.clock()
+                if wait > 0:
+                    return wait
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.probing:
+                # 探测请求尚未返回，其余调用继续快速失败
+                return self.reset_timeout
+            self.probing = True
+            return 0
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.probing = False
+
+
+def endpoint_of(url):
+    """熔断按端点（不含查询参数的URL）区分"""
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}{parts.path}'
+
+
+class HttpClient:
+    """带连接池、超时和熔断的HTTP客户端"""
+
+    def __init__(self, agent_id, connect_timeout=3, read_timeout=30, pool_size=10,
+                 failure_threshold=5, reset_timeout=30):
+        self.agent_id = agent_id
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+        self.latency = metrics.histogram('a2a_http_request_latency_seconds', 'Outbound HTTP latency per destination host',
+                                         ['agent_id', 'destination'])
+        self.outcomes = metrics.counter('a2a_http_requests_total',
+                                        'Outbound HTTP calls by outcome (ok, http_error, error, circuit_open)',
+                                        ['agent_id', 'destination', 'outcome'])
+        self.circuit_state = metrics.gauge('a2a_http_circuit_state', 'Circuit breaker state per endpoint (0 closed, 1 half open, 2 open)',
+                                           ['agent_id', 'endpoint'])
+
+    @classmethod
+    def from_env(cls, agent_id):
+        return cls(
+            agent_id,
+            connect_timeout=float(os.environ.get('A2A_HTTP_CONNECT_TIMEOUT', '3')),
+            read_timeout=float(os.environ.get('A2A_HTTP_READ_TIMEOUT', '30')),
+            pool_size=int(os.environ.get('A2A_HTTP_POOL_SIZE', '10')),
+            failure_threshold=int(os.environ.get('A2A_HTTP_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(os.environ.get('A2A_HTTP_RESET_TIMEOUT', '30'))
+        )
+
+    def breaker(self, endpoint):
+        with self.lock:
+            breaker = self.breakers.get(endpoint)
+            if breaker is None:
+                breaker = self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """发出请求并返回 requests.Response
+
+        timeout 为本次调用的读取超时上限，默认 A2A_HTTP_READ_TIMEOUT，并受请求截止时间限制。
+        5xx响应和网络错误计为端点失败；4xx说明端点可用，由调用方处理。
+        """
+        endpoint = endpoint_of(url)
+        destination = urlsplit(url).netloc
+        read_timeout = remaining_time(self.read_timeout if timeout is None else min(timeout, self.read_timeout))
+        breaker = self.breaker(endpoint)
+        wait = breaker.allow()
+        if wait:
+            self.outcomes.labels(agent_id=self.agent_id, destination=destination, outcome='circuit_open').inc()
+            raise CircuitOpenError(endpoint, wait)
+
+        started = time.time()
+        try:
+            response = self.session.request(method, url, timeout=(self.connect_timeout, read_timeout), **kwargs)
+        except Exception:
+            breaker.record_failure()
+            self.record(destination, endpoint, breaker, started, 'error')
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+            self.record(destination, endpoint, breaker, started, 'http_error')
+        else:
+            breaker.record_success()
+            self.record(destination, endpoint, breaker, started, 'ok')
+        return response
+
+    def record(self, destination, endpoint, breaker, started, outcome):
+        self.latency.labels(agent_id=self.agent_id, destination=destination).observe(time.time() - started)
+        self.outcomes.labels(agent_id=self.agent_id, destination=destination, outcome=outcome).inc()
+        self.circuit_state.labels(agent_id=self.agent_id, endpoint=endpoint).set(STATE_VALUES[breaker.state])
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
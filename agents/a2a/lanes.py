@@ -0,0 +1,74 @@
+import collections
+
+DEFAULT_LANE = 'default'
+
+
+def parse_weights(spec):
+    """解析 "interactive:4,batch:1" 形式的配置，返回有序字典 {名称: 整数值}"""
+    result = collections.OrderedDict()
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, value = item.partition(':')
+        result[name.strip()] = int(value) if value else 1
+    return result
+
+
+def parse_routes(spec):
+    """解析 "generate_content:interactive,analyze_data:batch" 形式的映射"""
+    result = {}
+    for item in (spec or '').split(','):
+        key, _, value = item.strip().partition(':')
+        if key and value:
+            result[key.strip()] = value.strip()
+    return result
+
+
+def lane_queue(agent_id, lane):
+    """通道对应的队列名，default通道即Agent的专用队列"""
+    return agent_id if lane == DEFAULT_LANE else f'{agent_id}.{lane}'
+
+
+def lane_routing_key(agent_id, lane):
+    """通道对应的路由键"""
+    return f'agent.{agent_id}' if lane in (None, DEFAULT_LANE) else f'agent.{agent_id}.{lane}'
+
+
+class WeightedLanes:
+    """按权重从多个通道的缓冲中取出待处理消息
+
+    使用平滑加权轮询：繁忙时各通道按权重比例获得处理机会，空闲通道的份额
+    让给其他通道，因此低权重通道不会饿死，高权重通道也不会被长任务堵住。
+    """
+
+    def __init__(self, weights):
+        self.weights = collections.OrderedDict(weights)
+        if DEFAULT_LANE not in self.weights:
+            self.weights[DEFAULT_LANE] = max(self.weights.values(), default=1)
+        self.buffers = {lane: collections.deque() for lane in self.weights}
+        self._current = {lane: 0 for lane in self.weights}
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self.buffers.values())
+
+    def put(self, lane, item):
+        self.buffers[lane].append(item)
+
+    def depth(self, lane):
+        return len(self.buffers[lane])
+
+    def get(self):
+        """返回 (lane, item)，所有通道为空时返回None"""
+        ready = [lane for lane, buffer in self.buffers.items() if buffer]
+        if not ready:
+            return None
+        total = 0
+        best = None
+        for lane in ready:
+            self._current[lane] += self.weights[lane]
+            total += self.weights[lane]
+            if best is None or self._current[lane] > self._current[best]:
+                best = lane
+        self._current[best] -= total
+        return best, self.buffers[best].popleft()
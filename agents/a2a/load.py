@@ -0,0 +1,34 @@
+"""Agent副本的负载信标
+
+同一Agent水平扩展为多个副本时，副本共同消费 <agent_id> 队列，发送方无法区分繁忙和空闲的副本。
+配置 A2A_LOAD_BEACON_INTERVAL 后，每个副本以 A2A_INSTANCE_ID（默认为主机名-进程号）声明专用队列
+<agent_id>.instance.<副本ID>，并按该间隔在 load.<agent_id> 路由键上发布 load_beacon 消息，
+包含处理中的消息数、本地缓冲的消息数、并发上限和近期处理耗时。发送方据此选择副本，
+把消息发到该副本的专用队列；没有可用副本时仍发往共享队列。
+副本退出后发送方在信标过期前仍会选择它，因此专用队列不随副本删除：其中超过 A2A_INSTANCE_QUEUE_TTL
+未被取走的消息（包括退出时未确认的消息）死信回共享队列，由其他副本处理；队列在无人使用
+A2A_INSTANCE_QUEUE_EXPIRES 秒后由RabbitMQ删除。
+"""
+import os
+import socket
+
+# 发往副本专用队列的消息在该消息头中携带优先级通道
+LANE_HEADER = 'x-lane'
+# 订阅所有Agent负载信标的路由键
+LOAD_BEACON_PATTERN = 'load.*'
+
+
+def default_instance_id():
+    return os.environ.get('A2A_INSTANCE_ID') or f'{socket.gethostname()}-{os.getpid()}'
+
+
+def instance_queue(agent_id, instance):
+    return f'{agent_id}.instance.{instance}'
+
+
+def instance_routing_key(agent_id, instance):
+    return f'agent.{agent_id}.instance.{instance}'
+
+
+def load_routing_key(agent_id):
+    return f'load.{agent_id}'
@@ -0,0 +1,180 @@
+"""A2A运行时的结构化日志
+
+日志记录在调用线程中只做内存操作：写入最近记录的环形缓冲，再放入有界队列，
+由后台线程格式化为JSON行并写到标准输出。队列满时丢弃记录而不是阻塞消息处理。
+带 sampled=True 的逐条消息日志按 A2A_LOG_SAMPLE_RATE 采样，WARNING及以上级别总是输出。
+进程收到 SIGUSR1 时（或调用 dump()）把环形缓冲中的记录写到标准错误。
+"""
+import atexit
+import collections
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+from . import metrics
+
+ROOT_LOGGER = 'a2a'
+# LogRecord的标准属性，其余属性（extra传入的字段）作为结构化字段输出
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sampled'}
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为一行JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """按比例采样标记为sampled的INFO及以下日志"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not getattr(record, 'sampled', False):
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class AgentFilter(logging.Filter):
+    """为记录加上agent字段"""
+
+    def __init__(self, agent_id):
+        super().__init__()
+        self.agent_id = agent_id
+
+    def filter(self, record):
+        record.agent = self.agent_id
+        return True
+
+
+class RingBufferHandler(logging.Handler):
+    """保存最近的日志记录（含未被采样输出的记录），在需要时再格式化"""
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+        self.setFormatter(JsonFormatter())
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, stream):
+        for record in list(self.records):
+            stream.write(self.format(record) + '\n')
+        stream.flush()
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录并计数，不阻塞调用线程"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = metrics.counter('a2a_log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+    def prepare(self, record):
+        # 只合并消息参数和异常文本，JSON格式化留给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+
+class StdoutHandler(logging.StreamHandler):
+    """写到当前的sys.stdout（测试框架可能替换它）"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_listener = None
+_ring = None
+
+
+def configure(stream=None, level=None, sample_rate=None, ring_size=None, queue_size=None):
+    """配置a2a日志，参数未指定时读取环境变量；可重复调用以替换之前的配置"""
+    global _listener, _ring
+    if _listener is not None:
+        _listener.stop()
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    level = level or os.environ.get('A2A_LOG_LEVEL', 'INFO')
+    sample_rate = sample_rate if sample_rate is not None else float(os.environ.get('A2A_LOG_SAMPLE_RATE', '1'))
+    ring_size = ring_size or int(os.environ.get('A2A_LOG_RING_SIZE', '1000'))
+    queue_size = queue_size or int(os.environ.get('A2A_LOG_QUEUE_SIZE', '10000'))
+
+    _ring = RingBufferHandler(ring_size)
+    queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    output = logging.StreamHandler(stream) if stream is not None else StdoutHandler()
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(queue_handler.queue, output)
+    _listener.start()
+
+    logger.addHandler(_ring)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def flush():
+    """等待队列中的记录全部写出"""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def dump(stream=None):
+    """把环形缓冲中的记录写到stream（默认标准错误）"""
+    if _ring is not None:
+        _ring.dump(stream or sys.stderr)
+
+
+def get_logger(agent_id):
+    """Agent的日志记录器，首次调用时完成配置"""
+    if _listener is None:
+        configure()
+    logger = logging.getLogger(f'{ROOT_LOGGER}.{agent_id}')
+    if not any(isinstance(f, AgentFilter) for f in logger.filters):
+        logger.addFilter(AgentFilter(agent_id))
+    return logger
+
+
+@atexit.register
+def _stop():
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,30 @@
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+
+# 按指标名缓存已创建的指标，同一进程内多次实例化Agent时复用（测试、进程内总线）
+_metrics = {}
+
+
+def _get_or_create(metric_class, name, documentation, labelnames=(), **kwargs):
+    """获取已注册的指标，不存在时创建"""
+    metric = _metrics.get(name)
+    if metric is None:
+        metric = metric_class(name, documentation, labelnames, registry=REGISTRY, **kwargs)
+        _metrics[name] = metric
+    return metric
+
+
+def counter(name, documentation, labelnames=()):
+    """获取或创建Counter指标"""
+    return _get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    """获取或创建Gauge指标"""
+    return _get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=None):
+    """获取或创建Histogram指标"""
+    if buckets is None:
+        return _get_or_create(Histogram, name, documentation, labelnames)
+    return _get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
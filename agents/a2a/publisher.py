@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import os
+import time
+
+import aio_pika
+
+from . import metrics
+
+
+class Publisher:
+    """带通道池、异步发布确认和批量发送的发布器
+
+    同一时间窗口内的发布请求合并为一批，在池中轮流选择的通道上一次性写出，
+    再并发等待broker的确认，每条消息不再单独占用一次往返。
+    确认失败的消息会重新入队，超过 max_attempts 次后把异常交给调用方。
+    """
+
+    def __init__(self, agent_id, pool_size=4, window=0.002, max_batch=100, max_attempts=3):
+        self.agent_id = agent_id
+        self.pool_size = pool_size
+        self.window = window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.exchanges = []
+        self.default_exchanges = []
+        self._cycle = None
+        self._cycle_source = None
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        self.publish_latency = metrics.histogram('a2a_publish_latency_seconds', 'Time from publish call to broker confirm', ['agent_id'])
+        self.inflight_confirms = metrics.gauge('a2a_publish_inflight_confirms', 'Published messages waiting for a broker confirm', ['agent_id'])
+        self.batch_size = metrics.histogram('a2a_publish_batch_size', 'Number of messages flushed together', ['agent_id'],
+                                            buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+        self.publish_failures = metrics.counter('a2a_publish_failures_total', 'Failed publish attempts', ['agent_id'])
+
+    @classmethod
+    def from_env(cls, agent_id):
+        """根据环境变量创建发布器"""
+        return cls(
+            agent_id,
+            pool_size=int(os.environ.get('A2A_PUBLISH_CHANNELS', '4')),
+            window=float(os.environ.get('A2A_PUBLISH_WINDOW_MS', '2')) / 1000,
+            max_batch=int(os.environ.get('A2A_PUBLISH_MAX_BATCH', '100'))
+        )
+
+    async def start(self, connection, exchange_name, exchange_type=aio_pika.ExchangeType.TOPIC):
+        """打开开启发布确认的通道池"""
+        exchanges = []
+        default_exchanges = []
+        for _ in range(self.pool_size):
+            channel = await connection.channel(publisher_confirms=True)
+            exchanges.append(await channel.declare_exchange(exchange_name, exchange_type))
+            default_exchanges.append(channel.default_exchange)
+        self.default_exchanges = default_exchanges
+        self.exchanges = exchanges
+
+    def publish(self, message, routing_key, direct=False):
+        """加入待发送批次，返回在broker确认后完成的future（需在事件循环线程调用）
+
+        direct为True时经默认交换机直接投递到名为routing_key的队列（用于RPC回复）。
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue((message, routing_key, direct, future, time.monotonic(), 1))
+        return future
+
+    def _enqueue(self, item):
+        self._pending.append(item)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._cycle_source is not self.exchanges:
+            self._cycle = itertools.cycle(range(len(self.exchanges)))
+            self._cycle_source = self.exchanges
+        task = asyncio.ensure_future(self._send_batch(next(self._cycle), batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    async def _send_batch(self, index, batch):
+        exchange = self.exchanges[index]
+        default_exchange = self.default_exchanges[index] if self.default_exchanges else exchange
+        self.batch_size.labels(agent_id=self.agent_id).observe(len(batch))
+        inflight = self.inflight_confirms.labels(agent_id=self.agent_id)
+        inflight.inc(len(batch))
+        try:
+            results = await asyncio.gather(
+                *((default_exchange if direct else exchange).publish(message, routing_key=routing_key)
+                  for message, routing_key, direct, _, _, _ in batch),
+                return_exceptions=True
+            )
+        finally:
+            inflight.dec(len(batch))
+
+        for (message, routing_key, direct, future, enqueued_at, attempt), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                self.publish_failures.labels(agent_id=self.agent_id).inc()
+                if attempt < self.max_attempts:
+                    self._enqueue((message, routing_key, direct, future, enqueued_at, attempt + 1))
+                else:
+                    future.set_exception(result)
+                continue
+            self.publish_latency.labels(agent_id=self.agent_id).observe(time.monotonic() - enqueued_at)
+            future.set_result(result)
@@ -0,0 +1,92 @@
+import os
+import time
+
+import aio_pika
+
+from .transport import DEFAULT_EXCHANGE
+
+ATTEMPT_HEADER = 'x-attempt'
+ERROR_HEADER = 'x-last-error'
+ORIGINAL_ROUTING_KEY_HEADER = 'x-original-routing-key'
+FAILED_AGENT_HEADER = 'x-failed-agent'
+FAILED_AT_HEADER = 'x-failed-at'
+
+
+class PermanentError(Exception):
+    """重试也无法成功的错误，消息直接进入死信队列"""
+
+
+def dlq_name(agent_id):
+    """Agent的死信队列名"""
+    return f'{agent_id}.dlq'
+
+
+def retry_queue_name(delay):
+    """延迟重试队列名，按延迟秒数区分，不同配置的Agent可以共存"""
+    return f'a2a_retry.{delay:g}s'
+
+
+class RetryPolicy:
+    """失败消息的延迟重试与死信处理
+
+    每个延迟级别对应一个延迟队列（RabbitMQ中为fanout交换机加带TTL的队列），消息到期后
+    以原路由键回到a2a_bus，从而回到原来的队列（包括优先级通道）。失败次数记录在
+    x-attempt消息头中，超过 max_attempts 或遇到 PermanentError 时进入 <agent_id>.dlq。
+    """
+
+    def __init__(self, delays=(1, 5, 25, 125), max_attempts=None):
+        self.delays = tuple(delays)
+        self.max_attempts = max_attempts if max_attempts is not None else len(self.delays) + 1
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建重试策略"""
+        delays = [float(d) for d in os.environ.get('A2A_RETRY_DELAYS', '1,5,25,125').split(',') if d.strip()]
+        max_attempts = os.environ.get('A2A_MAX_ATTEMPTS')
+        return cls(delays, int(max_attempts) if max_attempts else None)
+
+    async def declare(self, transport, agent_id, exchange_name):
+        """声明延迟重试队列和本Agent的死信队列，到期的消息死信回exchange_name"""
+        for delay in self.delays:
+            await transport.declare_delay_queue(retry_queue_name(delay), delay, exchange_name)
+        await transport.declare_queue(dlq_name(agent_id), durable=True)
+
+    def attempts(self, incoming):
+        """消息已失败的次数"""
+        return int((incoming.headers or {}).get(ATTEMPT_HEADER, 0))
+
+    def delay_for(self, attempt):
+        """第attempt次失败后的重试延迟"""
+        return self.delays[min(attempt - 1, len(self.delays) - 1)]
+
+    def copy(self, incoming, headers):
+        """复制原消息的内容和属性，合并新的消息头"""
+        return aio_pika.Message(
+            body=incoming.body,
+            content_type=incoming.content_type,
+            content_encoding=incoming.content_encoding,
+            headers={**(incoming.headers or {}), **headers},
+            correlation_id=incoming.correlation_id,
+            reply_to=incoming.reply_to,
+            message_id=incoming.message_id,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+        )
+
+    async def handle_failure(self, transport, incoming, error, agent_id):
+        """把失败的消息送去延迟重试或死信队列，返回 'retry' 或 'dead_letter'
+
+        调用方在本方法返回（副本已被broker确认）后再确认原消息。
+        """
+        attempt = self.attempts(incoming) + 1
+        headers = {ATTEMPT_HEADER: attempt, ERROR_HEADER: f'{type(error).__name__}: {error}'[:500]}
+        if isinstance(error, PermanentError) or not self.delays or attempt >= self.max_attempts:
+            headers.update({
+                ORIGINAL_ROUTING_KEY_HEADER: incoming.routing_key,
+                FAILED_AGENT_HEADER: agent_id,
+                FAILED_AT_HEADER: time.time()
+            })
+            await transport.publish(self.copy(incoming, headers), dlq_name(agent_id), exchange=DEFAULT_EXCHANGE)
+            return 'dead_letter'
+        await transport.publish(self.copy(incoming, headers), incoming.routing_key,
+                                exchange=retry_queue_name(self.delay_for(attempt)))
+        return 'retry'
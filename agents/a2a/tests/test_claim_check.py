@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from a2a.claim_check import BLOB_KEY, BlobStore, ClaimCheck, is_blob_ref
+from a2a.codec import MessageCodec
+
+
+class TestClaimCheck(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = BlobStore(self.directory, ttl=60)
+        self.claim_check = ClaimCheck(self.store, MessageCodec('msgpack'), threshold=1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store_is_content_addressed(self):
+        digest = self.store.put(b'hello')
+        self.assertEqual(self.store.put(b'hello'), digest)
+        self.assertEqual(self.store.get(digest), b'hello')
+        with self.assertRaises(KeyError):
+            self.store.get('0' * 64)
+
+    def test_offload_large_fields_only(self):
+        dataset = [{'date': '2023-01-01', 'value': i} for i in range(500)]
+        data = {'request_id': 'req-1', 'dataset': dataset, 'analysis_type': 'summary_statistics'}
+
+        offloaded, size = self.claim_check.offload(data)
+
+        self.assertGreater(size, 1024)
+        self.assertEqual(offloaded['request_id'], 'req-1')
+        self.assertEqual(offloaded['analysis_type'], 'summary_statistics')
+        self.assertTrue(is_blob_ref(offloaded['dataset']))
+        self.assertEqual(self.claim_check.resolve(offloaded['dataset']), dataset)
+        self.assertEqual(self.claim_check.inline(offloaded), data)
+
+    def test_refs_pass_through_unchanged(self):
+        # 调度器转发引用时不会重新读取或写入数据
+        ref = {BLOB_KEY: 'a' * 64, 'content_type': 'application/msgpack', 'size': 10}
+        offloaded, size = self.claim_check.offload({'dataset': ref})
+        self.assertEqual(offloaded['dataset'], ref)
+        self.assertEqual(size, 0)
+
+    def test_garbage_collection_by_ttl(self):
+        old = self.store.put(b'old')
+        new = self.store.put(b'new')
+        past = time.time() - 120
+        os.utime(self.store.path_for(old), (past, past))
+
+        self.assertEqual(self.store.collect_garbage(), 1)
+        self.assertEqual(self.store.get(new), b'new')
+        with self.assertRaises(KeyError):
+            self.store.get(old)
+
+    def test_read_and_touch_refresh_ttl(self):
+        read = self.store.put(b'read')
+        touched = self.store.put(b'touched')
+        past = time.time() - 120
+        for digest in (read, touched):
+            os.utime(self.store.path_for(digest), (past, past))
+
+        self.store.get(read)
+        self.claim_check.touch({'dataset': {BLOB_KEY: touched}, 'request_id': 'req-1'})
+
+        # 读取或被重试的消息引用的数据不会被当作过期清理
+        self.assertEqual(self.store.collect_garbage(), 0)
+        self.assertFalse(self.store.touch('0' * 64))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import unittest
+
+from a2a.codec import (CodecError, JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE, ZSTD_ENCODING,
+                       MessageCodec)
+
+
+def make_message(rows=10):
+    return {
+        'source': 'core_scheduler',
+        'target': 'data_analysis_agent',
+        'type': 'data_analysis_request',
+        'data': {
+            'request_id': 'req-1',
+            'user_id': 'user-1',
+            'analysis_type': 'summary_statistics',
+            'dataset': [{'date': f'2023-01-{i % 28 + 1:02d}', 'value': i * 1.5, '平台': '知乎'} for i in range(rows)]
+        },
+        'timestamp': 1700000000.0
+    }
+
+
+class TestMessageCodec(unittest.TestCase):
+    def test_json_roundtrip(self):
+        codec = MessageCodec('json')
+        body, content_type, content_encoding = codec.encode(make_message())
+        self.assertEqual(content_type, JSON_CONTENT_TYPE)
+        self.assertIsNone(content_encoding)
+        self.assertEqual(codec.decode(body, content_type, content_encoding), make_message())
+
+    def test_msgpack_roundtrip(self):
+        codec = MessageCodec('msgpack')
+        body, content_type, content_encoding = codec.encode(make_message())
+        self.assertEqual(content_type, MSGPACK_CONTENT_TYPE)
+        self.assertEqual(codec.decode(body, content_type, content_encoding), make_message())
+
+    def test_compression_above_threshold(self):
+        codec = MessageCodec('msgpack', compress_threshold=1024)
+        small = codec.encode(make_message(rows=2))
+        large = codec.encode(make_message(rows=2000))
+        self.assertIsNone(small[2])
+        self.assertEqual(large[2], ZSTD_ENCODING)
+        self.assertEqual(codec.decode(*large), make_message(rows=2000))
+
+    def test_decodes_by_properties_not_own_setting(self):
+        # 滚动升级期间：json发送方与msgpack接收方可以互通
+        sender = MessageCodec('msgpack', compress_threshold=1024)
+        receiver = MessageCodec('json')
+        self.assertEqual(receiver.decode(*sender.encode(make_message(rows=2000))), make_message(rows=2000))
+
+    def test_legacy_message_without_content_type(self):
+        # API网关发送的消息没有设置content_type
+        body = json.dumps(make_message()).encode('utf-8')
+        self.assertEqual(MessageCodec('msgpack').decode(body, None, None), make_message())
+
+    def test_unknown_content_type(self):
+        with self.assertRaises(CodecError):
+            MessageCodec().decode(b'', 'application/xml', None)
+        with self.assertRaises(CodecError):
+            MessageCodec('yaml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from a2a.deadline import DeadlineExceeded, current_deadline, deadline_passed, is_request, remaining_time
+from a2a.runtime import AgentRuntime
+from a2a.transport import InMemoryBus, InMemoryTransport
+
+
+class EchoAgent(AgentRuntime):
+    """按请求休眠后回复，处理中检查截止时间"""
+
+    def __init__(self, transport):
+        super().__init__('deadline_echo_agent', transport)
+        self.handled = []
+
+    def handle_message(self, message):
+        data = message['data']
+        self.handled.append(data['n'])
+        if data.get('forward'):
+            self.send_message('deadline_caller', 'note', {'n': data['n']})
+        time.sleep(data.get('sleep', 0))
+        remaining_time()
+        self.reply(message, 'echo_result', {'n': data['n']})
+
+
+class Caller(AgentRuntime):
+    def __init__(self, transport):
+        super().__init__('deadline_caller', transport)
+        self.received = asyncio.Queue()
+
+    async def handle_message(self, message):
+        self.received.put_nowait(message)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, dict(agent_id='deadline_echo_agent', **labels)) or 0
+
+
+class TestDeadlineHelpers(unittest.TestCase):
+    def test_remaining_time(self):
+        self.assertEqual(remaining_time(5), 5)
+        self.assertFalse(deadline_passed())
+        token = current_deadline.set(time.time() + 1)
+        try:
+            self.assertLessEqual(remaining_time(5), 1)
+            self.assertEqual(remaining_time(0.5), 0.5)
+        finally:
+            current_deadline.reset(token)
+        token = current_deadline.set(time.time() - 1)
+        try:
+            self.assertTrue(deadline_passed())
+            with self.assertRaises(DeadlineExceeded):
+                remaining_time()
+        finally:
+            current_deadline.reset(token)
+        self.assertTrue(is_request('content_gen_request'))
+        self.assertFalse(is_request('content_gen_result'))
+
+
+class TestExpiredRequests(unittest.TestCase):
+    def test_expired_requests_are_dropped(self):
+        bus = InMemoryBus()
+        with patch.dict(os.environ, {'A2A_CONCURRENCY': '1'}):
+            worker = EchoAgent(InMemoryTransport(bus))
+        caller = Caller(InMemoryTransport(bus))
+        queued_before = sample('a2a_expired_requests_total', message_type='echo_request', stage='queued')
+        in_flight_before = sample('a2a_expired_requests_total', message_type='echo_request', stage='in_flight')
+        avoided_before = sample('a2a_avoided_work_seconds_total', message_type='echo_request')
+
+        async def run():
+            await worker.startup()
+            await caller.startup()
+            try:
+                deadline = time.time() + 5
+                await caller.publish('deadline_echo_agent', 'echo_request', {'n': 0, 'forward': True, 'sleep': 0.05},
+                                     deadline=deadline)
+                note = await asyncio.wait_for(caller.received.get(), 5)
+                result = await asyncio.wait_for(caller.received.get(), 5)
+                # 处理期间发出的消息带上同一截止时间
+                self.assertEqual((note['type'], note['deadline']), ('note', deadline))
+                self.assertEqual(result['type'], 'echo_result')
+
+                # 第一个请求处理中过期，第二个请求在队列中等待时过期
+                short = time.time() + 0.1
+                await caller.publish('deadline_echo_agent', 'echo_request', {'n': 1, 'sleep': 0.2}, deadline=short)
+                await caller.publish('deadline_echo_agent', 'echo_request', {'n': 2}, deadline=short)
+                replies = [await asyncio.wait_for(caller.received.get(), 5) for _ in range(2)]
+                self.assertTrue(all(reply['type'] == 'error' and reply['data']['expired'] for reply in replies))
+            finally:
+                await caller.close()
+                await worker.close()
+
+        asyncio.run(run())
+        self.assertEqual(worker.handled, [0, 1])
+        self.assertEqual(sample('a2a_expired_requests_total', message_type='echo_request', stage='queued') - queued_before, 1)
+        self.assertEqual(sample('a2a_expired_requests_total', message_type='echo_request', stage='in_flight') - in_flight_before, 1)
+        self.assertGreater(sample('a2a_avoided_work_seconds_total', message_type='echo_request') - avoided_before, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
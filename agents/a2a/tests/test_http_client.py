@@ -0,0 +1,115 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from a2a.deadline import DeadlineExceeded, current_deadline
+from a2a.http_client import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, HttpClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class ToolHandler(BaseHTTPRequestHandler):
+    """/ok 正常返回，/slow 超过读取超时，/fail 返回500；记录每个请求使用的连接"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        self.server.hits.append(self.path)
+        if self.path == '/slow':
+            time.sleep(0.5)
+        status = 500 if self.path == '/fail' and self.server.failing else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_half_open_close(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        self.assertEqual(breaker.allow(), 0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.allow(), 10)
+
+        # 冷却后只放行一个探测请求
+        clock.now = 10
+        self.assertEqual(breaker.allow(), 0)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertGreater(breaker.allow(), 0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+
+        clock.now = 20
+        self.assertEqual(breaker.allow(), 0)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.allow(), 0)
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ToolHandler)
+        self.server.connections = set()
+        self.server.hits = []
+        self.server.failing = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.client = HttpClient('http_test_agent', connect_timeout=1, read_timeout=0.2, failure_threshold=2, reset_timeout=0.1)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(f'{self.base}/ok').json(), {'ok': True})
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_timeouts(self):
+        with self.assertRaises(requests.Timeout):
+            self.client.get(f'{self.base}/slow')
+        # 调用方的超时和请求截止时间都会缩短读取超时
+        token = current_deadline.set(time.time() - 1)
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                self.client.get(f'{self.base}/ok')
+        finally:
+            current_deadline.reset(token)
+        self.assertEqual(self.client.get(f'{self.base}/ok', timeout=1).status_code, 200)
+
+    def test_failing_endpoint_fails_fast(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(f'{self.base}/fail').status_code, 500)
+        with self.assertRaises(CircuitOpenError):
+            self.client.get(f'{self.base}/fail')
+        self.assertEqual(self.server.hits.count('/fail'), 2)
+        # 其他端点不受影响
+        self.assertEqual(self.client.get(f'{self.base}/ok').status_code, 200)
+
+        # 冷却后的探测请求成功，熔断恢复
+        self.server.failing = False
+        time.sleep(0.15)
+        self.assertEqual(self.client.get(f'{self.base}/fail').status_code, 200)
+        self.assertEqual(self.client.breaker(f'{self.base}/fail').state, CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
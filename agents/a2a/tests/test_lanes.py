@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import unittest
+
+from a2a.lanes import DEFAULT_LANE, WeightedLanes, lane_routing_key, parse_routes, parse_weights
+from a2a.runtime import AgentRuntime
+from a2a.transport import InMemoryBus, InMemoryTransport
+from tests.test_runtime import FakeIncomingMessage, make_message
+
+
+class RecordingAgent(AgentRuntime):
+    def __init__(self):
+        super().__init__('recording_agent', InMemoryTransport(InMemoryBus()))
+        self.order = []
+
+    async def handle_message(self, message):
+        self.order.append(message['type'])
+        await asyncio.sleep(0.001)
+
+
+class TestWeightedLanes(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(list(parse_weights('interactive:4, batch:1').items()), [('interactive', 4), ('batch', 1)])
+        self.assertEqual(parse_routes('generate_content:interactive,analyze_data:batch'),
+                         {'generate_content': 'interactive', 'analyze_data': 'batch'})
+        self.assertEqual(lane_routing_key('content_gen_agent', 'batch'), 'agent.content_gen_agent.batch')
+        self.assertEqual(lane_routing_key('content_gen_agent', DEFAULT_LANE), 'agent.content_gen_agent')
+
+    def test_weighted_share_when_all_busy(self):
+        lanes = WeightedLanes({'interactive': 4, 'batch': 1, DEFAULT_LANE: 1})
+        for i in range(100):
+            lanes.put('interactive', i)
+            lanes.put('batch', i)
+        picked = [lanes.get()[0] for _ in range(50)]
+        self.assertEqual(picked.count('interactive'), 40)
+        self.assertEqual(picked.count('batch'), 10)
+
+    def test_idle_lane_share_is_reused(self):
+        lanes = WeightedLanes({'interactive': 4, 'batch': 1})
+        for i in range(5):
+            lanes.put('batch', i)
+        self.assertEqual([lanes.get() for _ in range(5)], [('batch', i) for i in range(5)])
+        self.assertIsNone(lanes.get())
+
+
+class TestLaneDraining(unittest.TestCase):
+    def test_interactive_not_stuck_behind_batch_flood(self):
+        agent = RecordingAgent()
+        agent.concurrency = 1
+
+        async def run():
+            agent.loop = asyncio.get_running_loop()
+            agent._loop_thread = threading.current_thread()
+            agent._semaphore = asyncio.Semaphore(1)
+            agent._lanes_ready = asyncio.Event()
+            for _ in range(30):
+                await agent.buffer_message('batch', FakeIncomingMessage(make_message('batch_job')))
+            for _ in range(3):
+                await agent.buffer_message('interactive', FakeIncomingMessage(make_message('interactive_job')))
+            drain = asyncio.ensure_future(agent.drain_lanes())
+            while len(agent.order) < 33:
+                await asyncio.sleep(0.01)
+            drain.cancel()
+
+        asyncio.run(run())
+
+        # 3个交互请求在前5个处理的消息之内完成，而不是排在30个批处理任务之后
+        self.assertEqual(agent.order[:5].count('interactive_job'), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+import unittest
+
+from a2a import log
+
+
+class TestStructuredLogging(unittest.TestCase):
+    def setUp(self):
+        self.output = io.StringIO()
+        log.configure(stream=self.output, sample_rate=0, ring_size=3)
+        self.logger = log.get_logger('test_agent')
+
+    def tearDown(self):
+        log.configure()
+
+    def records(self):
+        log.flush()
+        return [json.loads(line) for line in self.output.getvalue().splitlines()]
+
+    def test_json_fields(self):
+        self.logger.warning('发送失败: %s', 'timeout', extra={'request_id': 'req-1', 'message_type': 'content_gen_request'})
+
+        record, = self.records()
+        self.assertEqual(record['msg'], '发送失败: timeout')
+        self.assertEqual(record['level'], 'WARNING')
+        self.assertEqual(record['agent'], 'test_agent')
+        self.assertEqual(record['request_id'], 'req-1')
+        self.assertEqual(record['message_type'], 'content_gen_request')
+        self.assertNotIn('sampled', record)
+
+    def test_sampling_keeps_errors(self):
+        for n in range(10):
+            self.logger.info('接收消息', extra={'request_id': f'req-{n}', 'sampled': True})
+        self.logger.info('已启动')
+        try:
+            raise ValueError('坏数据')
+        except ValueError:
+            self.logger.error('处理消息时出错', exc_info=True, extra={'sampled': True})
+
+        records = self.records()
+        self.assertEqual([r['msg'] for r in records], ['已启动', '处理消息时出错'])
+        self.assertIn('ValueError: 坏数据', records[1]['exc'])
+
+    def test_ring_buffer_keeps_unsampled_records(self):
+        for n in range(5):
+            self.logger.info('接收消息', extra={'request_id': f'req-{n}', 'sampled': True})
+        dumped = io.StringIO()
+
+        log.dump(dumped)
+
+        self.assertEqual([json.loads(line)['request_id'] for line in dumped.getvalue().splitlines()],
+                         ['req-2', 'req-3', 'req-4'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        log.configure(stream=self.output, queue_size=1)
+        log._listener.stop()
+        logger = logging.getLogger('a2a.test_agent')
+        for n in range(5):
+            logger.warning('积压 %d', n)
+        log._listener.start()
+
+        self.assertEqual(len(self.records()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
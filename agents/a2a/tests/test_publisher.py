@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+from a2a.publisher import Publisher
+
+
+class FakeExchange:
+    """记录每次事件循环迭代中收到的发布"""
+
+    def __init__(self, failures=0):
+        self.published = []
+        self.failures = failures
+
+    async def publish(self, message, routing_key):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError('channel closed')
+        self.published.append((message, routing_key))
+        await asyncio.sleep(0.01)
+        return 'ack'
+
+
+class TestPublisher(unittest.TestCase):
+    def test_coalesces_within_window(self):
+        exchanges = [FakeExchange(), FakeExchange()]
+        publisher = Publisher('test_agent', pool_size=2, window=0.01, max_batch=100)
+        publisher.exchanges = exchanges
+
+        async def run():
+            futures = [publisher.publish(f'm{i}', 'agent.x') for i in range(50)]
+            return await asyncio.gather(*futures)
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, ['ack'] * 50)
+        # 同一时间窗口内的消息在同一个通道上一次写出
+        self.assertEqual(len(exchanges[0].published), 50)
+        self.assertEqual(len(exchanges[1].published), 0)
+
+    def test_max_batch_flushes_across_channels(self):
+        exchanges = [FakeExchange(), FakeExchange()]
+        publisher = Publisher('test_agent', pool_size=2, window=1, max_batch=10)
+        publisher.exchanges = exchanges
+
+        async def run():
+            return await asyncio.wait_for(asyncio.gather(*(publisher.publish(i, 'agent.x') for i in range(20))), 0.5)
+
+        asyncio.run(run())
+
+        self.assertEqual(len(exchanges[0].published), 10)
+        self.assertEqual(len(exchanges[1].published), 10)
+
+    def test_retries_failed_confirms(self):
+        exchange = FakeExchange(failures=2)
+        publisher = Publisher('test_agent', pool_size=1, window=0.001, max_attempts=3)
+        publisher.exchanges = [exchange]
+
+        async def run():
+            return await publisher.publish('m', 'agent.x')
+
+        self.assertEqual(asyncio.run(run()), 'ack')
+        self.assertEqual(len(exchange.published), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        publisher = Publisher('test_agent', pool_size=1, window=0.001, max_attempts=2)
+        publisher.exchanges = [FakeExchange(failures=5)]
+
+        async def run():
+            return await publisher.publish('m', 'agent.x')
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock
+
+from a2a.claim_check import BLOB_KEY, BlobStore, ClaimCheck
+from a2a.retry import ATTEMPT_HEADER, ORIGINAL_ROUTING_KEY_HEADER, RetryPolicy
+from a2a.runtime import EXCHANGE_NAME
+from tests.test_runtime import FakeIncomingMessage, SlowAgent, deliver, make_message
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_delay_grows_and_caps(self):
+        policy = RetryPolicy(delays=(1, 5, 25))
+        self.assertEqual([policy.delay_for(n) for n in range(1, 6)], [1, 5, 25, 25, 25])
+        self.assertEqual(policy.max_attempts, 4)
+
+
+class TestFailurePipeline(unittest.TestCase):
+    def setUp(self):
+        self.agent = SlowAgent()
+        self.agent.retry_policy = RetryPolicy(delays=(0.01, 0.05), max_attempts=3)
+        self.bus = self.agent.transport.bus
+        # 接收重试后回到a2a_bus的消息
+        self.returned = self.bus.queue('returned')
+        self.bus.bind('returned', 'agent.slow_agent.#')
+
+    def run_messages(self, incoming, wait=0, check=None):
+        async def run():
+            # startup() 声明延迟重试队列和死信队列
+            await self.agent.startup()
+            try:
+                await deliver(self.agent, incoming)
+                if check is not None:
+                    await check()
+                await asyncio.sleep(wait)
+            finally:
+                await self.agent.close()
+        asyncio.run(run())
+
+    def dead_letters(self):
+        return self.bus.queues['slow_agent.dlq'].messages
+
+    def test_failed_message_returns_after_delay(self):
+        incoming = FakeIncomingMessage(make_message('fail'), routing_key='agent.slow_agent.batch')
+
+        self.run_messages([incoming], wait=0.03)
+
+        # 原消息已确认，延迟后副本以原路由键回到总线
+        self.assertTrue(incoming.acked)
+        self.assertFalse(incoming.nacked)
+        message, routing_key, exchange = self.returned.messages[0]
+        self.assertEqual((routing_key, exchange), ('agent.slow_agent.batch', EXCHANGE_NAME))
+        self.assertEqual(message.headers[ATTEMPT_HEADER], 1)
+        self.assertEqual(message.body, incoming.body)
+
+    def test_backoff_uses_attempt_header(self):
+        incoming = FakeIncomingMessage(make_message('fail'), headers={ATTEMPT_HEADER: 1})
+
+        async def not_yet_returned():
+            # 第二次失败使用0.05秒的延迟，0.03秒时尚未回到总线
+            await asyncio.sleep(0.03)
+            self.assertEqual(len(self.returned.messages), 0)
+
+        self.run_messages([incoming], wait=0.05, check=not_yet_returned)
+
+        self.assertEqual(self.returned.messages[0][0].headers[ATTEMPT_HEADER], 2)
+
+    def test_exhausted_message_goes_to_dlq(self):
+        incoming = FakeIncomingMessage(make_message('fail'), headers={ATTEMPT_HEADER: 2})
+
+        self.run_messages([incoming])
+
+        self.assertTrue(incoming.acked)
+        message, routing_key, _ = self.dead_letters()[0]
+        self.assertEqual(routing_key, 'slow_agent.dlq')
+        self.assertEqual(message.headers[ORIGINAL_ROUTING_KEY_HEADER], 'agent.slow_agent')
+        self.assertIn('ValueError', message.headers['x-last-error'])
+
+    def test_undecodable_message_skips_retries(self):
+        incoming = FakeIncomingMessage(make_message('work'))
+        incoming.body = b'not json'
+
+        self.run_messages([incoming], wait=0.03)
+
+        self.assertEqual(len(self.dead_letters()), 1)
+        self.assertEqual(len(self.returned.messages), 0)
+
+    def test_failure_refreshes_referenced_blobs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = BlobStore(directory, ttl=60)
+        self.agent.claim_check = ClaimCheck(store, self.agent.codec, threshold=1024)
+        digest = store.put(b'dataset')
+        past = time.time() - 120
+        os.utime(store.path_for(digest), (past, past))
+        message = make_message('fail')
+        message['data']['dataset'] = {BLOB_KEY: digest}
+
+        self.run_messages([FakeIncomingMessage(message)])
+
+        # 进入延迟重试的消息引用的数据刷新了保留时间
+        self.assertEqual(store.collect_garbage(), 0)
+
+    def test_broker_failure_falls_back_to_requeue(self):
+        self.agent.transport.publish = AsyncMock(side_effect=ConnectionError('broker不可用'))
+        incoming = FakeIncomingMessage(make_message('fail'))
+
+        self.run_messages([incoming])
+
+        self.assertFalse(incoming.acked)
+        self.assertTrue(incoming.nacked)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from a2a.codec import JSON_CONTENT_TYPE
+from a2a.lanes import DEFAULT_LANE
+from a2a.runtime import REPLY_ACCEPT_HEADER, REPLY_PARTIAL_HEADER, AgentRuntime
+from a2a.transport import InMemoryBus, InMemoryTransport
+
+
+class FakeIncomingMessage:
+    """模拟aio-pika的IncomingMessage"""
+
+    def __init__(self, message, reply_to=None, correlation_id=None, headers=None, routing_key='agent.slow_agent'):
+        self.body = json.dumps(message).encode('utf-8')
+        self.routing_key = routing_key
+        self.message_id = None
+        self.content_type = None
+        self.content_encoding = None
+        self.reply_to = reply_to
+        self.correlation_id = correlation_id
+        self.headers = headers
+        self.acked = False
+        self.nacked = False
+
+    async def ack(self):
+        self.acked = True
+
+    async def nack(self, requeue=True):
+        self.nacked = True
+
+
+class SlowAgent(AgentRuntime):
+    def __init__(self, transport=None):
+        super().__init__('slow_agent', transport or InMemoryTransport(InMemoryBus()))
+        self.threads = set()
+        self.handled = []
+
+    def handle_message(self, message):
+        if message['type'] == 'fail':
+            raise ValueError('处理失败')
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.2)
+        self.send_message('core_scheduler', 'done', {'n': message['data']['n']})
+        self.handled.append(message['data']['n'])
+
+
+class PongAgent(AgentRuntime):
+    """回复ping请求的Agent"""
+
+    def __init__(self, transport):
+        super().__init__('pong_agent', transport)
+        self.requests = []
+
+    async def handle_message(self, message):
+        self.requests.append(message)
+        for n in range(message['data'].get('partials', 0)):
+            await self.publish_reply(message['reply_info'], 'pong_partial', {'n': n}, partial=True)
+        await self.reply(message, 'pong', {})
+
+
+def make_message(message_type, n=0):
+    return {'source': 'test', 'target': 'slow_agent', 'type': message_type, 'data': {'n': n}, 'timestamp': time.time()}
+
+
+async def deliver(agent, incoming, lane=DEFAULT_LANE):
+    """像消费回调一样把消息放入通道缓冲，由 drain_lanes 处理，等待全部确认或退回"""
+    for message in incoming:
+        await agent.buffer_message(lane, message)
+    while not all(message.acked or message.nacked for message in incoming):
+        await asyncio.sleep(0.01)
+
+
+class TestAgentRuntime(unittest.TestCase):
+    def run_messages(self, agent, incoming):
+        sink = agent.transport.bus.queue('sink')
+        agent.transport.bus.bind('sink', 'agent.core_scheduler')
+
+        async def run():
+            await agent.startup()
+            try:
+                await deliver(agent, incoming)
+            finally:
+                await agent.close()
+        asyncio.run(run())
+        return sink
+
+    def test_blocking_handlers_run_concurrently(self):
+        agent = SlowAgent()
+        incoming = [FakeIncomingMessage(make_message('work', n)) for n in range(8)]
+
+        start = time.time()
+        sink = self.run_messages(agent, incoming)
+        elapsed = time.time() - start
+
+        # 8个0.2秒的阻塞任务并发执行，总耗时远小于串行的1.6秒
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(sorted(agent.handled), list(range(8)))
+        self.assertTrue(all(m.acked for m in incoming))
+        self.assertNotIn(threading.main_thread().name, agent.threads)
+        self.assertEqual(len(sink.messages), 8)
+
+    def test_concurrency_limit(self):
+        agent = SlowAgent()
+        agent.concurrency = 2
+        incoming = [FakeIncomingMessage(make_message('work', n)) for n in range(4)]
+
+        start = time.time()
+        self.run_messages(agent, incoming)
+
+        # 并发度为2时4个任务至少需要两轮
+        self.assertGreaterEqual(time.time() - start, 0.4)
+
+
+class TestRpc(unittest.TestCase):
+    def setUp(self):
+        self.bus = InMemoryBus()
+        self.agent = SlowAgent(InMemoryTransport(self.bus))
+        self.pong = PongAgent(InMemoryTransport(self.bus))
+
+    def run_agents(self, coro_factory):
+        async def run():
+            await self.pong.startup()
+            await self.agent.startup()
+            try:
+                return await coro_factory()
+            finally:
+                await self.agent.close()
+                await self.pong.close()
+        return asyncio.run(run())
+
+    def test_call_waits_for_correlated_reply(self):
+        reply = self.run_agents(lambda: self.agent.call('pong_agent', 'ping', {}, timeout=1))
+
+        self.assertEqual(reply['type'], 'pong')
+        reply_info = self.pong.requests[0]['reply_info']
+        self.assertEqual(reply_info['reply_to'], self.agent.callback_queue)
+        self.assertEqual(reply_info['accept'], self.agent.codec.content_type)
+        self.assertEqual(self.agent._pending_replies, {})
+
+    def test_call_times_out(self):
+        async def calls():
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.agent.call('silent_agent', 'ping', {}, timeout=0.05)
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.agent.call('silent_agent', 'ping', {}, deadline=time.time() - 1)
+
+        self.run_agents(calls)
+        self.assertEqual(self.agent._pending_replies, {})
+
+    def test_partial_replies_before_final_reply(self):
+        partials = []
+
+        async def on_partial(message):
+            partials.append(message['data']['n'])
+
+        async def calls():
+            first = await self.agent.call('pong_agent', 'ping', {'partials': 2}, timeout=1, on_partial=on_partial)
+            # 没有on_partial时中间回复被忽略，调用仍等待最终回复
+            second = await self.agent.call('pong_agent', 'ping', {'partials': 1}, timeout=1)
+            return first, second
+
+        first, second = self.run_agents(calls)
+        self.assertEqual((first['type'], second['type']), ('pong', 'pong'))
+        self.assertEqual(partials, [0, 1])
+        self.assertEqual(self.agent._partial_handlers, {})
+
+    def test_reply_goes_directly_to_caller(self):
+        gateway = self.bus.queue('gateway-queue')
+        message = make_message('work')
+        message['reply_info'] = {'reply_to': 'gateway-queue', 'correlation_id': 'req-1', 'accept': None}
+
+        async def reply():
+            await self.agent.reply(message, 'data_analysis_result', {'request_id': 'req-1'})
+
+        self.run_agents(reply)
+
+        published, routing_key, _ = gateway.messages[0]
+        self.assertEqual(routing_key, 'gateway-queue')
+        self.assertEqual(published.correlation_id, 'req-1')
+        # 未声明accept的调用方收到未压缩的JSON
+        self.assertEqual(published.content_type, JSON_CONTENT_TYPE)
+        self.assertEqual(json.loads(published.body)['type'], 'data_analysis_result')
+        self.assertNotIn(REPLY_ACCEPT_HEADER, published.headers or {})
+        self.assertNotIn(REPLY_PARTIAL_HEADER, published.headers or {})
+
+
+if __name__ == '__main__':
+    unittest.main()
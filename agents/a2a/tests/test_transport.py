@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+import aio_pika
+
+from a2a.transport import DEFAULT_EXCHANGE, InMemoryBus, InMemoryTransport, topic_matches
+
+
+class TestTopicMatching(unittest.TestCase):
+    def test_wildcards(self):
+        self.assertTrue(topic_matches('agent.content_gen_agent', 'agent.content_gen_agent'))
+        self.assertFalse(topic_matches('agent.content_gen_agent', 'agent.content_gen_agent.batch'))
+        self.assertTrue(topic_matches('agent.*.batch', 'agent.content_gen_agent.batch'))
+        self.assertTrue(topic_matches('agent.#', 'agent'))
+        self.assertTrue(topic_matches('agent.#', 'agent.content_gen_agent.batch'))
+        self.assertFalse(topic_matches('agent.*', 'agent'))
+
+
+class TestInMemoryTransport(unittest.TestCase):
+    def test_routing_and_prefetch(self):
+        bus = InMemoryBus()
+        transport = InMemoryTransport(bus)
+        received = []
+        held = []
+
+        async def hold(incoming):
+            # 不确认，占用预取额度
+            received.append(incoming.body)
+            held.append(incoming)
+
+        async def run():
+            await transport.connect(2)
+            queue = await transport.declare_queue('worker')
+            await transport.bind(queue, 'agent.worker')
+            await transport.consume(queue, hold)
+            for n in range(5):
+                await transport.publish(aio_pika.Message(body=str(n).encode()), 'agent.worker')
+            await transport.publish(aio_pika.Message(body=b'x'), 'agent.nobody')
+            await asyncio.sleep(0)
+            self.assertEqual(received, [b'0', b'1'])
+            self.assertEqual(await transport.queue_depth(queue), 3)
+            await held[0].ack()
+            await asyncio.sleep(0)
+            self.assertEqual(received, [b'0', b'1', b'2'])
+            # 关闭时未确认的消息退回队列
+            await transport.close()
+            self.assertEqual(await transport.queue_depth(queue), 4)
+
+        asyncio.run(run())
+        self.assertEqual(bus.unroutable, 1)
+
+    def test_default_exchange_targets_queue_by_name(self):
+        bus = InMemoryBus()
+        transport = InMemoryTransport(bus)
+
+        async def run():
+            await transport.declare_queue('amq.gen-reply')
+            await transport.publish(aio_pika.Message(body=b'r'), 'amq.gen-reply', exchange=DEFAULT_EXCHANGE)
+            return await transport.queue_depth('amq.gen-reply')
+
+        self.assertEqual(asyncio.run(run()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
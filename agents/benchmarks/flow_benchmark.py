@@ -0,0 +1,113 @@
+"""调度流程端到端基准（进程内总线，无需RabbitMQ）
+
+模拟API网关向核心调度Agent发送数据分析请求，经数据分析Agent处理后结果回到网关，
+统计吞吐量和端到端延迟分位数。
+
+    cd agents
+    python -m benchmarks.flow_benchmark --requests 2000 --rows 50
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import random
+import sys
+import time
+
+import aio_pika
+
+from a2a import log
+from a2a.transport import InMemoryBus, InMemoryTransport
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_agent_module(name):
+    """按路径加载Agent的main.py（各Agent的模块同名），Agent目录加入模块搜索路径"""
+    directory = os.path.join(AGENTS_DIR, name)
+    if directory not in sys.path:
+        sys.path.append(directory)
+    spec = importlib.util.spec_from_file_location(f'{name}_main', os.path.join(directory, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def user_request(n, rows):
+    rng = random.Random(n)
+    return {
+        'source': 'api_gateway',
+        'target': 'core_scheduler',
+        'type': 'user_request',
+        'data': {
+            'id': f'bench-{n}',
+            'type': 'analyze_data',
+            'analysis_type': 'summary_statistics',
+            'dataset': [{'views': rng.randint(100, 100000), 'likes': rng.randint(0, 5000)} for _ in range(rows)]
+        },
+        'timestamp': time.time()
+    }
+
+
+async def run(requests, rows):
+    # 基准中不启动指标服务器，也不访问MCP注册中心
+    os.environ['METRICS_PORT'] = '0'
+    os.environ['MCP_REGISTRY_URL'] = 'http://127.0.0.1:9'
+    # 任务状态写入内存SQLite，包含批量写入的开销但不落盘
+    os.environ.setdefault('TASK_STORE_URL', 'sqlite:///:memory:')
+    # 基准只有一个用户，放开准入限制以测量流程本身的吞吐量
+    os.environ.setdefault('ADMISSION_TIERS', f'free:{requests}:{requests}')
+    os.environ.setdefault('ADMISSION_MAX_QUEUE', str(requests))
+    # 每条消息的INFO日志会占用大量时间并淹没输出，默认只输出警告，可用 A2A_LOG_LEVEL 覆盖
+    log.configure(level=os.environ.get('A2A_LOG_LEVEL', 'WARNING'))
+    scheduler_main = load_agent_module('core_scheduler')
+    analysis_main = load_agent_module('data_analysis')
+    scheduler_main.start_http_server = analysis_main.start_http_server = lambda port: None
+
+    bus = InMemoryBus()
+    scheduler = scheduler_main.CoreSchedulerAgent(InMemoryTransport(bus))
+    analysis = analysis_main.DataAnalysisAgent(InMemoryTransport(bus))
+    await scheduler.startup()
+    await analysis.startup()
+
+    gateway = InMemoryTransport(bus)
+    await gateway.connect(None)
+    queue = await gateway.declare_queue('api_gateway_responses')
+    await gateway.bind(queue, 'agent.api_gateway')
+    sent_at = {}
+    latencies = []
+    done = asyncio.Event()
+
+    async def on_result(incoming):
+        await incoming.ack()
+        message = scheduler.codec.decode(incoming.body, incoming.content_type, incoming.content_encoding)
+        latencies.append(time.perf_counter() - sent_at[message['data']['request_id']])
+        if len(latencies) == requests:
+            done.set()
+
+    await gateway.consume(queue, on_result)
+
+    start = time.perf_counter()
+    for n in range(requests):
+        body, content_type, content_encoding = scheduler.codec.encode(user_request(n, rows))
+        sent_at[f'bench-{n}'] = time.perf_counter()
+        await gateway.publish(aio_pika.Message(body=body, content_type=content_type, content_encoding=content_encoding),
+                              'agent.core_scheduler')
+    await done.wait()
+    elapsed = time.perf_counter() - start
+
+    await analysis.close()
+    await scheduler.close()
+
+    latencies.sort()
+    print(f"{requests} 个请求，{elapsed:.2f} 秒，吞吐量 {requests / elapsed:.0f} req/s")
+    for p in (50, 90, 99):
+        print(f"p{p}: {latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='进程内调度流程基准')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.rows))
@@ -0,0 +1,71 @@
+"""OpenAI请求的对冲（hedging）
+
+OpenAI的延迟有长尾，少数卡住的请求决定了p99。启用后，请求超过同类请求近期延迟的指定
+百分位仍未返回时，再发出一个相同的请求，取先完成的结果并取消另一个。额外请求受预算限制：
+每个请求积累 budget 个额度（最多 burst 个），发出一个对冲请求消耗1个，因此对冲请求数
+不超过请求数的 budget 比例。流式请求已开始返回内容，不做对冲。
+延迟样本只取主请求的完成时间：对冲请求胜出时的耗时比主请求短，计入后百分位会随对冲
+增多而下降，对冲进一步增多。
+"""
+import collections
+import math
+
+from a2a import metrics
+
+
+class HedgePolicy:
+    """只在事件循环中使用"""
+
+    def __init__(self, percentile=95, budget=0.05, window=200, min_samples=20, burst=10):
+        self.percentile = percentile
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.burst = burst
+        self.latencies = {}
+        self.credits = 0.0
+        self.decisions = metrics.counter('content_gen_llm_hedge_decisions_total',
+                                         'Eligible OpenAI requests by hedging decision (not_needed, sent, no_budget, no_capacity)',
+                                         ['decision'])
+        self.wins = metrics.counter('content_gen_llm_hedge_wins_total', 'Hedged OpenAI requests by which attempt finished first',
+                                    ['winner'])
+
+    @classmethod
+    def from_env(cls, environ):
+        """LLM_HEDGE_PERCENTILE 为0（默认）时返回None（不对冲）"""
+        percentile = float(environ.get('LLM_HEDGE_PERCENTILE', '0'))
+        if percentile <= 0:
+            return None
+        return cls(
+            percentile,
+            budget=float(environ.get('LLM_HEDGE_BUDGET', '5')) / 100,
+            min_samples=int(environ.get('LLM_HEDGE_MIN_SAMPLES', '20'))
+        )
+
+    def record(self, kind, latency):
+        samples = self.latencies.get(kind)
+        if samples is None:
+            samples = self.latencies[kind] = collections.deque(maxlen=self.window)
+        samples.append(latency)
+
+    def accrue(self):
+        """每个可对冲的请求积累 budget 个额度"""
+        self.credits = min(self.credits + self.budget, float(self.burst))
+
+    def delay(self, kind):
+        """发出对冲请求前等待的秒数，样本不足时返回None"""
+        samples = self.latencies.get(kind)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[max(math.ceil(self.percentile / 100 * len(ordered)) - 1, 0)]
+
+    def take_credit(self):
+        if self.credits < 1:
+            return False
+        self.credits -= 1
+        return True
+
+    def refund(self):
+        """取得额度后没有发出对冲请求时退还"""
+        self.credits = min(self.credits + 1, float(self.burst))
@@ -0,0 +1,385 @@
+"""OpenAI Chat Completions 的异步客户端
+
+所有处理线程的生成请求都在Agent的事件循环中通过同一个 aiohttp 连接池发出，并共享以下限制：
+- 并发上限按AIMD调整：收到429时减半（每秒最多一次），每次成功增加 1/当前上限，最高为
+  LLM_MAX_CONCURRENCY
+- 每分钟请求数和token数的令牌桶（LLM_RPM、LLM_TPM）。发出前按提示长度加预期输出估算token，
+  完成后按返回的 usage 修正；未配置时采用响应头 x-ratelimit-limit-* 中账户的限额
+- 响应头 x-ratelimit-remaining-* 修正剩余额度，额度在 x-ratelimit-reset-* 之后恢复
+收到429时按 retry-after 等待后重试，等待、排队和请求都不超过请求的截止时间。
+传入 on_delta 时以流式方式请求，每收到一段内容就调用（并等待）它，最后返回完整内容。
+配置 hedge（见 hedging）时，非流式请求超过同类请求近期延迟的百分位后发出对冲请求。
+"""
+import asyncio
+import contextvars
+import json
+import re
+import time
+
+import aiohttp
+
+from a2a import metrics
+from a2a.deadline import DeadlineExceeded
+from hedging import HedgePolicy
+
+# x-ratelimit-reset-* 的格式，如 1s、6m0s、20ms
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+# 调用方设置后，chat() 把每次请求的token用量累加到其中的 tokens（如统计一篇文章的总用量）
+token_usage = contextvars.ContextVar('llm_token_usage', default=None)
+
+
+class LLMError(Exception):
+    """OpenAI返回错误或限流重试次数已用完"""
+
+
+def parse_duration(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def estimate_tokens(messages):
+    """按字符数估算提示的token数（中文约一字一token，偏高估计）"""
+    return sum(len(message['content']) for message in messages) + 4 * len(messages)
+
+
+class AdaptiveConcurrency:
+    """AIMD并发上限，只在事件循环中使用"""
+
+    def __init__(self, maximum, minimum=1, initial=None, decrease=0.5, cooldown=1.0, clock=time.monotonic):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(initial or maximum)
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.clock = clock
+        self.inflight = 0
+        self.decreased_at = None
+        self.condition = None
+
+    async def acquire(self):
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+
+    def try_acquire(self):
+        """不等待，有空闲名额时占用并返回True"""
+        if self.inflight >= int(self.limit):
+            return False
+        self.inflight += 1
+        return True
+
+    async def release(self):
+        async with self.condition:
+            self.inflight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        # 同一批并发请求的429只减一次
+        now = self.clock()
+        if self.decreased_at is not None and now - self.decreased_at < self.cooldown:
+            return
+        self.decreased_at = now
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+
+
+class MinuteBudget:
+    """每分钟限额的令牌桶，per_minute为0时等到响应头给出账户限额后才限制"""
+
+    def __init__(self, per_minute=0, clock=time.monotonic):
+        self.capacity = per_minute
+        self.configured = per_minute > 0
+        self.available = float(per_minute)
+        self.clock = clock
+        self.updated = clock()
+        # 响应头给出的限额恢复时间
+        self.full_at = None
+
+    def refill(self):
+        now = self.clock()
+        if self.full_at is not None and now >= self.full_at:
+            self.available = float(self.capacity)
+            self.full_at = None
+        elif self.capacity:
+            self.available = min(float(self.capacity), self.available + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+        return now
+
+    def wait_time(self, amount):
+        """可以取出amount前需要等待的秒数"""
+        now = self.refill()
+        if not self.capacity:
+            return 0
+        # 单个请求超过整个限额时按限额计算，避免永远等待
+        missing = min(amount, self.capacity) - self.available
+        if missing <= 0:
+            return 0
+        wait = missing * 60 / self.capacity
+        if self.full_at is not None:
+            wait = min(wait, self.full_at - now)
+        return max(wait, 0)
+
+    def take(self, amount):
+        self.refill()
+        self.available -= amount
+
+    def sync(self, limit, remaining, reset):
+        """按响应头修正：未配置限额时采用账户限额，剩余额度以服务端为准"""
+        now = self.refill()
+        if not self.configured and limit:
+            if not self.capacity:
+                self.available = float(limit)
+            self.capacity = limit
+        if remaining is not None and self.capacity:
+            self.available = min(self.available, remaining)
+            if reset is not None:
+                self.full_at = now + reset
+
+
+class LLMClient:
+    def __init__(self, api_key, api_base='https://api.openai.com/v1', max_concurrency=8, initial_concurrency=None,
+                 rpm=0, tpm=0, completion_tokens=1000, pool_size=None, max_retries=3, request_timeout=120,
+                 hedge=None, clock=time.monotonic):
+        self.api_key = api_key
+        self.url = api_base.rstrip('/') + '/chat/completions'
+        self.concurrency = AdaptiveConcurrency(max_concurrency, initial=initial_concurrency, clock=clock)
+        self.requests = MinuteBudget(rpm, clock)
+        self.tokens = MinuteBudget(tpm, clock)
+        self.completion_tokens = completion_tokens
+        self.pool_size = pool_size or max_concurrency
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.hedge = hedge
+        self.session = None
+
+        self.throttled = metrics.counter('content_gen_llm_throttled_total', 'OpenAI responses with status 429')
+        self.limit_gauge = metrics.gauge('content_gen_llm_concurrency_limit', 'Current adaptive OpenAI concurrency limit')
+        self.inflight = metrics.gauge('content_gen_llm_inflight', 'OpenAI requests in flight')
+        self.queue_wait = metrics.histogram('content_gen_llm_queue_seconds', 'Time spent waiting for rate budget and a concurrency slot',
+                                            buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60))
+        self.token_counter = metrics.counter('content_gen_llm_tokens_total', 'Tokens used by OpenAI requests')
+        self.limit_gauge.set(self.concurrency.limit)
+
+    @classmethod
+    def from_env(cls, api_key, environ):
+        max_concurrency = int(environ.get('LLM_MAX_CONCURRENCY', '8'))
+        return cls(
+            api_key,
+            api_base=environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1'),
+            max_concurrency=max_concurrency,
+            initial_concurrency=int(environ.get('LLM_INITIAL_CONCURRENCY', str(max_concurrency))),
+            rpm=int(environ.get('LLM_RPM', '0')),
+            tpm=int(environ.get('LLM_TPM', '0')),
+            completion_tokens=int(environ.get('LLM_EXPECTED_COMPLETION_TOKENS', '1000')),
+            max_retries=int(environ.get('LLM_MAX_RETRIES', '3')),
+            request_timeout=float(environ.get('LLM_REQUEST_TIMEOUT', '120')),
+            hedge=HedgePolicy.from_env(environ)
+        )
+
+    def time_left(self, deadline):
+        if deadline is None:
+            return None
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise DeadlineExceeded('请求已超过截止时间')
+        return remaining
+
+    async def wait_for_budget(self, tokens, deadline):
+        while True:
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait <= 0:
+                return
+            remaining = self.time_left(deadline)
+            if remaining is not None and wait >= remaining:
+                raise DeadlineExceeded('等待OpenAI限额时超过截止时间')
+            await asyncio.sleep(wait)
+
+    async def chat(self, model, messages, deadline=None, on_delta=None, usage=None, kind=None):
+        """返回生成的内容，deadline为绝对时间戳，on_delta为接收流式内容的协程函数，usage为累加token用量的字典
+
+        kind 为请求的类别（如格式和长度），对冲按同类请求的延迟计算等待时间
+        """
+        estimate = estimate_tokens(messages) + self.completion_tokens
+        payload = {'model': model, 'messages': messages}
+        if on_delta is not None:
+            payload['stream'] = True
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            await self.wait_for_budget(estimate, deadline)
+            # 检查和扣减之间没有await，并发的请求不会同时通过检查
+            self.requests.take(1)
+            self.tokens.take(estimate)
+            try:
+                timeout = self.time_left(deadline)
+                try:
+                    await asyncio.wait_for(self.concurrency.acquire(), timeout)
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded('等待OpenAI并发名额时超过截止时间') from None
+            except BaseException:
+                # 请求没有发出（超时或被取消），退还扣减的限额
+                self.requests.take(-1)
+                self.tokens.take(-estimate)
+                raise
+            self.queue_wait.observe(time.monotonic() - started)
+            self.inflight.inc()
+            try:
+                if self.hedge is not None and on_delta is None:
+                    status, headers, body = await self.hedged_post(payload, deadline, kind, estimate)
+                else:
+                    status, headers, body = await self.post(payload, deadline, on_delta)
+            finally:
+                self.inflight.dec()
+                await self.concurrency.release()
+            self.sync_headers(headers)
+
+            if status == 429:
+                # 被拒绝的请求不消耗token
+                self.tokens.take(-estimate)
+                error = (body or {}).get('error') or {}
+                if error.get('code') == 'insufficient_quota':
+                    raise LLMError(f"OpenAI额度不足: {error.get('message')}")
+                self.throttled.inc()
+                self.concurrency.on_throttle()
+                self.limit_gauge.set(self.concurrency.limit)
+                delay = parse_duration(headers.get('retry-after-ms'))
+                delay = delay / 1000 if delay is not None else parse_duration(headers.get('retry-after'))
+                delay = delay if delay is not None else 2 ** attempt
+                remaining = self.time_left(deadline)
+                if remaining is not None and delay >= remaining:
+                    raise DeadlineExceeded('OpenAI限流，重试前超过截止时间')
+                await asyncio.sleep(delay)
+                continue
+            if status >= 400:
+                error = (body or {}).get('error') or {}
+                raise LLMError(f"OpenAI返回 {status}: {error.get('message', body)}")
+
+            self.concurrency.on_success()
+            self.limit_gauge.set(self.concurrency.limit)
+            content = body['choices'][0]['message']['content']
+            used = (body.get('usage') or {}).get('total_tokens')
+            if used is None:
+                # 流式响应不返回用量，按字符数估算
+                used = estimate_tokens(messages) + len(content)
+            self.tokens.take(used - estimate)
+            self.token_counter.inc(used)
+            if usage is not None:
+                usage['tokens'] = usage.get('tokens', 0) + used
+            return content
+        raise LLMError(f'OpenAI持续限流，已重试 {self.max_retries} 次')
+
+    async def hedged_post(self, payload, deadline, kind, estimate):
+        """超过同类请求延迟的百分位仍未返回时发出相同的请求，返回先成功完成的结果"""
+        self.hedge.accrue()
+        delay = self.hedge.delay(kind)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self.post(payload, deadline))
+        attempts = {primary: 'primary'}
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if not done:
+                if self.start_hedge(estimate):
+                    attempts[asyncio.ensure_future(self.post(payload, deadline))] = 'hedge'
+            elif delay is not None:
+                self.hedge.decisions.labels(decision='not_needed').inc()
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # 失败或5xx时等待另一个请求，都失败时以最后完成的为准
+                    if pending and (task.exception() is not None or task.result()[0] >= 500):
+                        continue
+                    status, headers, body = task.result()
+                    if attempts[task] == 'primary' and status == 200:
+                        # 只记录主请求的延迟，对冲请求胜出时主请求的延迟未知
+                        self.hedge.record(kind, time.monotonic() - started)
+                    if len(attempts) > 1:
+                        self.hedge.wins.labels(winner=attempts[task]).inc()
+                    return status, headers, body
+        finally:
+            for task in attempts:
+                task.cancel()
+            if len(attempts) > 1:
+                await self.concurrency.release()
+
+    def start_hedge(self, estimate):
+        """对冲请求也占用并发名额和每分钟限额，不足时不发出"""
+        if not self.hedge.take_credit():
+            self.hedge.decisions.labels(decision='no_budget').inc()
+            return False
+        if self.requests.wait_time(1) > 0 or self.tokens.wait_time(estimate) > 0 or not self.concurrency.try_acquire():
+            self.hedge.refund()
+            self.hedge.decisions.labels(decision='no_capacity').inc()
+            return False
+        self.requests.take(1)
+        self.tokens.take(estimate)
+        self.hedge.decisions.labels(decision='sent').inc()
+        return True
+
+    async def post(self, payload, deadline, on_delta=None):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        remaining = self.time_left(deadline)
+        timeout = self.request_timeout if remaining is None else min(remaining, self.request_timeout)
+        try:
+            async with self.session.post(self.url, json=payload, headers={'Authorization': f'Bearer {self.api_key}'},
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if on_delta is not None and response.status == 200:
+                    return response.status, response.headers, await self.read_stream(response, on_delta)
+                text = await response.text()
+                try:
+                    body = json.loads(text)
+                except ValueError:
+                    body = {'error': {'message': text[:200]}}
+                return response.status, response.headers, body
+        except asyncio.TimeoutError:
+            if deadline is not None and time.time() >= deadline:
+                raise DeadlineExceeded('OpenAI请求超过截止时间') from None
+            raise LLMError(f'OpenAI请求超时（{timeout:.0f}秒）') from None
+
+    async def read_stream(self, response, on_delta):
+        """读取 server-sent events 格式的流式响应，拼接为与普通响应相同的结构"""
+        parts = []
+        async for line in response.content:
+            line = line.decode('utf-8').strip()
+            if not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            choices = json.loads(data).get('choices') or [{}]
+            delta = (choices[0].get('delta') or {}).get('content')
+            if delta:
+                parts.append(delta)
+                await on_delta(delta)
+        return {'choices': [{'message': {'content': ''.join(parts)}}]}
+
+    def sync_headers(self, headers):
+        def number(name):
+            value = headers.get(name)
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+
+        for budget, kind in ((self.requests, 'requests'), (self.tokens, 'tokens')):
+            budget.sync(number(f'x-ratelimit-limit-{kind}'), number(f'x-ratelimit-remaining-{kind}'),
+                        parse_duration(headers.get(f'x-ratelimit-reset-{kind}')))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
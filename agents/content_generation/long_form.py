@@ -0,0 +1,85 @@
+"""长文的分段生成
+
+一次生成1500-2000字的文章耗时长，且完全串行。分段模式先生成结构化大纲（JSON），再按大纲
+并发生成各部分正文以及引言和结尾；每个部分的提示都包含完整大纲和前后部分的小标题，使各部分
+衔接自然、不重复。最后按大纲顺序拼接。大纲无法解析时由调用方退回一次生成。
+"""
+import json
+import re
+
+# 从 1500-2000 中取上限
+WORD_COUNT = re.compile(r'(\d+)\s*$')
+
+
+def outline_prompt(topic, word_count, sections, extra=''):
+    return (
+        f"为一篇关于{topic}、约{word_count}字的文章拟定大纲，分为{sections}个部分，每部分给出小标题和2-3个要点。"
+        '只返回JSON，格式为 {"title": "文章标题", "sections": [{"heading": "小标题", "points": ["要点"]}]}。'
+        f"{extra}"
+    )
+
+
+def parse_outline(text, topic):
+    """返回 {'title', 'sections'}，内容不是有效的大纲时返回None"""
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        return None
+    try:
+        outline = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(outline, dict) or not isinstance(outline.get('sections'), list):
+        return None
+    sections = []
+    for section in outline['sections']:
+        if isinstance(section, dict) and section.get('heading'):
+            points = section.get('points') if isinstance(section.get('points'), list) else []
+            sections.append({'heading': str(section['heading']), 'points': [str(point) for point in points]})
+    if len(sections) < 2:
+        return None
+    return {'title': str(outline.get('title') or topic), 'sections': sections}
+
+
+def render_outline(outline):
+    return '\n'.join(f"{index + 1}. {section['heading']}：{'；'.join(section['points'])}"
+                     for index, section in enumerate(outline['sections']))
+
+
+def section_words(word_count, sections):
+    """各部分的字数，按总字数上限平分"""
+    match = WORD_COUNT.search(word_count)
+    total = int(match.group(1)) if match else 1000
+    return max(total // sections, 100)
+
+
+def section_prompt(outline, index, words, extra=''):
+    sections = outline['sections']
+    section = sections[index]
+    context = f"你正在撰写文章《{outline['title']}》，全文大纲如下：\n{render_outline(outline)}\n\n"
+    prompt = f"{context}请撰写第{index + 1}部分“{section['heading']}”的正文，约{words}字"
+    if section['points']:
+        prompt += f"，围绕要点：{'；'.join(section['points'])}"
+    prompt += '。'
+    if index > 0:
+        prompt += f"开头自然承接上一部分“{sections[index - 1]['heading']}”。"
+    if index < len(sections) - 1:
+        prompt += f"结尾为下一部分“{sections[index + 1]['heading']}”做铺垫。"
+    return prompt + f"只写本部分正文，不要写小标题、引言或总结。{extra}"
+
+
+def intro_prompt(outline, extra=''):
+    return (f"为文章《{outline['title']}》写一段100字左右的引言，文章大纲如下：\n{render_outline(outline)}\n\n"
+            f"只返回引言正文。{extra}")
+
+
+def conclusion_prompt(outline, extra=''):
+    return (f"为文章《{outline['title']}》写一段100字左右的结尾，总结全文并呼应开头，文章大纲如下：\n"
+            f"{render_outline(outline)}\n\n只返回结尾正文。{extra}")
+
+
+def stitch(outline, intro, bodies, conclusion):
+    parts = [f"# {outline['title']}", intro.strip()]
+    for section, body in zip(outline['sections'], bodies):
+        parts.append(f"## {section['heading']}\n\n{body.strip()}")
+    parts.append(conclusion.strip())
+    return '\n\n'.join(part for part in parts if part)
@@ -0,0 +1,149 @@
+"""OpenAI回复的缓存
+
+内容日历中的重复主题、重试和重复提交会以相同的模型和提示再次调用OpenAI。缓存以
+（模型, 系统提示, 用户提示）规范化后的哈希为键，最近使用的条目保存在内存LRU中，所有条目
+写入SQLite文件，进程重启后仍可命中。条目超过ttl秒后失效，文件超过max_bytes时删除最久未
+使用的条目。
+"""
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from a2a import metrics
+
+
+def cache_key(model, system_prompt, user_prompt):
+    """合并连续空白后计算哈希，提示中的排版差异不影响命中"""
+    normalized = [model] + [' '.join(str(text).split()) for text in (system_prompt, user_prompt)]
+    encoded = json.dumps(normalized, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """内存LRU加SQLite文件的两级缓存，可在多个处理线程中调用"""
+
+    def __init__(self, path, memory_entries=256, ttl=604800, max_bytes=256 * 1024 * 1024, clock=time.time):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.memory = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache ('
+            ' key TEXT PRIMARY KEY, content TEXT NOT NULL, latency REAL NOT NULL,'
+            ' size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self.disk_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM llm_cache').fetchone()[0]
+
+        self.lookups = metrics.counter('content_gen_cache_requests_total', 'Response cache lookups by format and result',
+                                       ['format_type', 'result'])
+        self.saved = metrics.counter('content_gen_cache_saved_seconds_total', 'OpenAI latency avoided by cache hits', ['format_type'])
+        self.evictions = metrics.counter('content_gen_cache_evictions_total', 'Cache entries removed from disk by reason', ['reason'])
+        self.disk_size = metrics.gauge('content_gen_cache_disk_bytes', 'Size of cached responses on disk')
+        self.disk_size.set(self.disk_bytes)
+
+    @classmethod
+    def from_env(cls, environ):
+        """LLM_CACHE_PATH 为 none 时返回None（不缓存）"""
+        path = environ.get('LLM_CACHE_PATH', 'llm_cache.db')
+        if path.lower() == 'none':
+            return None
+        return cls(
+            path,
+            memory_entries=int(environ.get('LLM_CACHE_MEMORY_ENTRIES', '256')),
+            ttl=float(environ.get('LLM_CACHE_TTL', '604800')),
+            max_bytes=int(float(environ.get('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024)
+        )
+
+    def get(self, key, format_type):
+        """返回缓存的内容，未命中或已过期时返回None"""
+        now = self.clock()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry['created_at'] < self.ttl:
+                # 内存命中不写文件，淘汰时按内存中的访问时间排序
+                entry['accessed_at'] = now
+                self.memory.move_to_end(key)
+                return self.hit(entry, format_type, 'memory')
+            row = self.connection.execute('SELECT content, latency, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[2] < self.ttl:
+                self.connection.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+                self.connection.commit()
+                entry = {'content': row[0], 'latency': row[1], 'created_at': row[2], 'accessed_at': now}
+                self.remember(key, entry)
+                return self.hit(entry, format_type, 'disk')
+            if row is not None:
+                self.delete(key, 'expired')
+            self.memory.pop(key, None)
+        self.lookups.labels(format_type=format_type, result='miss').inc()
+        return None
+
+    def put(self, key, content, latency):
+        """保存OpenAI的回复，latency为这次调用的耗时，命中时计入节省的时间"""
+        now = self.clock()
+        entry = {'content': content, 'latency': latency, 'created_at': now, 'accessed_at': now}
+        size = len(content.encode('utf-8'))
+        with self.lock:
+            self.remember(key, entry)
+            previous = self.connection.execute('SELECT size FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, content, latency, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, content, latency, size, now, now)
+            )
+            self.disk_bytes += size - (previous[0] if previous else 0)
+            self.evict()
+            self.connection.commit()
+            self.disk_size.set(self.disk_bytes)
+
+    def hit(self, entry, format_type, tier):
+        self.lookups.labels(format_type=format_type, result=f'hit_{tier}').inc()
+        self.saved.labels(format_type=format_type).inc(entry['latency'])
+        return entry['content']
+
+    def remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def delete(self, key, reason):
+        row = self.connection.execute('SELECT size FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.connection.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            self.connection.commit()
+            self.disk_bytes -= row[0]
+            self.evictions.labels(reason=reason).inc()
+            self.disk_size.set(self.disk_bytes)
+
+    def evict(self):
+        """文件超过上限时删除过期和最久未使用的条目"""
+        if self.disk_bytes <= self.max_bytes:
+            return
+        expired_before = self.clock() - self.ttl
+        rows = self.connection.execute('SELECT key, size, created_at, accessed_at FROM llm_cache').fetchall()
+        rows.sort(key=lambda row: self.memory[row[0]]['accessed_at'] if row[0] in self.memory else row[3])
+        removed = collections.Counter()
+        for key, size, created_at, _ in rows:
+            if created_at <= expired_before:
+                reason = 'expired'
+            elif self.disk_bytes > self.max_bytes:
+                reason = 'size'
+            else:
+                continue
+            self.connection.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            self.memory.pop(key, None)
+            self.disk_bytes -= size
+            removed[reason] += 1
+        for reason, count in removed.items():
+            self.evictions.labels(reason=reason).inc(count)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
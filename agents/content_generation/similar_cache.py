@@ -0,0 +1,145 @@
+"""相近主题的生成结果复用
+
+内容日历中的主题经常只是措辞不同（“AI产品经理技能”和“AI产品经理必备技能”），按完整提示
+计算的缓存键无法命中。这里对主题按字符n-gram计算MinHash签名，用LSH分段索引找出候选，
+再以n-gram集合的Jaccard相似度确认，达到该格式的阈值时返回已生成的内容。全部在本地计算，
+不依赖向量服务。只有除主题外提示完全相同（模型、系统提示、长度和额外要求一致）的条目
+互相匹配，索引最多保留 max_entries 条，超过时删除最久未使用的条目。
+"""
+import collections
+import hashlib
+import random
+import re
+import threading
+
+from a2a import metrics
+
+# 签名中的哈希取值上限（梅森素数）
+PRIME = (1 << 61) - 1
+# 比较主题时忽略空白和标点
+IGNORED = re.compile(r'[\s\W_]+', re.UNICODE)
+
+
+def parse_thresholds(value):
+    """summary:0.6,social_media:0.7 -> {'summary': 0.6, 'social_media': 0.7}"""
+    thresholds = {}
+    for item in value.split(','):
+        if item.strip():
+            format_type, threshold = item.rsplit(':', 1)
+            thresholds[format_type.strip()] = float(threshold)
+    return thresholds
+
+
+def shingles(text, ngram):
+    normalized = IGNORED.sub('', text.lower())
+    if len(normalized) <= ngram:
+        return {normalized} if normalized else set()
+    return {normalized[n:n + ngram] for n in range(len(normalized) - ngram + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_perm)]
+
+    def signature(self, grams):
+        hashes = [int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'big') for gram in grams]
+        return [min((a * value + b) % PRIME for value in hashes) for a, b in self.permutations]
+
+
+class SimilarCache:
+    """可在多个处理线程中调用"""
+
+    def __init__(self, thresholds, max_entries=5000, ngram=2, num_perm=64, bands=32):
+        if num_perm % bands:
+            raise ValueError('num_perm 必须是 bands 的整数倍')
+        self.thresholds = thresholds
+        self.max_entries = max_entries
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.entries = collections.OrderedDict()
+        self.buckets = collections.defaultdict(set)
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+        self.lookups = metrics.counter('content_gen_similar_cache_requests_total', 'Near-duplicate cache lookups by format and result',
+                                       ['format_type', 'result'])
+        self.similarity = metrics.histogram('content_gen_similar_cache_similarity', 'Best topic similarity found per lookup',
+                                            ['format_type'], buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+        self.size = metrics.gauge('content_gen_similar_cache_entries', 'Generations held in the near-duplicate index')
+        self.evictions = metrics.counter('content_gen_similar_cache_evictions_total', 'Generations evicted from the near-duplicate index')
+
+    @classmethod
+    def from_env(cls, environ):
+        """SIMILAR_CACHE_THRESHOLDS 未设置时返回None（不启用）"""
+        thresholds = parse_thresholds(environ.get('SIMILAR_CACHE_THRESHOLDS', ''))
+        if not thresholds:
+            return None
+        return cls(
+            thresholds,
+            max_entries=int(environ.get('SIMILAR_CACHE_MAX_ENTRIES', '5000')),
+            ngram=int(environ.get('SIMILAR_CACHE_NGRAM', '2'))
+        )
+
+    def enabled(self, format_type):
+        return format_type in self.thresholds
+
+    def band_keys(self, namespace, signature):
+        return [(namespace, band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def lookup(self, namespace, topic, format_type):
+        """返回 (内容, 相似度, 匹配的主题)，没有达到阈值的条目时返回None"""
+        grams = shingles(topic, self.ngram)
+        if not grams:
+            # 主题中没有文字（例如只有标点），不做相似匹配
+            self.lookups.labels(format_type=format_type, result='miss').inc()
+            return None
+        signature = self.hasher.signature(grams)
+        best = None
+        with self.lock:
+            candidates = set()
+            for band_key in self.band_keys(namespace, signature):
+                candidates |= self.buckets.get(band_key, set())
+            for entry_id in candidates:
+                entry = self.entries[entry_id]
+                score = jaccard(grams, entry['grams'])
+                if best is None or score > best[0]:
+                    best = (score, entry_id)
+            if best is not None and best[0] >= self.thresholds[format_type]:
+                entry = self.entries[best[1]]
+                self.entries.move_to_end(best[1])
+                self.similarity.labels(format_type=format_type).observe(best[0])
+                self.lookups.labels(format_type=format_type, result='hit').inc()
+                return entry['content'], round(best[0], 3), entry['topic']
+        self.similarity.labels(format_type=format_type).observe(best[0] if best else 0)
+        self.lookups.labels(format_type=format_type, result='miss').inc()
+        return None
+
+    def add(self, namespace, topic, content):
+        grams = shingles(topic, self.ngram)
+        if not grams:
+            return
+        signature = self.hasher.signature(grams)
+        band_keys = self.band_keys(namespace, signature)
+        with self.lock:
+            self.sequence += 1
+            self.entries[self.sequence] = {'topic': topic, 'grams': grams, 'content': content, 'band_keys': band_keys}
+            for band_key in band_keys:
+                self.buckets[band_key].add(self.sequence)
+            while len(self.entries) > self.max_entries:
+                entry_id, entry = self.entries.popitem(last=False)
+                for band_key in entry['band_keys']:
+                    bucket = self.buckets[band_key]
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self.buckets[band_key]
+                self.evictions.inc()
+            self.size.set(len(self.entries))
@@ -0,0 +1,64 @@
+"""流式生成的增量内容
+
+请求中 stream 为 true 时，OpenAI以流式返回内容，PartialStream 把收到的片段合并后以
+content_gen_partial 消息（request_id、seq、delta）发给调度器，由调度器转给用户；第一段
+立即发送，之后每隔 interval 秒发送一次，最后仍发送包含完整内容的 content_gen_result。
+RPC调用方（例如API网关）只监听自己的回复队列，请求带 reply_info 时增量内容直接以
+content_partial 中间回复发到该队列（相同correlation_id），最终结果仍作为回复发送。
+"""
+import contextvars
+import time
+
+from a2a import metrics
+
+# 当前处理的请求的流，None表示不流式返回
+current_stream = contextvars.ContextVar('content_gen_stream', default=None)
+
+
+class PartialStream:
+    """只在事件循环中使用"""
+
+    def __init__(self, agent, target, request_id, user_id, format_type, interval=0.2, reply_info=None):
+        self.agent = agent
+        self.target = target
+        self.reply_info = reply_info
+        self.request_id = request_id
+        self.user_id = user_id
+        self.format_type = format_type
+        self.interval = interval
+        self.seq = 0
+        self.buffer = []
+        self.flushed_at = None
+        self.started = time.monotonic()
+        self.first_chunk = metrics.histogram('content_gen_first_chunk_seconds', 'Time from request start to the first streamed chunk',
+                                             ['format_type'], buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+        self.chunks = metrics.counter('content_gen_partial_messages_total', 'content_gen_partial messages published')
+
+    async def add(self, delta):
+        self.buffer.append(delta)
+        if self.flushed_at is None or time.monotonic() - self.flushed_at >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        text = ''.join(self.buffer)
+        self.buffer = []
+        self.flushed_at = time.monotonic()
+        if self.seq == 0:
+            self.first_chunk.labels(format_type=self.format_type).observe(self.flushed_at - self.started)
+        if self.reply_info is not None:
+            await self.agent.publish_reply(self.reply_info, 'content_partial', {
+                'request_id': self.request_id,
+                'seq': self.seq,
+                'delta': text
+            }, partial=True)
+        else:
+            await self.agent.publish(self.target, 'content_gen_partial', {
+                'request_id': self.request_id,
+                'user_id': self.user_id,
+                'seq': self.seq,
+                'delta': text
+            }, inline=True)
+        self.seq += 1
+        self.chunks.inc()
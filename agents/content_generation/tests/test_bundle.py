@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from a2a import log
+from main import ContentGenerationAgent
+
+
+def setUpModule():
+    # Agent的运行日志不输出到测试结果，需要检查日志的测试使用 assertLogs
+    log.configure(level='CRITICAL')
+
+
+class TestBundle(unittest.TestCase):
+    def setUp(self):
+        env = {'OPENAI_API_KEY': 'test', 'LLM_CACHE_PATH': 'none'}
+        with patch('main.start_http_server'), patch('a2a.http_client.HttpClient.get', side_effect=OSError), \
+                patch.dict(os.environ, env):
+            self.agent = ContentGenerationAgent()
+
+    def tearDown(self):
+        self.agent.helper_executor.shutdown()
+
+    @patch('main.ContentGenerationAgent.reply')
+    def test_variants_derived_from_one_article(self, reply):
+        prompts = []
+        threads = set()
+
+        def chat(messages, kind=None):
+            prompt = messages[-1]['content']
+            prompts.append(prompt)
+            if prompt.startswith('写一篇'):
+                return '完整的文章'
+            threads.add(threading.current_thread().name)
+            time.sleep(0.2)
+            return '摘要' if '摘要' in prompt else '帖子'
+
+        with patch.object(self.agent, 'chat', side_effect=chat):
+            started = time.monotonic()
+            self.agent.handle_content_request({'type': 'content_gen_request', 'source': 'core_scheduler', 'data': {
+                'request_id': 'r1', 'user_id': 'u', 'topic': 'AI产品经理', 'format': 'bundle', 'length': 'medium'
+            }})
+            elapsed = time.monotonic() - started
+
+        content = reply.call_args.kwargs['data']['content']
+        self.assertEqual(content, {'article': '完整的文章', 'summary': '摘要', 'social_media': '帖子'})
+        # 只有文章使用完整的生成提示，衍生版本基于文章改写并发执行
+        self.assertEqual(len(prompts), 3)
+        self.assertTrue(all('完整的文章' in prompt for prompt in prompts[1:]))
+        self.assertEqual(len(threads), 2)
+        self.assertLess(elapsed, 0.35)
+
+
+if __name__ == '__main__':
+    unittest.main()
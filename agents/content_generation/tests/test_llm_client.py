@@ -0,0 +1,253 @@
+import asyncio
+import json
+import time
+import unittest
+
+from aiohttp import web
+
+from a2a.deadline import DeadlineExceeded
+from hedging import HedgePolicy
+from llm_client import AdaptiveConcurrency, LLMClient, LLMError, MinuteBudget, parse_duration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeOpenAI:
+    """按顺序返回预设的状态码，记录并发数和客户端连接"""
+
+    def __init__(self, statuses=(), delay=0.01, headers=None, pieces=('第一段', '第二段', '第三段'), delays=()):
+        self.statuses = list(statuses)
+        # 按请求顺序使用的延迟，用完后使用delay
+        self.delays = list(delays)
+        self.pieces = pieces
+        self.delay = delay
+        self.headers = headers or {}
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        self.peers = set()
+
+    async def handle(self, request):
+        payload = await request.json()
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info('peername'))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.pop(0) if self.delays else self.delay)
+        finally:
+            self.active -= 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 429:
+            return web.json_response({'error': {'message': 'Rate limit reached', 'code': 'rate_limit_exceeded'}},
+                                     status=429, headers={'retry-after-ms': '20'})
+        if payload.get('stream'):
+            return await self.stream(request)
+        return web.json_response({'choices': [{'message': {'content': payload['messages'][-1]['content']}}],
+                                  'usage': {'total_tokens': 10}}, headers=self.headers)
+
+    async def stream(self, request):
+        """以 server-sent events 逐段返回 pieces"""
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for piece in self.pieces:
+            chunk = {'choices': [{'delta': {'content': piece}}]}
+            await response.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            await asyncio.sleep(self.delay)
+        await response.write(b'data: [DONE]\n\n')
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://127.0.0.1:{port}/v1'
+
+
+class TestRateControl(unittest.TestCase):
+    def test_aimd_limit(self):
+        clock = FakeClock()
+        limit = AdaptiveConcurrency(8, clock=clock)
+        limit.on_throttle()
+        limit.on_throttle()
+        # 冷却期内的多个429只减一次
+        self.assertEqual(limit.limit, 4)
+        clock.now = 2
+        limit.on_throttle()
+        limit.on_throttle()
+        self.assertEqual(limit.limit, 2)
+        for _ in range(100):
+            limit.on_success()
+        self.assertEqual(limit.limit, 8)
+
+    def test_minute_budget(self):
+        clock = FakeClock()
+        budget = MinuteBudget(60, clock)
+        budget.take(60)
+        self.assertAlmostEqual(budget.wait_time(1), 1)
+        clock.now = 1
+        self.assertEqual(budget.wait_time(1), 0)
+        # 超过整个限额的请求按限额等待
+        self.assertAlmostEqual(budget.wait_time(1000), 59)
+
+        learned = MinuteBudget(0, clock)
+        self.assertEqual(learned.wait_time(500), 0)
+        # 采用响应头中的账户限额，额度在重置时间后恢复
+        learned.sync(limit=10, remaining=0, reset=parse_duration('1s500ms'))
+        self.assertEqual(learned.capacity, 10)
+        self.assertAlmostEqual(learned.wait_time(1), 1.5)
+        clock.now = 2.5
+        self.assertEqual(learned.wait_time(10), 0)
+        self.assertEqual(parse_duration('20ms'), 0.02)
+        self.assertEqual(parse_duration('1h2m3.5s'), 3723.5)
+
+
+class TestLLMClient(unittest.TestCase):
+    def run_client(self, server, scenario, **options):
+        async def run():
+            client = LLMClient('key', api_base=await server.start(), **options)
+            try:
+                return await scenario(client)
+            finally:
+                await client.close()
+                await server.runner.cleanup()
+        return asyncio.run(run())
+
+    def test_shared_limit_and_retry_on_429(self):
+        server = FakeOpenAI(statuses=[200, 429, 429, 429], delay=0.02)
+
+        async def scenario(client):
+            results = await asyncio.gather(*[
+                client.chat('gpt', [{'role': 'user', 'content': f'p{n}'}]) for n in range(20)
+            ])
+            return results, client.concurrency
+
+        results, concurrency = self.run_client(server, scenario, max_concurrency=4)
+        self.assertEqual(results, [f'p{n}' for n in range(20)])
+        self.assertLessEqual(server.peak, 4)
+        self.assertEqual(server.requests, 23)
+        # 429后降低并发上限，之后随成功的请求恢复
+        self.assertIsNotNone(concurrency.decreased_at)
+        self.assertLessEqual(concurrency.limit, 4)
+        # 连接池复用连接
+        self.assertLessEqual(len(server.peers), 4)
+
+    def test_budget_from_headers(self):
+        server = FakeOpenAI(headers={'x-ratelimit-limit-requests': '3', 'x-ratelimit-remaining-requests': '0',
+                                     'x-ratelimit-reset-requests': '300ms'})
+
+        async def scenario(client):
+            started = time.monotonic()
+            await client.chat('gpt', [{'role': 'user', 'content': 'a'}])
+            await client.chat('gpt', [{'role': 'user', 'content': 'b'}])
+            return time.monotonic() - started, client.requests.capacity
+
+        elapsed, capacity = self.run_client(server, scenario)
+        # 剩余次数为0时暂停到重置时间
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(elapsed, 5)
+        self.assertEqual(capacity, 3)
+
+    def test_streamed_deltas(self):
+        async def scenario(client):
+            received = []
+
+            async def on_delta(delta):
+                received.append(delta)
+
+            content = await client.chat('gpt', [{'role': 'user', 'content': 'a'}], on_delta=on_delta)
+            return content, received
+
+        content, received = self.run_client(FakeOpenAI(), scenario)
+        self.assertEqual(received, ['第一段', '第二段', '第三段'])
+        self.assertEqual(content, '第一段第二段第三段')
+
+    def test_hedged_request(self):
+        async def scenario(client):
+            for n in range(5):
+                await client.chat('gpt', [{'role': 'user', 'content': f'warm {n}'}], kind='summary')
+            # 第6个请求卡住，超过近期延迟的百分位后发出的对冲请求先返回
+            started = time.monotonic()
+            content = await client.chat('gpt', [{'role': 'user', 'content': 'slow'}], kind='summary')
+            return content, time.monotonic() - started
+
+        hedge = HedgePolicy(percentile=90, budget=1, min_samples=5)
+        server = FakeOpenAI(delays=[0.02] * 5 + [0.8, 0.02])
+        content, elapsed = self.run_client(server, scenario, hedge=hedge)
+        self.assertEqual(content, 'slow')
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(server.requests, 7)
+        self.assertEqual(hedge.wins.labels(winner='hedge')._value.get(), 1)
+        self.assertEqual(hedge.decisions.labels(decision='sent')._value.get(), 1)
+        # 对冲胜出的耗时不计入延迟样本
+        self.assertEqual(len(hedge.latencies['summary']), 5)
+
+    def test_hedge_budget(self):
+        hedge = HedgePolicy(percentile=50, budget=0.25, min_samples=2, burst=1)
+        self.assertIsNone(hedge.delay('article'))
+        for latency in (1, 2, 3, 4):
+            hedge.record('article', latency)
+        self.assertEqual(hedge.delay('article'), 2)
+        self.assertIsNone(hedge.delay('summary'))
+        # 计算等待时间不改变额度
+        for _ in range(10):
+            hedge.delay('article')
+        self.assertFalse(hedge.take_credit())
+        # 每个请求积累0.25个额度，最多1个
+        for _ in range(4):
+            hedge.accrue()
+        self.assertTrue(hedge.take_credit())
+        hedge.refund()
+        for _ in range(10):
+            hedge.accrue()
+        self.assertTrue(hedge.take_credit())
+        self.assertFalse(hedge.take_credit())
+        self.assertIsNone(HedgePolicy.from_env({}))
+
+    def test_deadline_and_errors(self):
+        async def slow(client):
+            with self.assertRaises(DeadlineExceeded):
+                await client.chat('gpt', [{'role': 'user', 'content': 'a'}], deadline=time.time() + 0.05)
+
+        self.run_client(FakeOpenAI(delay=0.5), slow)
+
+        async def throttled(client):
+            with self.assertRaises(LLMError):
+                await client.chat('gpt', [{'role': 'user', 'content': 'a'}])
+
+        self.run_client(FakeOpenAI(statuses=[429, 429]), throttled, max_retries=1)
+
+    def test_budget_refunded_when_no_slot_before_deadline(self):
+        async def scenario(client):
+            # 占满并发名额，请求在截止时间前拿不到名额
+            await client.concurrency.acquire()
+            for _ in range(3):
+                with self.assertRaises(DeadlineExceeded):
+                    await client.chat('gpt', [{'role': 'user', 'content': 'a'}], deadline=time.time() + 0.05)
+            with self.assertRaises(DeadlineExceeded):
+                await client.chat('gpt', [{'role': 'user', 'content': 'a'}], deadline=time.time() - 1)
+            waiting = asyncio.ensure_future(client.chat('gpt', [{'role': 'user', 'content': 'a'}]))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            await client.concurrency.release()
+            return client.requests.available, client.tokens.available
+
+        requests, tokens = self.run_client(FakeOpenAI(), scenario, max_concurrency=1, rpm=3, tpm=100000)
+        # 没有发出的请求不占用每分钟限额
+        self.assertGreaterEqual(requests, 3)
+        self.assertGreaterEqual(tokens, 100000)
+
+
+if __name__ == '__main__':
+    unittest.main()
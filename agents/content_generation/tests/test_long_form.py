@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from a2a import log
+import long_form
+from main import ContentGenerationAgent
+
+OUTLINE = json.dumps({'title': 'AI产品经理的一天', 'sections': [
+    {'heading': '晨会', 'points': ['同步进度']},
+    {'heading': '需求评审', 'points': ['取舍']},
+    {'heading': '数据复盘', 'points': ['指标']}
+]}, ensure_ascii=False)
+
+
+def setUpModule():
+    # 关闭Agent的运行日志，大纲降级的警告由测试用 assertLogs 检查
+    log.configure(level='CRITICAL')
+
+
+class TestOutline(unittest.TestCase):
+    def test_parse_outline(self):
+        outline = long_form.parse_outline(f'好的，大纲如下：\n```json\n{OUTLINE}\n```', 'AI')
+        self.assertEqual([section['heading'] for section in outline['sections']], ['晨会', '需求评审', '数据复盘'])
+        self.assertIsNone(long_form.parse_outline('1. 晨会\n2. 评审', 'AI'))
+        self.assertIsNone(long_form.parse_outline('{"sections": [{"heading": "只有一部分"}]}', 'AI'))
+        self.assertEqual(long_form.section_words('1500-2000', 4), 500)
+
+        prompt = long_form.section_prompt(outline, 1, 500)
+        # 每部分的提示包含完整大纲和前后部分
+        self.assertIn('3. 数据复盘', prompt)
+        self.assertIn('承接上一部分“晨会”', prompt)
+        self.assertIn('下一部分“数据复盘”', prompt)
+
+
+class TestLongArticle(unittest.TestCase):
+    def create_agent(self, mode):
+        env = {'OPENAI_API_KEY': 'test', 'LLM_CACHE_PATH': 'none', 'LONG_ARTICLE_MODE': mode}
+        with patch('main.start_http_server'), patch('a2a.http_client.HttpClient.get', side_effect=OSError), \
+                patch.dict(os.environ, env):
+            agent = ContentGenerationAgent()
+        self.addCleanup(agent.helper_executor.shutdown)
+        return agent
+
+    def test_sections_generated_concurrently(self):
+        agent = self.create_agent('sectioned')
+        threads = set()
+
+        def chat(messages, kind=None):
+            prompt = messages[-1]['content']
+            if '拟定大纲' in prompt:
+                return OUTLINE
+            threads.add(threading.current_thread().name)
+            time.sleep(0.1)
+            if '引言' in prompt and '只返回引言' in prompt:
+                return '引言段落'
+            if '只返回结尾' in prompt:
+                return '结尾段落'
+            return f"{prompt.split('“')[1].split('”')[0]}的正文"
+
+        metadata = {}
+        with patch.object(agent, 'chat', side_effect=chat):
+            started = time.monotonic()
+            article = agent.generate_article('AI产品经理', 'long', {}, metadata=metadata)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(article, '# AI产品经理的一天\n\n引言段落\n\n## 晨会\n\n晨会的正文\n\n## 需求评审\n\n需求评审的正文\n\n'
+                                  '## 数据复盘\n\n数据复盘的正文\n\n结尾段落')
+        self.assertEqual(len(threads), 5)
+        self.assertLess(elapsed, 0.3)
+        self.assertEqual(metadata['article_mode'], 'sectioned')
+        self.assertGreater(agent.long_article_seconds.labels(mode='sectioned')._sum.get(), 0)
+
+    def test_fallback_and_single_mode(self):
+        agent = self.create_agent('sectioned')
+        with patch.object(agent, 'chat', side_effect=['这不是大纲', '完整的文章']) as chat, \
+                self.assertLogs(agent.log, level='WARNING') as logs:
+            metadata = {}
+            self.assertEqual(agent.generate_article('AI', 'long', {}, metadata=metadata), '完整的文章')
+        self.assertEqual(chat.call_count, 2)
+        self.assertEqual([record.getMessage() for record in logs.records], ['长文大纲无法解析，改为一次生成'])
+        self.assertEqual(metadata['article_mode'], 'single')
+
+        agent = self.create_agent('single')
+        with patch.object(agent, 'chat', return_value='完整的文章') as chat:
+            agent.generate_article('AI', 'long', {})
+        self.assertEqual(chat.call_count, 1)
+        self.assertIn('1500-2000', chat.call_args.args[0][-1]['content'])
+        with self.assertRaises(ValueError):
+            self.create_agent('parallel')
+
+
+if __name__ == '__main__':
+    unittest.main()
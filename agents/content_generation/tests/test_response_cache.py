@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from a2a import log
+from main import ContentGenerationAgent, parse_flag, parse_formats
+from response_cache import ResponseCache, cache_key
+
+
+def setUpModule():
+    # 初始化MCP工具失败等运行日志与测试无关
+    log.configure(level='CRITICAL')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key_ignores_whitespace_only(self):
+        self.assertEqual(cache_key('m', '系统  提示', '写一篇\n文章'), cache_key('m', '系统 提示', '写一篇 文章'))
+        self.assertNotEqual(cache_key('m', 's', 'p'), cache_key('other', 's', 'p'))
+        self.assertNotEqual(cache_key('m', 's p', ''), cache_key('m', 's', 'p'))
+
+    def test_memory_and_disk_tiers(self):
+        clock = FakeClock()
+        cache = ResponseCache(self.path, memory_entries=1, ttl=100, clock=clock)
+        cache.put('a', '内容A', 2.0)
+        cache.put('b', '内容B', 3.0)
+        # a 已被挤出内存，从文件读取后重新进入内存
+        self.assertNotIn('a', cache.memory)
+        self.assertEqual(cache.get('a', 'article'), '内容A')
+        self.assertEqual(list(cache.memory), ['a'])
+        self.assertEqual(cache.lookups.labels(format_type='article', result='hit_disk')._value.get(), 1)
+        cache.close()
+
+        # 重启后仍可命中，过期的条目被删除
+        reopened = ResponseCache(self.path, ttl=100, clock=clock)
+        self.assertEqual(reopened.get('b', 'article'), '内容B')
+        clock.now = 200
+        self.assertIsNone(reopened.get('b', 'article'))
+        self.assertEqual(reopened.disk_bytes, len('内容A'.encode('utf-8')))
+        reopened.close()
+
+    def test_size_limit_evicts_least_recently_used(self):
+        clock = FakeClock()
+        cache = ResponseCache(self.path, max_bytes=25, clock=clock)
+        for n, key in enumerate(('a', 'b', 'c')):
+            clock.now = n
+            cache.put(key, key * 10, 1.0)
+            if key == 'b':
+                clock.now = 1.5
+                cache.get('a', 'summary')
+        # a 最近被读取过，最久未使用的 b 被删除
+        self.assertEqual(cache.disk_bytes, 20)
+        self.assertIsNone(cache.get('b', 'summary'))
+        self.assertEqual(cache.get('a', 'summary'), 'a' * 10)
+        cache.close()
+
+
+class TestCachedGeneration(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        env = {'OPENAI_API_KEY': 'test', 'LLM_CACHE_PATH': os.path.join(self.directory.name, 'cache.db'),
+               'LLM_CACHE_DISABLED_FORMATS': 'social_media', 'MCP_REGISTRY_URL': 'http://localhost:8000'}
+        with patch('main.start_http_server'), patch('a2a.http_client.HttpClient.get', side_effect=OSError), \
+                patch.dict(os.environ, env):
+            self.agent = ContentGenerationAgent()
+
+    def tearDown(self):
+        self.agent.response_cache.close()
+        self.directory.cleanup()
+
+    @patch('main.ContentGenerationAgent.chat')
+    def test_repeated_prompt_skips_openai(self, chat):
+        chat.return_value = '生成的文章'
+        first = self.agent.generate_article('AI', 'short', {'tone': '正式'})
+        second = self.agent.generate_article('AI', 'short', {'tone': '正式'})
+        self.assertEqual(first, second)
+        self.assertEqual(chat.call_count, 1)
+        self.agent.generate_article('AI', 'medium', {'tone': '正式'})
+        self.assertEqual(chat.call_count, 2)
+
+    @patch('main.ContentGenerationAgent.reply')
+    @patch('main.ContentGenerationAgent.chat')
+    def test_opt_out_per_request_and_format(self, chat, reply):
+        chat.return_value = '内容'
+        for requirements in ({'cache': False}, {'cache': False}):
+            self.agent.handle_content_request({'type': 'content_gen_request', 'source': 'core_scheduler', 'data': {
+                'request_id': 'r', 'user_id': 'u', 'topic': 'AI', 'format': 'summary', 'requirements': requirements
+            }})
+        for _ in range(2):
+            self.agent.handle_content_request({'type': 'content_gen_request', 'source': 'core_scheduler', 'data': {
+                'request_id': 'r', 'user_id': 'u', 'topic': 'AI', 'format': 'social_media'
+            }})
+        self.assertEqual(chat.call_count, 4)
+        # cache 选项不写入提示
+        self.assertNotIn('cache', chat.call_args_list[0].args[0][1]['content'])
+        self.assertFalse(self.agent.response_cache.memory)
+        self.assertEqual(reply.call_args.kwargs['data']['content'], '内容')
+
+    def send(self, format_type, requirements=None):
+        self.agent.handle_content_request({'type': 'content_gen_request', 'source': 'core_scheduler', 'data': {
+            'request_id': 'r', 'user_id': 'u', 'topic': 'AI', 'format': format_type, 'requirements': requirements or {}
+        }})
+
+    @patch('main.ContentGenerationAgent.reply')
+    @patch('main.ContentGenerationAgent.chat')
+    def test_string_flags_from_form_input(self, chat, reply):
+        chat.return_value = '内容'
+        for value in ('false', '0', 'False'):
+            self.send('summary', {'cache': value})
+        self.assertEqual(chat.call_count, 3)
+        self.assertFalse(self.agent.response_cache.memory)
+        self.send('summary', {'cache': 'true'})
+        self.send('summary', {'cache': 'true'})
+        self.assertEqual(chat.call_count, 4)
+
+    @patch('main.ContentGenerationAgent.reply')
+    @patch('main.ContentGenerationAgent.chat')
+    def test_opt_out_formats_in_requirements(self, chat, reply):
+        chat.return_value = '内容'
+        self.send('article', {'cache_disabled_formats': ['article']})
+        self.send('article', {'cache_disabled_formats': 'summary, article'})
+        self.assertEqual(chat.call_count, 2)
+        # bundle中只有文章使用缓存：摘要由请求排除，社交媒体帖子由 LLM_CACHE_DISABLED_FORMATS 排除
+        for _ in range(2):
+            self.send('bundle', {'cache_disabled_formats': ['summary']})
+        self.assertEqual(chat.call_count, 7)
+        self.assertNotIn('cache_disabled_formats', chat.call_args_list[0].args[0][1]['content'])
+        self.assertEqual(parse_formats(' a,,b '), {'a', 'b'})
+        self.assertFalse(parse_flag(' Off '))
+        self.assertTrue(parse_flag('yes'))
+
+
+if __name__ == '__main__':
+    unittest.main()
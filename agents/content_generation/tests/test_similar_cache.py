@@ -0,0 +1,74 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from a2a import log
+from main import ContentGenerationAgent
+from similar_cache import SimilarCache, parse_thresholds, shingles
+
+
+def setUpModule():
+    # 不输出Agent日志
+    log.configure(level='CRITICAL')
+
+
+class TestSimilarCache(unittest.TestCase):
+    def test_paraphrased_topic_matches_within_namespace(self):
+        cache = SimilarCache({'summary': 0.6})
+        cache.add('ns', 'AI产品经理技能', '摘要')
+        content, similarity, topic = cache.lookup('ns', 'AI产品经理必备技能', 'summary')
+        self.assertEqual((content, topic), ('摘要', 'AI产品经理技能'))
+        self.assertGreaterEqual(similarity, 0.6)
+        # 主题不同或提示的其余部分不同时不匹配
+        self.assertIsNone(cache.lookup('ns', 'AI产品经理薪资', 'summary'))
+        self.assertIsNone(cache.lookup('other', 'AI产品经理技能', 'summary'))
+        self.assertEqual(shingles('A I-产品', 2), {'ai', 'i产', '产品'})
+        self.assertEqual(parse_thresholds('summary:0.6, article:0.8'), {'summary': 0.6, 'article': 0.8})
+
+    def test_index_is_bounded(self):
+        cache = SimilarCache({'summary': 0.9}, max_entries=3)
+        for n in range(5):
+            cache.add('ns', f'主题{n}号内容', f'内容{n}')
+        self.assertEqual(len(cache.entries), 3)
+        self.assertIsNone(cache.lookup('ns', '主题0号内容', 'summary'))
+        self.assertEqual(cache.lookup('ns', '主题4号内容', 'summary')[0], '内容4')
+        # 被删除条目的分段不再留在索引中
+        self.assertEqual({entry_id for bucket in cache.buckets.values() for entry_id in bucket}, set(cache.entries))
+
+    def test_topic_without_words_misses(self):
+        cache = SimilarCache({'article': 0.8})
+        cache.add('ns', '!!!', '内容')
+        self.assertEqual(cache.entries, {})
+        self.assertIsNone(cache.lookup('ns', '!!!', 'article'))
+        self.assertIsNone(cache.lookup('ns', '？？', 'article'))
+
+
+class TestSimilarGeneration(unittest.TestCase):
+    @patch('main.ContentGenerationAgent.reply')
+    @patch('main.ContentGenerationAgent.chat')
+    def test_similar_topic_reuses_generation(self, chat, reply):
+        env = {'OPENAI_API_KEY': 'test', 'LLM_CACHE_PATH': 'none', 'SIMILAR_CACHE_THRESHOLDS': 'summary:0.6'}
+        with patch('main.start_http_server'), patch('a2a.http_client.HttpClient.get', side_effect=OSError), \
+                patch.dict(os.environ, env):
+            agent = ContentGenerationAgent()
+        chat.return_value = '关于技能的摘要'
+
+        def request(topic, format_type='summary'):
+            agent.handle_content_request({'type': 'content_gen_request', 'source': 'core_scheduler', 'data': {
+                'request_id': topic, 'user_id': 'u', 'topic': topic, 'format': format_type
+            }})
+            return reply.call_args.kwargs['data']
+
+        self.assertNotIn('metadata', request('AI产品经理技能'))
+        data = request('AI产品经理必备技能')
+        self.assertEqual(data['content'], '关于技能的摘要')
+        self.assertEqual(data['metadata']['cache'], 'similar')
+        self.assertEqual(data['metadata']['matched_topic'], 'AI产品经理技能')
+        # 未配置阈值的格式不使用相似缓存
+        request('AI产品经理技能', 'article')
+        request('AI产品经理必备技能', 'article')
+        self.assertEqual(chat.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from a2a import AgentRuntime, log
+from a2a.transport import InMemoryBus, InMemoryTransport
+from main import ContentGenerationAgent
+from test_llm_client import FakeOpenAI
+
+
+def setUpModule():
+    # 不输出每条消息的收发日志
+    log.configure(level='CRITICAL')
+
+
+class Recorder(AgentRuntime):
+    def __init__(self, agent_id, transport):
+        super().__init__(agent_id, transport)
+        self.received = []
+
+    async def handle_message(self, message):
+        self.received.append((time.monotonic(), message['type'], message['data']))
+
+
+class TestStreamingGeneration(unittest.TestCase):
+    def test_partials_then_assembled_result(self):
+        server = FakeOpenAI(delay=0.1)
+        bus = InMemoryBus()
+
+        async def run():
+            base = await server.start()
+            env = {'OPENAI_API_KEY': 'test', 'OPENAI_API_BASE': base, 'LLM_CACHE_PATH': 'none',
+                   'CONTENT_STREAM_INTERVAL_MS': '0'}
+            with patch('main.start_http_server'), patch('a2a.http_client.HttpClient.get', side_effect=OSError), \
+                    patch.dict(os.environ, env):
+                agent = ContentGenerationAgent(InMemoryTransport(bus))
+            scheduler = Recorder('core_scheduler', InMemoryTransport(bus))
+            for runtime in (agent, scheduler):
+                await runtime.startup()
+            try:
+                started = time.monotonic()
+                await scheduler.publish('content_gen_agent', 'content_gen_request', {
+                    'request_id': 'r1', 'user_id': 'api_gateway', 'topic': 'AI', 'format': 'article',
+                    'length': 'long', 'stream': True
+                })
+                for _ in range(50):
+                    if any(kind == 'content_gen_result' for _, kind, _ in scheduler.received):
+                        break
+                    await asyncio.sleep(0.05)
+                return started, scheduler.received
+            finally:
+                for runtime in (scheduler, agent):
+                    await runtime.close()
+                await server.runner.cleanup()
+
+        started, received = asyncio.run(run())
+        partials = [data for _, kind, data in received if kind == 'content_gen_partial']
+        result = [data for _, kind, data in received if kind == 'content_gen_result'][0]
+        self.assertEqual([data['seq'] for data in partials], [0, 1, 2])
+        self.assertEqual(''.join(data['delta'] for data in partials), result['content'])
+        self.assertEqual(result['chunks'], 3)
+        # 第一段内容在生成完成前到达
+        first, last = received[0][0], received[-1][0]
+        self.assertEqual(received[0][1], 'content_gen_partial')
+        self.assertLess(first - started, last - started - 0.15)
+
+    def test_rpc_partials_go_to_the_caller(self):
+        server = FakeOpenAI(delay=0.05)
+        bus = InMemoryBus()
+
+        async def run():
+            base = await server.start()
+            env = {'OPENAI_API_KEY': 'test', 'OPENAI_API_BASE': base, 'LLM_CACHE_PATH': 'none',
+                   'CONTENT_STREAM_INTERVAL_MS': '0'}
+            with patch('main.start_http_server'), patch('a2a.http_client.HttpClient.get', side_effect=OSError), \
+                    patch.dict(os.environ, env):
+                agent = ContentGenerationAgent(InMemoryTransport(bus))
+            caller = Recorder('api_gateway', InMemoryTransport(bus))
+            for runtime in (agent, caller):
+                await runtime.startup()
+            partials = []
+
+            async def on_partial(message):
+                partials.append(message)
+
+            try:
+                reply = await caller.call('content_gen_agent', 'content_gen_request', {
+                    'request_id': 'r2', 'user_id': 'api_gateway', 'topic': 'AI', 'format': 'article',
+                    'length': 'long', 'stream': True
+                }, timeout=5, on_partial=on_partial)
+                return reply, partials, caller.received
+            finally:
+                for runtime in (caller, agent):
+                    await runtime.close()
+                await server.runner.cleanup()
+
+        reply, partials, received = asyncio.run(run())
+        # 增量内容作为中间回复发给调用方，不经过调度器
+        self.assertEqual([message['type'] for message in partials], ['content_partial'] * 3)
+        self.assertEqual([message['data']['seq'] for message in partials], [0, 1, 2])
+        self.assertEqual(''.join(message['data']['delta'] for message in partials), reply['data']['content'])
+        self.assertEqual(reply['type'], 'content_gen_result')
+        self.assertEqual(received, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
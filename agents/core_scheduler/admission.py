@@ -0,0 +1,199 @@
+"""核心调度Agent的按用户准入控制和公平排队
+
+每个用户按所属等级（tier）拥有一个令牌桶，令牌不足或用户的等待队列已满时立即拒绝，
+并给出建议的重试等待秒数。被接受的请求进入该用户的队列，调度器同时转发的请求数
+不超过 max_inflight，空出的名额按赤字轮询（DRR）在有等待请求的用户之间分配：
+每轮每个用户获得与其等级权重相当的额度，请求按类型消耗不同额度，
+因此一个用户提交大量请求只会排长自己的队列，不会挤占其他用户。
+"""
+import collections
+import threading
+import time
+
+from a2a import metrics
+
+
+def parse_tiers(spec):
+    """解析 "free:2:10,pro:10:50" 形式的配置，返回 {等级: (每秒令牌数, 桶容量)}"""
+    tiers = {}
+    for item in (spec or '').split(','):
+        parts = [part.strip() for part in item.split(':')]
+        if len(parts) != 3 or not parts[0]:
+            continue
+        tiers[parts[0]] = (float(parts[1]), float(parts[2]))
+    return tiers
+
+
+class TokenBucket:
+    """令牌桶，按时间补充令牌"""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def take(self, cost, now):
+        """取出cost个令牌，成功返回0，否则返回需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+
+class FairQueue:
+    """按用户分组的赤字轮询队列"""
+
+    def __init__(self):
+        self.queues = {}
+        self.deficits = {}
+        self.quanta = {}
+        self.active = collections.deque()
+        self._visiting = None
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def depth(self, user):
+        queue = self.queues.get(user)
+        return len(queue) if queue else 0
+
+    def put(self, user, item, cost, quantum):
+        if user not in self.queues:
+            self.queues[user] = collections.deque()
+            self.deficits[user] = 0
+            self.active.append(user)
+        self.quanta[user] = quantum
+        self.queues[user].append((cost, item))
+
+    def get(self):
+        """返回 (用户, 请求)，队列为空时返回None"""
+        while self.active:
+            user = self.active[0]
+            if self._visiting != user:
+                # 轮到该用户时补充一轮额度
+                self._visiting = user
+                self.deficits[user] += self.quanta[user]
+            queue = self.queues[user]
+            cost, item = queue[0]
+            if self.deficits[user] >= cost:
+                queue.popleft()
+                self.deficits[user] -= cost
+                if not queue:
+                    # 队列清空的用户不保留剩余额度
+                    self.active.popleft()
+                    del self.queues[user], self.deficits[user], self.quanta[user]
+                    self._visiting = None
+                return user, item
+            self.active.rotate(-1)
+            self._visiting = None
+        return None
+
+
+class Rejected(Exception):
+    """请求未被接受，retry_after为建议的重试等待秒数"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """令牌桶准入、按用户的等待队列和转发并发控制，可在多个处理线程中调用"""
+
+    def __init__(self, tiers, default_tier, costs=None, max_queue=50, max_inflight=32, inflight_timeout=600):
+        self.tiers = tiers
+        self.default_tier = default_tier if default_tier in tiers else next(iter(tiers))
+        self.costs = costs or {}
+        self.max_queue = max_queue
+        self.max_inflight = max_inflight
+        self.inflight_timeout = inflight_timeout
+        # 公平排队的每轮额度按等级速率的比例分配，最低等级为1；
+        # 速率为0的等级（暂停补充令牌）也按1分配，全部为0时各等级相同
+        self.min_rate = min((rate for rate, _ in tiers.values() if rate > 0), default=1.0)
+        self.buckets = {}
+        self.queue = FairQueue()
+        self.inflight = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.queue_depth = metrics.gauge('scheduler_admission_queue_depth', 'Requests waiting for dispatch per user', ['user_id'])
+        self.rejections = metrics.counter('scheduler_admission_rejections_total', 'Rejected user requests',
+                                          ['user_id', 'tier', 'reason'])
+        self.inflight_gauge = metrics.gauge('scheduler_admission_inflight', 'Dispatched requests that have not completed')
+        self.queue_wait = metrics.histogram('scheduler_admission_wait_seconds', 'Time from admission to dispatch',
+                                            buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60))
+
+    @classmethod
+    def from_env(cls, environ):
+        costs = {}
+        for item in environ.get('ADMISSION_COSTS', 'content_workflow:4').split(','):
+            name, _, value = item.strip().partition(':')
+            if name and value:
+                costs[name] = float(value)
+        return cls(
+            parse_tiers(environ.get('ADMISSION_TIERS', 'free:2:10,pro:10:50,admin:50:200')),
+            environ.get('ADMISSION_DEFAULT_TIER', 'free'),
+            costs=costs,
+            max_queue=int(environ.get('ADMISSION_MAX_QUEUE', '50')),
+            max_inflight=int(environ.get('ADMISSION_MAX_INFLIGHT', '32')),
+            inflight_timeout=float(environ.get('ADMISSION_INFLIGHT_TIMEOUT', '600'))
+        )
+
+    def cost(self, request_type):
+        return self.costs.get(request_type, 1)
+
+    def submit(self, user, tier, request_type, request_id, item):
+        """接受请求进入用户队列，拒绝时抛出 Rejected"""
+        tier = tier if tier in self.tiers else self.default_tier
+        rate, capacity = self.tiers[tier]
+        cost = self.cost(request_type)
+        now = time.time()
+        with self.lock:
+            depth = self.queue.depth(user)
+            if depth >= self.max_queue:
+                self.rejections.labels(user_id=user, tier=tier, reason='queue_full').inc()
+                # 按用户的令牌补充速度估算队列排空所需时间
+                raise Rejected('queue_full', depth * cost / rate if rate > 0 else self.inflight_timeout)
+            bucket = self.buckets.get((user, tier))
+            if bucket is None:
+                bucket = self.buckets[(user, tier)] = TokenBucket(rate, capacity, now)
+            wait = bucket.take(cost, now)
+            if wait:
+                self.rejections.labels(user_id=user, tier=tier, reason='rate_limited').inc()
+                raise Rejected('rate_limited', wait)
+            self.queue.put(user, (request_id, now, item), cost, max(rate / self.min_rate, 1))
+            self.queue_depth.labels(user_id=user).set(depth + 1)
+
+    def ready(self):
+        """取出可以转发的请求（按公平顺序），返回 [item, ...] 并登记为进行中"""
+        now = time.time()
+        items = []
+        with self.lock:
+            # 超时未完成的请求（如完成通知丢失）不再占用名额
+            while self.inflight and next(iter(self.inflight.values())) < now - self.inflight_timeout:
+                self.inflight.popitem(last=False)
+            while self.max_inflight <= 0 or len(self.inflight) < self.max_inflight:
+                entry = self.queue.get()
+                if entry is None:
+                    break
+                user, (request_id, admitted_at, item) = entry
+                self.inflight[request_id] = now
+                self.queue_wait.observe(now - admitted_at)
+                depth = self.queue.depth(user)
+                if depth:
+                    self.queue_depth.labels(user_id=user).set(depth)
+                else:
+                    self.queue_depth.remove(user)
+                items.append(item)
+            self.inflight_gauge.set(len(self.inflight))
+        return items
+
+    def release(self, request_id):
+        """请求完成，释放转发名额；返回该请求是否占用过名额"""
+        with self.lock:
+            released = self.inflight.pop(request_id, None) is not None
+            self.inflight_gauge.set(len(self.inflight))
+        return released
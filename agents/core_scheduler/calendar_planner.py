@@ -0,0 +1,389 @@
+"""内容日历驱动的预生成
+
+运营在内容日历（content_calendar_template.csv：日期, 平台, 主题, 标题, CTA, 状态）中规划发布，
+以往内容在点击时才生成，高峰时段集中消耗OpenAI额度。调度器读取 CALENDAR_FILES 中的日历，
+为状态为“未开始”的条目在发布日期前 lead_time 秒内的低峰时段安排生成任务，任务放入时间轮，
+到期后在并发预算内以普通用户请求的方式提交给调度器自身，因此同样经过准入控制、合并执行和
+截止时间检查。条目的状态依次更新为 已排期、生成中、已生成（或 生成失败），生成的内容写入
+日历旁的 <日历名>_generated 目录。发布日期前没有低峰时段的条目立即生成。
+调度器分片运行时，每个日历只由哈希环上负责它的副本处理（owns），归属转移后原副本停止处理，
+新的负责副本重新读取日历，已排期和生成中的条目由它继续安排。
+"""
+import asyncio
+import collections
+import csv
+import datetime
+import hashlib
+import itertools
+import os
+import tempfile
+import time
+
+from a2a import metrics
+from a2a.lanes import parse_routes
+
+STATUS_COLUMN = '状态'
+NOT_STARTED = '未开始'
+SCHEDULED = '已排期'
+GENERATING = '生成中'
+GENERATED = '已生成'
+FAILED = '生成失败'
+# 读取日历时需要安排生成的状态，已排期和生成中的条目来自上次未完成的运行
+PLANNABLE = (NOT_STARTED, SCHEDULED, GENERATING)
+
+
+def parse_windows(spec):
+    """解析 "00:00-07:00,22:00-24:00" 形式的低峰时段，返回 [(开始分钟, 结束分钟)]，结束早于开始表示跨午夜"""
+    windows = []
+    for item in (spec or '').split(','):
+        start, _, end = item.strip().partition('-')
+        if not start or not end:
+            continue
+        windows.append(tuple(int(hours) * 60 + int(minutes) for hours, _, minutes in
+                             (value.strip().partition(':') for value in (start, end))))
+    return windows
+
+
+def minute_of_day(ts):
+    moment = datetime.datetime.fromtimestamp(ts)
+    return moment.hour * 60 + moment.minute + moment.second / 60
+
+
+def in_window(ts, windows):
+    """没有配置低峰时段时任何时间都可以生成"""
+    if not windows:
+        return True
+    minute = minute_of_day(ts)
+    for start, end in windows:
+        if start <= minute < end if start < end else (minute >= start or minute < end):
+            return True
+    return False
+
+
+def next_offpeak(ts, windows):
+    """ts之后（含）最早的低峰时刻"""
+    if in_window(ts, windows):
+        return ts
+    midnight = datetime.datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = []
+    for start, _ in windows:
+        candidate = (midnight + datetime.timedelta(minutes=start)).timestamp()
+        candidates.append(candidate if candidate > ts else (midnight + datetime.timedelta(days=1, minutes=start)).timestamp())
+    return min(candidates)
+
+
+def parse_date(value):
+    """日历中的发布日期（本地时间当天零点），无法解析时返回None"""
+    try:
+        return datetime.datetime.strptime(str(value).strip(), '%Y-%m-%d').timestamp()
+    except ValueError:
+        return None
+
+
+class TimingWheel:
+    """哈希时间轮：schedule() 和 advance() 的开销与任务总数无关
+
+    每个槽对应 tick 秒，一圈为 tick * slots 秒，更远的任务按到期的tick序号留在槽中，
+    转到该槽时只取出已到期的任务。
+    """
+
+    def __init__(self, tick, slots, now):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current = int(now // tick)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def schedule(self, when, item):
+        target = max(int(when // self.tick), self.current + 1)
+        self.slots[target % len(self.slots)].append((target, item))
+        self.size += 1
+
+    def advance(self, now):
+        """转到now所在的tick，返回期间到期的任务"""
+        target = int(now // self.tick)
+        due = []
+        # 相隔超过一圈时每个槽只需检查一次
+        for tick in range(self.current + 1, min(target, self.current + len(self.slots)) + 1):
+            index = tick % len(self.slots)
+            waiting = []
+            for entry in self.slots[index]:
+                (due if entry[0] <= target else waiting).append(entry)
+            self.slots[index] = waiting
+        self.current = max(self.current, target)
+        self.size -= len(due)
+        return [item for _, item in sorted(due, key=lambda entry: entry[0])]
+
+
+def read_calendar(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader), os.path.getmtime(path)
+
+
+def write_calendar(path, fieldnames, rows):
+    """先写唯一的临时文件再替换，运营同时打开日历时不会读到半个文件"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f'.{os.path.basename(path)}.',
+                                     suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return os.path.getmtime(path)
+
+
+def entry_key(path, row):
+    """条目的标识，日历重新读取或行顺序变化后不变"""
+    fields = [os.path.abspath(path)] + [str(row.get(name, '')) for name in ('日期', '平台', '主题', '标题')]
+    return hashlib.sha1('\x1f'.join(fields).encode('utf-8')).hexdigest()[:16]
+
+
+class CalendarPlanner:
+    """读取内容日历，在低峰时段按并发预算提交生成请求，只在调度器的事件循环中使用
+
+    submit(request) 为提交用户请求并等待回复消息的协程函数；owns(path) 为真时本副本负责该日历，
+    默认负责所有日历。
+    """
+
+    def __init__(self, submit, paths, log, windows=None, lead_time=172800, budget=2, tick=60, slots=1440,
+                 formats=None, default_format='article', owns=None, clock=time.time):
+        self.submit = submit
+        self.paths = list(paths)
+        self.log = log
+        self.owns = owns or (lambda path: True)
+        self.windows = windows or []
+        self.lead_time = lead_time
+        self.budget = budget
+        self.tick = tick
+        self.formats = formats or {}
+        self.default_format = default_format
+        self.clock = clock
+        self.wheel = TimingWheel(tick, slots, clock())
+        self.ready = collections.deque()
+        self.calendars = {}
+        self.jobs = {}
+        self.running = {}
+        # 每次安排任务的序号，时间轮中过时的安排（任务已重新安排或日历已移交）到期时跳过
+        self.tokens = itertools.count(1)
+
+        self.job_outcomes = metrics.counter('scheduler_calendar_jobs_total',
+                                            'Calendar pre-generation jobs by outcome (planned, released, deferred, generated, failed)',
+                                            ['outcome'])
+        self.pending = metrics.gauge('scheduler_calendar_pending_jobs', 'Calendar jobs waiting for their release time or a budget slot')
+        self.inflight = metrics.gauge('scheduler_calendar_inflight_jobs', 'Calendar jobs being generated')
+
+    @classmethod
+    def from_env(cls, submit, log, environ, owns=None):
+        """未配置 CALENDAR_FILES 时返回None"""
+        paths = [path.strip() for path in environ.get('CALENDAR_FILES', '').split(',') if path.strip()]
+        if not paths:
+            return None
+        return cls(
+            submit,
+            paths,
+            log,
+            windows=parse_windows(environ.get('CALENDAR_OFFPEAK', '00:00-07:00')),
+            lead_time=float(environ.get('CALENDAR_LEAD_HOURS', '48')) * 3600,
+            budget=int(environ.get('CALENDAR_CONCURRENCY', '2')),
+            tick=float(environ.get('CALENDAR_TICK', '60')),
+            formats=parse_routes(environ.get('CALENDAR_FORMATS', '知乎:article,B站:article,微博:social_media,小红书:social_media')),
+            default_format=environ.get('CALENDAR_DEFAULT_FORMAT', 'article'),
+            owns=owns
+        )
+
+    def release_time(self, publish_at, now):
+        """发布日期前lead_time内最早的低峰时刻；发布前已没有低峰时段时立即生成"""
+        earliest = max(now, publish_at - self.lead_time)
+        release = next_offpeak(earliest, self.windows)
+        return (release, False) if release < publish_at else (earliest, True)
+
+    async def ingest(self, path):
+        """读取日历并安排其中待生成的条目，返回新安排的条目数"""
+        loop = asyncio.get_running_loop()
+        fieldnames, rows, mtime = await loop.run_in_executor(None, read_calendar, path)
+        calendar = self.calendars.setdefault(path, {'lock': asyncio.Lock()})
+        calendar.update(fieldnames=fieldnames, rows=rows, mtime=mtime)
+        now = self.clock()
+        planned = 0
+        for row in rows:
+            key = entry_key(path, row)
+            job = self.jobs.get(key)
+            if job is not None and job['state'] in (GENERATED, FAILED) and row.get(STATUS_COLUMN) == NOT_STARTED:
+                # 运营把已处理的条目改回未开始，重新生成
+                job = None
+            if job is not None:
+                # 已安排的条目以内存中的进度为准
+                row[STATUS_COLUMN] = job['state']
+                continue
+            if row.get(STATUS_COLUMN) not in PLANNABLE:
+                continue
+            publish_at = parse_date(row.get('日期'))
+            if publish_at is None or publish_at <= now:
+                self.warn('日历条目的发布日期无效或已过，不再生成', row)
+                continue
+            release_at, urgent = self.release_time(publish_at, now)
+            self.jobs[key] = {'key': key, 'path': path, 'publish_at': publish_at, 'urgent': urgent,
+                              'state': SCHEDULED, 'attempts': 0}
+            self.schedule(key, release_at, now)
+            row[STATUS_COLUMN] = SCHEDULED
+            planned += 1
+        self.job_outcomes.labels(outcome='planned').inc(planned)
+        self.update_gauges()
+        if planned:
+            await self.save(path)
+        return planned
+
+    def schedule(self, key, release_at, now):
+        token = self.jobs[key]['token'] = next(self.tokens)
+        if release_at <= now:
+            self.ready.append((key, token))
+        else:
+            self.wheel.schedule(release_at, (key, token))
+
+    async def run(self):
+        """按tick转动时间轮，负责的日历首次处理或文件修改后重新读取"""
+        try:
+            while True:
+                await self.advance()
+                await asyncio.sleep(self.tick)
+        finally:
+            for task in list(self.running.values()):
+                task.cancel()
+
+    async def safe_ingest(self, path):
+        try:
+            await self.ingest(path)
+        except (OSError, csv.Error) as e:
+            self.warn(f'读取内容日历失败: {e}', {'path': path})
+
+    async def advance(self):
+        """释放到期的任务，只在低峰时段且不超过并发预算"""
+        for path in self.paths:
+            if not self.owns(path):
+                if path in self.calendars:
+                    self.hand_over(path)
+                continue
+            calendar = self.calendars.get(path)
+            try:
+                changed = calendar is None or os.path.getmtime(path) != calendar['mtime']
+            except OSError:
+                changed = False
+            if changed:
+                await self.safe_ingest(path)
+
+        now = self.clock()
+        self.ready.extend(self.wheel.advance(now))
+        while self.ready and len(self.running) < self.budget:
+            key, token = self.ready.popleft()
+            job = self.jobs.get(key)
+            if job is None or job['token'] != token:
+                continue
+            if not job['urgent'] and not in_window(now, self.windows):
+                # 低峰时段已结束，顺延到下一个时段
+                self.defer(job, now)
+                continue
+            self.job_outcomes.labels(outcome='released').inc()
+            await self.set_state(job, GENERATING)
+            self.running[job['key']] = asyncio.ensure_future(self.generate(job))
+        self.update_gauges()
+
+    def hand_over(self, path):
+        """日历改由其他副本负责：停止本副本的任务，条目状态留给新的负责副本接续"""
+        del self.calendars[path]
+        for key, job in list(self.jobs.items()):
+            if job['path'] == path:
+                del self.jobs[key]
+                task = self.running.pop(key, None)
+                if task is not None:
+                    task.cancel()
+        self.log.info('内容日历已移交给其他调度器副本', extra={'calendar_entry': {'path': path}})
+        self.update_gauges()
+
+    def defer(self, job, not_before):
+        job['state'] = SCHEDULED
+        release_at, job['urgent'] = self.release_time(job['publish_at'], not_before)
+        self.schedule(job['key'], release_at, self.clock())
+        self.job_outcomes.labels(outcome='deferred').inc()
+
+    async def generate(self, job):
+        """提交生成请求并按回复更新条目"""
+        row = self.row_of(job) or {}
+        job['attempts'] += 1
+        request = {
+            'id': f"calendar-{job['key']}-{job['attempts']}",
+            'type': 'generate_content',
+            'topic': row.get('主题') or row.get('标题', ''),
+            'format': self.formats.get(row.get('平台'), self.default_format),
+            'requirements': {'title': row.get('标题', ''), 'cta': row.get('CTA', ''), 'platform': row.get('平台', '')},
+            'priority': 'batch',
+            'user_id': 'content_calendar'
+        }
+        try:
+            reply = await self.submit(request)
+            if reply['type'] == 'content_gen_result':
+                await asyncio.get_running_loop().run_in_executor(None, self.write_content, job, row, reply['data']['content'])
+                self.job_outcomes.labels(outcome='generated').inc()
+                await self.set_state(job, GENERATED)
+            elif reply['data'].get('retry_after') is not None:
+                # 被准入控制拒绝，稍后重试
+                self.defer(job, self.clock() + reply['data']['retry_after'])
+                await self.set_state(job, SCHEDULED)
+            else:
+                raise RuntimeError(reply['data'].get('error'))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.warn(f'预生成失败: {e}', row)
+            self.job_outcomes.labels(outcome='failed').inc()
+            await self.set_state(job, FAILED)
+        finally:
+            self.running.pop(job['key'], None)
+            self.update_gauges()
+
+    def row_of(self, job):
+        for row in self.calendars.get(job['path'], {}).get('rows', []):
+            if entry_key(job['path'], row) == job['key']:
+                return row
+        return None
+
+    def write_content(self, job, row, content):
+        output_dir = f"{os.path.splitext(job['path'])[0]}_generated"
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"{row.get('日期', '')}_{row.get('平台', '')}_{job['key'][:8]}.md"
+        if isinstance(content, dict):
+            # bundle 格式返回多个版本
+            content = '\n\n'.join(f'## {name}\n\n{text}' for name, text in content.items())
+        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(f"# {row.get('标题', '')}\n\n{content}\n\n{row.get('CTA', '')}\n")
+
+    async def set_state(self, job, state):
+        job['state'] = state
+        row = self.row_of(job)
+        if row is not None:
+            row[STATUS_COLUMN] = state
+            await self.save(job['path'])
+
+    async def save(self, path):
+        """写回日历，同一日历的写入依次进行"""
+        calendar = self.calendars[path]
+        async with calendar['lock']:
+            try:
+                calendar['mtime'] = await asyncio.get_running_loop().run_in_executor(
+                    None, write_calendar, path, calendar['fieldnames'], [dict(row) for row in calendar['rows']])
+            except OSError as e:
+                self.warn(f'写回内容日历失败: {e}', {'path': path})
+
+    def update_gauges(self):
+        self.pending.set(len(self.wheel) + len(self.ready))
+        self.inflight.set(len(self.running))
+
+    def warn(self, text, row):
+        self.log.warning(text, extra={'calendar_entry': {key: row.get(key) for key in ('path', '日期', '平台', '标题') if key in row}})
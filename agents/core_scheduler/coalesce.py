@@ -0,0 +1,94 @@
+"""相同请求的合并执行（single-flight）
+
+重试、重复点击或内容日历中的重复条目常在几秒内提交相同的请求。调度器对规范化后的
+请求内容计算指纹，已有相同请求在处理时，新请求不再转发，而是等待该请求的结果，
+结果到达后分发给所有等待的请求方，工作Agent和OpenAI额度只消耗一次。
+"""
+import hashlib
+import json
+import threading
+import time
+
+from a2a import metrics
+
+
+def normalize_text(value):
+    """合并连续空白，忽略首尾空白和大小写"""
+    return ' '.join(str(value).split()).casefold()
+
+
+def fingerprint(request):
+    """请求内容的指纹，不可合并的请求（如工作流）返回None"""
+    try:
+        if request['type'] == 'generate_content':
+            key = {
+                'type': request['type'],
+                'topic': normalize_text(request['topic']),
+                'format': request['format'],
+                'length': request.get('length', 'medium'),
+                'requirements': request.get('requirements', {})
+            }
+        elif request['type'] == 'analyze_data':
+            key = {
+                'type': request['type'],
+                'analysis_type': request['analysis_type'],
+                'dataset': request['dataset'],
+                'parameters': request.get('parameters', {})
+            }
+        else:
+            return None
+    except KeyError:
+        # 缺少字段的请求照常转发，由处理方报告错误
+        return None
+    encoded = json.dumps(key, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """按指纹登记处理中的请求，可在多个处理线程中调用
+
+    ttl秒后仍未完成的请求（如完成通知丢失）不再接收新的等待者，下一个相同请求重新执行。
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self.flights = {}
+        self.leaders = {}
+        self.lock = threading.Lock()
+        self.coalesced = metrics.counter('scheduler_coalesced_requests_total', 'Requests attached to an identical in-flight request',
+                                         ['type'])
+        self.inflight = metrics.gauge('scheduler_single_flight_inflight', 'Distinct request fingerprints being processed')
+        self.expired = metrics.counter('scheduler_single_flight_expired_total', 'In-flight requests replaced after the coalescing TTL')
+
+    def join(self, key, request_id, waiter, request_type):
+        """返回 (是否等待, 过期请求的等待者)
+
+        相同请求正在处理时登记为等待者，返回 (True, [])；否则登记为首个请求并返回False。
+        原有请求已超过ttl时，其等待者不会再收到结果，一并返回，由调用方回复错误。
+        """
+        now = time.time()
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None and now - flight['started_at'] < self.ttl:
+                flight['followers'].append(waiter)
+                self.coalesced.labels(type=request_type).inc()
+                return True, []
+            stale = []
+            if flight is not None:
+                self.leaders.pop(flight['request_id'], None)
+                stale = flight['followers']
+                self.expired.inc()
+            self.flights[key] = {'request_id': request_id, 'started_at': now, 'followers': []}
+            self.leaders[request_id] = key
+            self.inflight.set(len(self.flights))
+            return False, stale
+
+    def complete(self, request_id):
+        """首个请求完成（或失败），返回等待其结果的 [(消息, request_id), ...]"""
+        with self.lock:
+            key = self.leaders.pop(request_id, None)
+            if key is None:
+                return []
+            flight = self.flights.pop(key)
+            self.inflight.set(len(self.flights))
+            return flight['followers']
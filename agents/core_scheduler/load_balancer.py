@@ -0,0 +1,114 @@
+"""按工作Agent副本的负载选择转发目标
+
+工作Agent的副本发布负载信标（见 a2a.load）。调度器为每个副本记录信标中的处理中、缓冲
+消息数、并发上限和处理耗时，加上上次信标后本调度器已发给它的请求数，估算新请求在该副本上
+需要等待的时间（未完成的工作量）。DISPATCH_POLICY：
+- least_outstanding：选择所有存活副本中估算等待时间最短的
+- p2c：随机取两个副本，选择较空闲的一个（power of two choices），多个调度器副本同时转发时
+  不会一起涌向同一个最空闲的副本
+- shared：不使用信标，始终发往共享队列
+没有存活副本（未启用信标或信标超时）时发往共享队列，由副本竞争消费。
+"""
+import random
+import threading
+import time
+
+from a2a import metrics
+
+POLICIES = ('least_outstanding', 'p2c', 'shared')
+# 发往共享队列时指标中的副本名
+SHARED = 'shared'
+
+
+class LoadBalancer:
+    """可在多个处理线程中调用"""
+
+    def __init__(self, policy='least_outstanding', stale_after=3, rng=None, clock=time.time):
+        if policy not in POLICIES:
+            raise ValueError(f'未知的转发策略: {policy}')
+        self.policy = policy
+        self.stale_after = stale_after
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.replicas = {}
+        self.assignments = {}
+        self.lock = threading.Lock()
+        self.decisions = metrics.counter('scheduler_dispatch_decisions_total',
+                                         'Dispatch target decisions per worker agent and replica (shared = shared queue)',
+                                         ['agent', 'instance', 'policy'])
+        self.outstanding = metrics.gauge('scheduler_dispatch_outstanding', 'Requests dispatched to a replica and not yet completed',
+                                         ['agent', 'instance'])
+        self.live = metrics.gauge('scheduler_dispatch_live_replicas', 'Replicas with a recent load beacon', ['agent'])
+
+    @classmethod
+    def from_env(cls, environ):
+        return cls(environ.get('DISPATCH_POLICY', 'least_outstanding'),
+                   stale_after=float(environ.get('DISPATCH_BEACON_STALE_AFTER', '3')))
+
+    def update(self, beacon):
+        """记录副本的负载信标"""
+        with self.lock:
+            replicas = self.replicas.setdefault(beacon['agent_id'], {})
+            replica = replicas.setdefault(beacon['instance'], {'outstanding': 0})
+            replica.update(
+                active=beacon.get('active', 0),
+                queued=beacon.get('queued', 0),
+                capacity=max(beacon.get('capacity') or 1, 1),
+                latency=beacon.get('latency'),
+                # 信标间隔的若干倍内没有新信标时视为副本已退出
+                expires_at=self.clock() + self.stale_after * max(beacon.get('interval') or 1, 0.01),
+                # 信标已包含此前转发的请求
+                sent=0
+            )
+
+    def live_replicas(self, agent):
+        now = self.clock()
+        replicas = self.replicas.get(agent, {})
+        for instance in [instance for instance, replica in replicas.items() if replica['expires_at'] <= now]:
+            del replicas[instance]
+            self.outstanding.labels(agent=agent, instance=instance).set(0)
+            # 发给已退出副本的请求不会再有完成通知
+            for key in [key for key, assignment in self.assignments.items() if assignment == (agent, instance)]:
+                del self.assignments[key]
+        self.live.labels(agent=agent).set(len(replicas))
+        return replicas
+
+    def expected_wait(self, replica, replicas):
+        """排在前面的请求数除以并发上限，乘以处理耗时；尚无耗时的副本按其他副本的平均值估算"""
+        latencies = [other['latency'] for other in replicas.values() if other['latency']]
+        latency = replica['latency'] or (sum(latencies) / len(latencies) if latencies else 1)
+        backlog = replica['active'] + replica['queued'] + replica['sent']
+        return (backlog + 1) / replica['capacity'] * latency
+
+    def pick(self, agent, key):
+        """为请求选择副本并记录，返回副本ID；应发往共享队列时返回None"""
+        with self.lock:
+            replicas = self.live_replicas(agent) if self.policy != 'shared' else {}
+            if not replicas:
+                self.decisions.labels(agent=agent, instance=SHARED, policy=self.policy).inc()
+                return None
+            candidates = sorted(replicas)
+            if self.policy == 'p2c' and len(candidates) > 2:
+                candidates = self.rng.sample(candidates, 2)
+            instance = min(candidates, key=lambda name: self.expected_wait(replicas[name], replicas))
+            replica = replicas[instance]
+            replica['sent'] += 1
+            replica['outstanding'] += 1
+            self.assignments[key] = (agent, instance)
+            self.outstanding.labels(agent=agent, instance=instance).set(replica['outstanding'])
+            self.decisions.labels(agent=agent, instance=instance, policy=self.policy).inc()
+            return instance
+
+    def done(self, key):
+        """请求完成（或失败），释放其在副本上的计数"""
+        with self.lock:
+            assignment = self.assignments.pop(key, None)
+            if assignment is None:
+                return
+            agent, instance = assignment
+            replica = self.replicas.get(agent, {}).get(instance)
+            if replica is None:
+                return
+            replica['outstanding'] = max(replica['outstanding'] - 1, 0)
+            replica['sent'] = max(replica['sent'] - 1, 0)
+            self.outstanding.labels(agent=agent, instance=instance).set(replica['outstanding'])
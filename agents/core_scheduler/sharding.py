@@ -0,0 +1,101 @@
+"""核心调度Agent的分片
+
+准入队列、合并执行和工作流都保存在调度器进程内，多个副本竞争消费同一个 core_scheduler
+队列时这些状态会分散到各副本。分片模式下每个副本有自己的分片ID（SCHEDULER_SHARD_ID）、
+专用队列 core_scheduler.<分片ID>（路由键 agent.core_scheduler.<分片ID>），并在一致性哈希环上
+负责一段用户（或request_id）。副本仍共同消费 core_scheduler 入口队列，收到不属于自己的请求时
+原样转交给负责的副本，因此API网关无需感知分片。
+
+副本通过 scheduler.members 路由键定期广播心跳，各自维护存活成员并重建哈希环；副本加入或
+离开时只有相邻区间的键改变归属。归属变化前已接收的请求仍由原副本处理完成（结果发回其
+专用队列），所以成员视图短暂不一致只影响去重和公平排队的精度，不影响正确性。
+"""
+import bisect
+import hashlib
+import threading
+import time
+
+from a2a import metrics
+
+SCHEDULER_ID = 'core_scheduler'
+# 成员心跳和离开通知的路由键
+MEMBERS_ROUTING_KEY = 'scheduler.members'
+
+
+def shard_agent_id(shard_id):
+    """分片副本的agent_id，未分片时为 core_scheduler"""
+    return f'{SCHEDULER_ID}.{shard_id}' if shard_id else SCHEDULER_ID
+
+
+def ring_hash(value):
+    return int(hashlib.md5(str(value).encode('utf-8')).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """一致性哈希环，每个成员放置vnodes个虚拟节点使区间大小均匀"""
+
+    def __init__(self, members, vnodes=64):
+        self.members = sorted(members)
+        self.points = sorted((ring_hash(f'{member}#{n}'), member) for member in self.members for n in range(vnodes))
+        self.hashes = [point for point, _ in self.points]
+
+    def owner(self, key):
+        if not self.points:
+            return None
+        index = bisect.bisect(self.hashes, ring_hash(key)) % len(self.points)
+        return self.points[index][1]
+
+
+class ShardMembership:
+    """根据心跳维护存活的副本和哈希环，可在多个处理线程中调用"""
+
+    def __init__(self, shard_id, ttl=6, vnodes=64, clock=time.time):
+        self.shard_id = shard_id
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.clock = clock
+        self.members = {shard_id: clock()}
+        self.ring = HashRing(self.members, vnodes)
+        self.lock = threading.Lock()
+        self.member_count = metrics.gauge('scheduler_shard_members', 'Live scheduler replicas in the hash ring')
+        self.rebalances = metrics.counter('scheduler_shard_rebalances_total', 'Hash ring rebuilds after replicas joined or left')
+        self.forwarded = metrics.counter('scheduler_shard_forwarded_total', 'Requests handed to the replica that owns them',
+                                         ['shard'])
+        self.member_count.set(1)
+
+    def owner(self, key):
+        with self.lock:
+            return self.ring.owner(key)
+
+    def heartbeat(self, member):
+        """记录副本的心跳，新成员加入时返回True"""
+        with self.lock:
+            joined = member not in self.members
+            self.members[member] = self.clock()
+            if joined:
+                self.rebuild()
+            return joined
+
+    def leave(self, member):
+        with self.lock:
+            if member == self.shard_id or self.members.pop(member, None) is None:
+                return False
+            self.rebuild()
+            return True
+
+    def expire(self):
+        """移除超过ttl秒没有心跳的副本，返回被移除的成员"""
+        with self.lock:
+            now = self.clock()
+            self.members[self.shard_id] = now
+            expired = [member for member, seen in self.members.items() if now - seen > self.ttl]
+            for member in expired:
+                del self.members[member]
+            if expired:
+                self.rebuild()
+            return expired
+
+    def rebuild(self):
+        self.ring = HashRing(self.members, self.vnodes)
+        self.member_count.set(len(self.members))
+        self.rebalances.inc()
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from a2a.transport import InMemoryBus, InMemoryTransport
+from admission import AdmissionController, FairQueue, Rejected, TokenBucket, parse_tiers
+from main import CoreSchedulerAgent
+from task_store import DONE, ERROR
+from test_workflow import StubWorker
+
+
+class TestFairQueue(unittest.TestCase):
+    def test_users_share_dispatch_slots_by_weight(self):
+        queue = FairQueue()
+        for n in range(20):
+            queue.put('heavy', f'h{n}', 1, 1)
+        for n in range(3):
+            queue.put('light', f'l{n}', 1, 1)
+        order = [queue.get()[1] for _ in range(8)]
+        # 后到的用户不必等待先到用户的全部请求
+        self.assertEqual(order[:6], ['h0', 'l0', 'h1', 'l1', 'h2', 'l2'])
+
+        queue = FairQueue()
+        for n in range(6):
+            queue.put('pro', f'p{n}', 1, 2)
+            queue.put('free', f'f{n}', 1, 1)
+        order = [queue.get()[0] for _ in range(6)]
+        self.assertEqual(order.count('pro'), 4)
+
+    def test_expensive_requests_consume_more_quantum(self):
+        queue = FairQueue()
+        queue.put('a', 'workflow', 4, 1)
+        queue.put('b', 'b0', 1, 1)
+        queue.put('b', 'b1', 1, 1)
+        queue.put('b', 'b2', 1, 1)
+        order = [queue.get()[1] for _ in range(4)]
+        self.assertEqual(order, ['b0', 'b1', 'b2', 'workflow'])
+        self.assertIsNone(queue.get())
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_token_bucket_retry_after(self):
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+        self.assertEqual(bucket.take(1, 0), 0)
+        self.assertEqual(bucket.take(1, 0), 0)
+        self.assertAlmostEqual(bucket.take(1, 0), 0.5)
+        self.assertEqual(bucket.take(1, 0.5), 0)
+
+    def test_rejects_and_limits_inflight(self):
+        admission = AdmissionController(parse_tiers('free:100:3,pro:100:100'), 'free', max_queue=10, max_inflight=2)
+        for n in range(3):
+            admission.submit('u1', None, 'generate_content', f'r{n}', n)
+        with self.assertRaises(Rejected) as context:
+            admission.submit('u1', 'unknown_tier', 'generate_content', 'r3', 3)
+        self.assertEqual(context.exception.reason, 'rate_limited')
+        self.assertGreater(context.exception.retry_after, 0)
+        # 其他用户和其他等级有各自的令牌桶
+        admission.submit('u1', 'pro', 'generate_content', 'r4', 4)
+
+        self.assertEqual(admission.ready(), [0, 1])
+        self.assertEqual(admission.ready(), [])
+        self.assertTrue(admission.release('r0'))
+        self.assertFalse(admission.release('r0'))
+        self.assertEqual(admission.ready(), [2])
+
+        full = AdmissionController(parse_tiers('free:100:100'), 'free', max_queue=2, max_inflight=1)
+        for n in range(3):
+            full.submit('u1', None, 'analyze_data', f'r{n}', n)
+            full.ready()
+        # 一个进行中，两个等待
+        with self.assertRaises(Rejected) as context:
+            full.submit('u1', None, 'analyze_data', 'r3', 3)
+        self.assertEqual(context.exception.reason, 'queue_full')
+
+    def test_paused_tiers(self):
+        # 所有等级速率为0：桶中剩余的令牌仍可使用，用完后拒绝
+        paused = AdmissionController(parse_tiers('free:0:1,pro:0:2'), 'free')
+        paused.submit('u1', None, 'generate_content', 'r0', 0)
+        paused.submit('u2', 'pro', 'generate_content', 'r1', 1)
+        with self.assertRaises(Rejected) as context:
+            paused.submit('u1', None, 'generate_content', 'r2', 2)
+        self.assertEqual(context.exception.reason, 'rate_limited')
+        self.assertEqual(paused.ready(), [0, 1])
+        # 只暂停部分等级时，该等级已接受的请求仍能转发
+        mixed = AdmissionController(parse_tiers('free:0:1,pro:10:10'), 'free')
+        mixed.submit('u1', None, 'generate_content', 'r0', 0)
+        self.assertEqual(mixed.ready(), [0])
+
+
+class TestSchedulerAdmission(unittest.TestCase):
+    def test_heavy_user_does_not_block_others(self):
+        bus = InMemoryBus()
+        env = {'TASK_STORE_URL': 'none', 'ADMISSION_TIERS': 'free:1000:30', 'ADMISSION_MAX_QUEUE': '20',
+               'ADMISSION_MAX_INFLIGHT': '2'}
+        with patch('main.start_http_server'), patch.dict(os.environ, env):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0.05)
+
+        async def run():
+            await scheduler.startup()
+            await content.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+
+            def request(user, n):
+                return gateway.call('core_scheduler', 'user_request', {
+                    'id': f'{user}-{n}', 'type': 'generate_content', 'topic': f'AI {n}', 'format': 'summary', 'user_id': user
+                }, timeout=10)
+            try:
+                heavy = [asyncio.ensure_future(request('heavy', n)) for n in range(25)]
+                await asyncio.sleep(0.05)
+                light = await request('light', 0)
+                self.assertEqual(light['type'], 'content_gen_result')
+                # 轻量用户的请求在重度用户的积压完成前被处理
+                self.assertLess(sum(task.done() for task in heavy), 10)
+
+                replies = await asyncio.gather(*heavy)
+                rejected = [reply for reply in replies if reply['type'] == 'error']
+                self.assertEqual(len(rejected), 3)
+                self.assertEqual(rejected[0]['data']['reason'], 'queue_full')
+                self.assertGreater(rejected[0]['data']['retry_after'], 0)
+            finally:
+                for agent in (gateway, content, scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+
+    def test_requests_expire_in_the_admission_queue(self):
+        bus = InMemoryBus()
+        env = {'TASK_STORE_URL': 'none', 'ADMISSION_MAX_INFLIGHT': '1', 'SCHEDULER_SLAS': 'generate_content:0.2'}
+        with patch('main.start_http_server'), patch.dict(os.environ, env):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0.3)
+
+        async def run():
+            await scheduler.startup()
+            await content.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+            try:
+                start = time.time()
+                replies = await asyncio.gather(*[
+                    gateway.call('core_scheduler', 'user_request', {
+                        'id': f'req-{n}', 'type': 'generate_content', 'topic': f'AI {n}', 'format': 'summary'
+                    }, timeout=5)
+                    for n in range(2)
+                ])
+                self.assertEqual(replies[0]['type'], 'content_gen_result')
+                # 第二个请求等待转发名额期间超过SLA，不再转发
+                self.assertEqual(replies[1]['type'], 'error')
+                self.assertTrue(replies[1]['data']['expired'])
+                self.assertEqual(len(content.requests), 1)
+                self.assertAlmostEqual(content.deadlines[0], start + 0.2, delta=0.1)
+            finally:
+                for agent in (gateway, content, scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+
+    def test_failed_publish_in_event_loop_releases_slot(self):
+        bus = InMemoryBus()
+        env = {'TASK_STORE_URL': 'none', 'ADMISSION_MAX_INFLIGHT': '1'}
+        with patch('main.start_http_server'), patch.dict(os.environ, env):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+
+        async def run():
+            await scheduler.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+            try:
+                calls = [asyncio.ensure_future(gateway.call('core_scheduler', 'user_request', {
+                    'id': f'req-{n}', 'type': 'generate_content', 'topic': f'AI {n}', 'format': 'summary'
+                }, timeout=5)) for n in range(2)]
+                while scheduler.task_store.get('req-1') is None:
+                    await asyncio.sleep(0.01)
+                # 第一个请求完成（例如工作流在事件循环中结束）后转发等待的请求，发送失败
+                with patch.object(scheduler, 'publish', AsyncMock(side_effect=ConnectionError('连接已断开'))):
+                    scheduler.finish_task('req-0', DONE)
+                    reply = await asyncio.wait_for(calls[1], 5)
+                calls[0].cancel()
+                return reply
+            finally:
+                for agent in (gateway, scheduler):
+                    await agent.close()
+
+        reply = asyncio.run(run())
+        self.assertEqual(reply['type'], 'error')
+        self.assertIn('连接已断开', reply['data']['error'])
+        self.assertEqual(scheduler.task_store.get('req-1')['status'], ERROR)
+        self.assertEqual(len(scheduler.admission.inflight), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import asyncio
+import csv
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from a2a.transport import InMemoryBus, InMemoryTransport
+from calendar_planner import (FAILED, GENERATED, GENERATING, SCHEDULED, CalendarPlanner, TimingWheel, in_window,
+                              next_offpeak, parse_windows)
+from main import CoreSchedulerAgent
+from test_workflow import StubWorker
+
+HEADER = ['日期', '平台', '主题', '标题', 'CTA', '状态']
+
+
+def local(*args):
+    return datetime.datetime(*args).timestamp()
+
+
+def write_rows(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def read_states(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return {row['标题']: row['状态'] for row in csv.DictReader(f)}
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimeHelpers(unittest.TestCase):
+    def test_timing_wheel(self):
+        wheel = TimingWheel(tick=60, slots=10, now=0)
+        wheel.schedule(30, 'now')
+        wheel.schedule(120, 'soon')
+        wheel.schedule(60 * 25, 'next_round')
+        self.assertEqual(wheel.advance(60), ['now'])
+        self.assertEqual(wheel.advance(180), ['soon'])
+        # 同一个槽中下一圈的任务不会提前到期
+        self.assertEqual(wheel.advance(60 * 15), [])
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.advance(60 * 100), ['next_round'])
+
+    def test_offpeak_windows(self):
+        windows = parse_windows('22:00-02:00,04:00-06:00')
+        self.assertEqual(windows, [(1320, 120), (240, 360)])
+        self.assertTrue(in_window(local(2030, 1, 8, 23, 30), windows))
+        self.assertTrue(in_window(local(2030, 1, 8, 1, 0), windows))
+        self.assertFalse(in_window(local(2030, 1, 8, 3, 0), windows))
+        self.assertEqual(next_offpeak(local(2030, 1, 8, 3, 0), windows), local(2030, 1, 8, 4, 0))
+        self.assertEqual(next_offpeak(local(2030, 1, 8, 12, 0), windows), local(2030, 1, 8, 22, 0))
+        self.assertEqual(next_offpeak(local(2030, 1, 8, 1, 0), windows), local(2030, 1, 8, 1, 0))
+
+
+class TestCalendarPlanner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'calendar.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_jobs_run_in_offpeak_windows_within_budget(self):
+        write_rows(self.path, [
+            ['2030-01-10', '知乎', 'AI伦理', 'A', '加微信', '未开始'],
+            ['2030-01-10', 'B站', 'Sora', 'B', '评论区互动', '未开始'],
+            ['2030-01-08', '知乎', '大模型落地', 'C', '获取报告', '未开始'],
+            ['2030-01-01', '知乎', '已过期', 'D', '', '未开始'],
+            ['2030-01-20', '知乎', '已发布', 'E', '', '已完成'],
+        ])
+        clock = FakeClock(local(2030, 1, 7, 12, 0))
+        submitted = []
+        results = {}
+
+        async def submit(request):
+            submitted.append(request)
+            results[request['requirements']['title']] = asyncio.get_running_loop().create_future()
+            return await results[request['requirements']['title']]
+
+        planner = CalendarPlanner(submit, [self.path], logging.getLogger('calendar_test'), windows=parse_windows('02:00-04:00'),
+                                  lead_time=48 * 3600, budget=1, clock=clock)
+
+        async def run():
+            self.assertEqual(await planner.ingest(self.path), 3)
+            self.assertEqual(read_states(self.path), {'A': SCHEDULED, 'B': SCHEDULED, 'C': SCHEDULED, 'D': '未开始', 'E': '已完成'})
+
+            # C在发布前已没有低峰时段，立即生成；A、B要到8日2点之后
+            await planner.advance()
+            await asyncio.sleep(0)
+            self.assertEqual([request['requirements']['title'] for request in submitted], ['C'])
+            self.assertEqual(submitted[0]['format'], 'article')
+            results['C'].set_result({'type': 'error', 'data': {'error': '生成失败'}})
+            await asyncio.sleep(0.01)
+
+            clock.now = local(2030, 1, 8, 2, 30)
+            await planner.advance()
+            await asyncio.sleep(0)
+            self.assertEqual(read_states(self.path)['A'], GENERATING)
+            # 预算为1，B等待A完成；A完成时低峰时段已结束，B顺延到第二天
+            clock.now = local(2030, 1, 8, 5, 0)
+            results['A'].set_result({'type': 'content_gen_result', 'data': {'content': '正文'}})
+            await asyncio.sleep(0.01)
+            await planner.advance()
+            await asyncio.sleep(0)
+            self.assertEqual(len(submitted), 2)
+            self.assertEqual(read_states(self.path)['B'], SCHEDULED)
+
+            clock.now = local(2030, 1, 9, 2, 0)
+            await planner.advance()
+            await asyncio.sleep(0)
+            results['B'].set_result({'type': 'content_gen_result', 'data': {'content': '视频脚本'}})
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        self.assertEqual(read_states(self.path), {'A': GENERATED, 'B': GENERATED, 'C': FAILED, 'D': '未开始', 'E': '已完成'})
+        generated = os.listdir(os.path.join(self.directory, 'calendar_generated'))
+        self.assertEqual(len(generated), 2)
+
+    def test_calendar_handed_over_to_another_replica(self):
+        write_rows(self.path, [['2030-01-10', '知乎', 'AI伦理', 'A', '', '未开始'],
+                               ['2030-01-20', '知乎', 'Sora', 'B', '', '未开始']])
+        clock = FakeClock(local(2030, 1, 9, 12, 0))
+        submitted = []
+        owned = [True]
+
+        async def submit(request):
+            submitted.append(request)
+            await asyncio.Future()
+
+        planner = CalendarPlanner(submit, [self.path], logging.getLogger('calendar_test'), lead_time=48 * 3600, budget=2,
+                                  owns=lambda path: owned[0], clock=clock)
+
+        async def run():
+            await planner.advance()
+            await asyncio.sleep(0)
+            self.assertEqual(len(submitted), 1)
+            task = planner.running[next(iter(planner.running))]
+
+            # 哈希环变化后日历归其他副本，本副本取消任务并不再处理到期的条目
+            owned[0] = False
+            clock.now = local(2030, 1, 19, 12, 0)
+            await planner.advance()
+            await asyncio.sleep(0)
+            self.assertTrue(task.cancelled())
+            self.assertEqual((planner.jobs, planner.running), ({}, {}))
+            self.assertEqual(len(submitted), 1)
+
+            # 重新负责时从日历中的状态接续
+            owned[0] = True
+            await planner.advance()
+            await asyncio.sleep(0)
+            self.assertEqual(sorted(request['requirements']['title'] for request in submitted), ['A', 'B'])
+            for task in planner.running.values():
+                task.cancel()
+
+        asyncio.run(run())
+        # 写回日历使用唯一的临时文件，不会留下残留
+        self.assertEqual(os.listdir(self.directory), ['calendar.csv'])
+
+    def test_scheduler_pregenerates_calendar(self):
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        write_rows(self.path, [[tomorrow.isoformat(), '知乎', f'主题{n}', f'标题{n}', 'CTA', '未开始'] for n in range(4)])
+        bus = InMemoryBus()
+        environ = {'TASK_STORE_URL': 'none', 'CALENDAR_FILES': self.path, 'CALENDAR_OFFPEAK': '00:00-24:00',
+                   'CALENDAR_TICK': '0.02', 'CALENDAR_CONCURRENCY': '2'}
+        with patch('main.start_http_server'), patch.dict(os.environ, environ):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0.05)
+        submit = scheduler.calendar.submit
+        active = []
+        peak = []
+
+        async def counting_submit(request):
+            active.append(request['id'])
+            peak.append(len(active))
+            try:
+                return await submit(request)
+            finally:
+                active.remove(request['id'])
+
+        scheduler.calendar.submit = counting_submit
+
+        async def run():
+            await scheduler.startup()
+            await content.startup()
+            try:
+                for _ in range(200):
+                    if set(read_states(self.path).values()) == {GENERATED}:
+                        break
+                    await asyncio.sleep(0.02)
+            finally:
+                await content.close()
+                await scheduler.close()
+
+        asyncio.run(run())
+        self.assertEqual(set(read_states(self.path).values()), {GENERATED})
+        self.assertEqual(len(content.requests), 4)
+        self.assertTrue(all(request['user_id'] == 'core_scheduler' for request in content.requests))
+        self.assertEqual(max(peak), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import aio_pika
+
+from a2a.transport import InMemoryBus, InMemoryTransport
+from coalesce import SingleFlight, fingerprint
+from main import CoreSchedulerAgent
+from task_store import DONE, ERROR
+from test_workflow import StubWorker
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_normalized_payloads_match(self):
+        request = {'type': 'generate_content', 'topic': 'AI 产品经理', 'format': 'article', 'requirements': {'a': 1, 'b': 2}}
+        same = {'type': 'generate_content', 'topic': '  ai   产品经理 ', 'format': 'article', 'length': 'medium',
+                'requirements': {'b': 2, 'a': 1}, 'priority': 'batch', 'user_id': 'u2'}
+        self.assertEqual(fingerprint(request), fingerprint(same))
+        self.assertNotEqual(fingerprint(request), fingerprint(dict(request, format='summary')))
+
+        dataset = [{'date': '2023-01-01', 'views': 1}]
+        analysis = {'type': 'analyze_data', 'analysis_type': 'trend_analysis', 'dataset': dataset}
+        self.assertEqual(fingerprint(analysis), fingerprint(dict(analysis, dataset=[{'views': 1, 'date': '2023-01-01'}])))
+        self.assertIsNone(fingerprint({'type': 'content_workflow', 'workflow_id': 'content_pipeline'}))
+        self.assertIsNone(fingerprint({'type': 'generate_content', 'format': 'article'}))
+
+    def test_single_flight(self):
+        flights = SingleFlight(ttl=60)
+        self.assertEqual(flights.join('k', 'r1', 'w1', 'generate_content'), (False, []))
+        self.assertEqual(flights.join('k', 'r2', 'w2', 'generate_content'), (True, []))
+        self.assertEqual(flights.join('k', 'r3', 'w3', 'generate_content'), (True, []))
+        self.assertEqual(flights.complete('r2'), [])
+        self.assertEqual(flights.complete('r1'), ['w2', 'w3'])
+        # 完成后的相同请求重新执行
+        self.assertEqual(flights.join('k', 'r4', 'w4', 'generate_content'), (False, []))
+
+    def test_expired_flight_returns_its_followers(self):
+        flights = SingleFlight(ttl=0.01)
+        flights.join('k', 'r1', 'w1', 'generate_content')
+        flights.join('k', 'r2', 'w2', 'generate_content')
+        time.sleep(0.02)
+
+        # 超时的请求被替换，等待它的请求交给调用方处理，不会被遗忘
+        self.assertEqual(flights.join('k', 'r3', 'w3', 'generate_content'), (False, ['w2']))
+        self.assertEqual(flights.complete('r1'), [])
+        self.assertEqual(flights.complete('r3'), [])
+
+
+class TestSchedulerCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'none'}):
+            self.scheduler = CoreSchedulerAgent(InMemoryTransport(self.bus))
+        self.content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(self.bus), delay=0.1)
+
+    def run_agents(self, scenario):
+        async def run():
+            await self.scheduler.startup()
+            await self.content.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(self.bus))
+            await gateway.startup()
+            try:
+                await scenario(gateway)
+            finally:
+                for agent in (gateway, self.content, self.scheduler):
+                    await agent.close()
+        asyncio.run(run())
+
+    def test_duplicate_rpc_requests_share_one_result(self):
+        async def scenario(gateway):
+            replies = await asyncio.gather(*[
+                gateway.call('core_scheduler', 'user_request', {
+                    'id': f'req-{n}', 'type': 'generate_content', 'topic': 'AI产品经理', 'format': 'summary', 'user_id': f'u{n}'
+                }, timeout=5)
+                for n in range(3)
+            ])
+            self.assertEqual([reply['data']['request_id'] for reply in replies], ['req-0', 'req-1', 'req-2'])
+            self.assertTrue(all(reply['data']['content'] == 'summary:AI产品经理' for reply in replies))
+            self.assertEqual(len(self.content.requests), 1)
+            for n in range(3):
+                self.assertEqual(self.scheduler.task_store.get(f'req-{n}')['status'], DONE)
+
+        self.run_agents(scenario)
+
+    def test_errors_fan_out_to_forwarded_requests(self):
+        async def scenario(gateway):
+            results = asyncio.Queue()
+
+            async def on_result(incoming):
+                await incoming.ack()
+                results.put_nowait(json.loads(incoming.body))
+
+            transport = InMemoryTransport(self.bus)
+            queue = await transport.declare_queue('gateway_results')
+            await transport.bind(queue, 'agent.api_gateway')
+            await transport.consume(queue, on_result)
+            for n in range(2):
+                message = {'source': 'api_gateway', 'target': 'core_scheduler', 'type': 'user_request',
+                           'data': {'id': f'req-{n}', 'type': 'generate_content', 'topic': 'AI', 'format': 'article',
+                                    'requirements': {'fail': True}},
+                           'timestamp': time.time()}
+                await transport.publish(aio_pika.Message(body=json.dumps(message).encode('utf-8')), 'agent.core_scheduler')
+            received = [await asyncio.wait_for(results.get(), 5) for _ in range(2)]
+
+            self.assertEqual(sorted(result['data']['request_id'] for result in received), ['req-0', 'req-1'])
+            self.assertTrue(all(result['type'] == 'error' and result['data']['error'] == '生成失败' for result in received))
+            self.assertEqual(len(self.content.requests), 1)
+            self.assertEqual(self.scheduler.task_store.get('req-1')['status'], ERROR)
+
+        self.run_agents(scenario)
+
+    def test_followers_of_expired_flight_get_an_error(self):
+        self.scheduler.single_flight = SingleFlight(ttl=0.2)
+        self.content.delay = 1
+
+        async def scenario(gateway):
+            request = {'type': 'generate_content', 'topic': 'AI产品经理', 'format': 'summary'}
+            leader = asyncio.ensure_future(gateway.call('core_scheduler', 'user_request', dict(request, id='req-0'), timeout=5))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(gateway.call('core_scheduler', 'user_request', dict(request, id='req-1'), timeout=5))
+            await asyncio.sleep(0.3)
+            # 首个请求超过ttl仍未完成，新的相同请求重新执行，原等待者收到错误而不是一直等待
+            retry = asyncio.ensure_future(gateway.call('core_scheduler', 'user_request', dict(request, id='req-2'), timeout=5))
+
+            reply = await asyncio.wait_for(follower, 0.5)
+            self.assertEqual(reply['type'], 'error')
+            self.assertEqual(reply['data']['request_id'], 'req-1')
+            self.assertEqual(self.scheduler.task_store.get('req-1')['status'], ERROR)
+            self.assertEqual([r['type'] for r in await asyncio.gather(leader, retry)], ['content_gen_result'] * 2)
+            self.assertEqual(len(self.content.requests), 2)
+
+        self.run_agents(scenario)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import random
+import unittest
+from unittest.mock import patch
+
+from a2a.transport import InMemoryBus, InMemoryTransport
+from load_balancer import LoadBalancer
+from main import CoreSchedulerAgent
+from test_workflow import StubWorker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def beacon(instance, active=0, queued=0, latency=1.0, capacity=4):
+    return {'agent_id': 'content_gen_agent', 'instance': instance, 'active': active, 'queued': queued,
+            'capacity': capacity, 'latency': latency, 'interval': 1}
+
+
+class TestLoadBalancer(unittest.TestCase):
+    def test_least_outstanding_work(self):
+        clock = FakeClock()
+        balancer = LoadBalancer('least_outstanding', stale_after=3, clock=clock)
+        self.assertIsNone(balancer.pick('content_gen_agent', 'r0'))
+
+        balancer.update(beacon('a', active=4, latency=1.0))
+        balancer.update(beacon('b', active=0, latency=2.0))
+        balancer.update(beacon('c', active=1, latency=None))
+        # a: 5/4*1，b: 1/4*2，c: 2/4*1.5（按其他副本的平均耗时估算）
+        self.assertEqual(balancer.pick('content_gen_agent', 'r1'), 'b')
+        # 已发给b的请求计入其积压，下一个请求选择c
+        self.assertEqual(balancer.pick('content_gen_agent', 'r2'), 'c')
+        self.assertEqual(balancer.replicas['content_gen_agent']['b']['outstanding'], 1)
+        balancer.done('r1')
+        self.assertEqual(balancer.replicas['content_gen_agent']['b']['outstanding'], 0)
+
+        # 信标超时的副本不再被选择，全部超时后退回共享队列
+        clock.now = 2
+        balancer.update(beacon('a', active=4, latency=1.0))
+        clock.now = 4
+        self.assertEqual(balancer.pick('content_gen_agent', 'r3'), 'a')
+        self.assertNotIn('r2', balancer.assignments)
+        clock.now = 10
+        self.assertIsNone(balancer.pick('content_gen_agent', 'r4'))
+
+    def test_power_of_two_choices(self):
+        balancer = LoadBalancer('p2c', rng=random.Random(7))
+        for name, active in (('a', 0), ('b', 8), ('c', 8), ('d', 8)):
+            balancer.update(beacon(name, active=active))
+        picks = []
+        for n in range(200):
+            picks.append(balancer.pick('content_gen_agent', f'r{n}'))
+            balancer.done(f'r{n}')
+        # 随机的两个候选中选较空闲者，空闲副本只在被抽中时获得请求
+        self.assertGreater(picks.count('a'), 80)
+        self.assertEqual(set(picks), {'a', 'b', 'c', 'd'})
+        self.assertIsNone(LoadBalancer('shared').pick('content_gen_agent', 'r'))
+        with self.assertRaises(ValueError):
+            LoadBalancer('random')
+
+
+class TestLoadAwareDispatch(unittest.TestCase):
+    def test_busy_replica_receives_less_work(self):
+        bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'none'}):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        replicas = {}
+        for name, delay in (('fast', 0.02), ('slow', 0.3)):
+            with patch.dict(os.environ, {'A2A_LOAD_BEACON_INTERVAL': '0.05', 'A2A_INSTANCE_ID': name}):
+                replicas[name] = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=delay)
+
+        async def run():
+            await scheduler.startup()
+            for replica in replicas.values():
+                await replica.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+            try:
+                # 等待第一批信标
+                await asyncio.sleep(0.1)
+                replies = []
+                for batch in range(4):
+                    replies += await asyncio.gather(*[
+                        gateway.call('core_scheduler', 'user_request', {
+                            'id': f'req-{batch}-{n}', 'type': 'generate_content', 'topic': f'AI {batch} {n}',
+                            'format': 'summary', 'user_id': f'u{n}'
+                        }, timeout=5)
+                        for n in range(4)
+                    ])
+                self.assertTrue(all(reply['type'] == 'content_gen_result' for reply in replies))
+            finally:
+                for agent in (gateway, *replicas.values(), scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+        fast, slow = len(replicas['fast'].requests), len(replicas['slow'].requests)
+        self.assertEqual(fast + slow, 16)
+        self.assertGreater(fast, slow * 2)
+
+    def test_requests_for_an_exited_replica_fall_back_to_the_shared_queue(self):
+        bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'none'}):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        env = {'A2A_LOAD_BEACON_INTERVAL': '0.05', 'A2A_INSTANCE_ID': 'gone', 'A2A_INSTANCE_QUEUE_TTL': '0.1'}
+        with patch.dict(os.environ, env):
+            gone = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0.01)
+        # 不发布信标的副本只消费共享队列
+        survivor = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0.01)
+
+        async def run():
+            await scheduler.startup()
+            await gone.startup()
+            await survivor.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+            try:
+                await asyncio.sleep(0.08)
+                await gone.close()
+                # 信标尚未过期，调度器仍把请求发到已退出副本的专用队列，消息超过TTL后回到共享队列
+                self.assertEqual(scheduler.balancer.pick('content_gen_agent', 'probe'), 'gone')
+                scheduler.balancer.done('probe')
+                reply = await gateway.call('core_scheduler', 'user_request', {
+                    'id': 'req-1', 'type': 'generate_content', 'topic': 'AI', 'format': 'summary', 'user_id': 'u1'
+                }, timeout=2)
+                self.assertEqual(reply['type'], 'content_gen_result')
+            finally:
+                for agent in (gateway, survivor, scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(gone.requests), 0)
+        self.assertEqual(len(survivor.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+from a2a.transport import InMemoryBus, InMemoryTransport
+from main import CoreSchedulerAgent
+from sharding import HashRing, ShardMembership
+from test_workflow import StubWorker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHashRing(unittest.TestCase):
+    def test_adding_a_member_moves_only_its_share(self):
+        keys = [f'user-{n}' for n in range(3000)]
+        before = HashRing(['a', 'b'])
+        after = HashRing(['a', 'b', 'c'])
+        owners = [before.owner(key) for key in keys]
+        self.assertLess(abs(owners.count('a') - owners.count('b')), 600)
+        moved = [key for key, owner in zip(keys, owners) if after.owner(key) != owner]
+        # 只有分给新成员的键改变归属，约占三分之一
+        self.assertTrue(all(after.owner(key) == 'c' for key in moved))
+        self.assertLess(abs(len(moved) - 1000), 300)
+        self.assertIsNone(HashRing([]).owner('x'))
+
+    def test_membership_expires_silent_replicas(self):
+        clock = FakeClock()
+        shards = ShardMembership('a', ttl=5, clock=clock)
+        self.assertTrue(shards.heartbeat('b'))
+        self.assertFalse(shards.heartbeat('b'))
+        self.assertEqual(shards.ring.members, ['a', 'b'])
+        clock.now = 10
+        self.assertEqual(shards.expire(), ['b'])
+        self.assertEqual({shards.owner(f'user-{n}') for n in range(50)}, {'a'})
+        shards.heartbeat('c')
+        self.assertTrue(shards.leave('c'))
+        self.assertFalse(shards.leave('a'))
+
+
+class TestShardedSchedulers(unittest.TestCase):
+    def test_replicas_split_users_and_rebalance(self):
+        bus = InMemoryBus()
+        replicas = {}
+        for shard in ('a', 'b'):
+            env = {'TASK_STORE_URL': 'none', 'SCHEDULER_SHARD_ID': shard, 'SCHEDULER_SHARD_HEARTBEAT': '0.05'}
+            with patch('main.start_http_server'), patch.dict(os.environ, env):
+                replicas[shard] = CoreSchedulerAgent(InMemoryTransport(bus))
+        content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0.01)
+        users = [f'user-{n}' for n in range(12)]
+
+        def handled_by(request_id):
+            return [shard for shard, replica in replicas.items() if replica.task_store.get(request_id)]
+
+        async def run():
+            for replica in replicas.values():
+                await replica.startup()
+            await content.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+
+            async def send(round_id):
+                replies = await asyncio.gather(*[
+                    gateway.call('core_scheduler', 'user_request', {
+                        'id': f'{round_id}-{user}', 'type': 'generate_content', 'topic': f'{round_id} {user}',
+                        'format': 'summary', 'user_id': user
+                    }, timeout=5)
+                    for user in users
+                ])
+                self.assertTrue(all(reply['type'] == 'content_gen_result' for reply in replies))
+
+            try:
+                await asyncio.sleep(0.1)
+                self.assertEqual(replicas['a'].shards.ring.members, ['a', 'b'])
+                await send('r1')
+                # 每个用户的请求只由哈希环上负责它的副本处理
+                for user in users:
+                    self.assertEqual(handled_by(f'r1-{user}'), [replicas['a'].shards.owner(user)])
+                self.assertEqual({shard for user in users for shard in handled_by(f'r1-{user}')}, {'a', 'b'})
+                # 各副本的状态存储不共享，查询转交给记录该请求的副本
+                for user in users:
+                    reply = await gateway.call('core_scheduler', 'task_query', {'request_id': f'r1-{user}', 'user_id': user},
+                                               timeout=5)
+                    self.assertEqual(reply['data']['task']['status'], 'done')
+                # 每个日历只由一个副本预生成
+                paths = [f'/calendars/{n}.csv' for n in range(8)]
+                owners = [[shard for shard, replica in replicas.items() if replica.owns_calendar(path)] for path in paths]
+                self.assertTrue(all(len(owner) == 1 for owner in owners))
+
+                # 副本离开后其区间由剩余副本接管
+                await replicas['b'].close()
+                await asyncio.sleep(0.05)
+                self.assertEqual(replicas['a'].shards.ring.members, ['a'])
+                await send('r2')
+                self.assertTrue(all(replicas['a'].task_store.get(f'r2-{user}') for user in users))
+            finally:
+                for agent in (gateway, content, replicas['a']):
+                    await agent.close()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
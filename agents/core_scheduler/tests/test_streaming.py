@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import aio_pika
+
+from a2a import AgentRuntime
+from a2a.runtime import STATUS_TO_FIELD
+from a2a.transport import InMemoryBus, InMemoryTransport
+from main import CoreSchedulerAgent
+
+
+class StreamingWorker(AgentRuntime):
+    """先发送两段增量内容再回复完整结果的内容生成Agent"""
+
+    async def handle_message(self, message):
+        data = message['data']
+        target = data.get(STATUS_TO_FIELD) or message['source']
+        if data.get('stream'):
+            for seq, delta in enumerate(('第一段', '第二段')):
+                if message.get('reply_info'):
+                    # 与内容生成Agent相同：RPC请求的增量内容作为中间回复发给调用方
+                    await self.publish_reply(message['reply_info'], 'content_partial', {
+                        'request_id': data['request_id'], 'seq': seq, 'delta': delta
+                    }, partial=True)
+                else:
+                    await self.publish(target, 'content_gen_partial', {
+                        'request_id': data['request_id'], 'user_id': data['user_id'], 'seq': seq, 'delta': delta
+                    })
+        await self.reply(message, 'content_gen_result', {'request_id': data['request_id'], 'user_id': data['user_id'],
+                                                         'content': '第一段第二段'})
+
+
+class Recorder(AgentRuntime):
+    def __init__(self, agent_id, transport):
+        super().__init__(agent_id, transport)
+        self.received = []
+
+    async def handle_message(self, message):
+        self.received.append((message['type'], message['data']))
+
+
+class RPCOnlyGateway:
+    """与API网关相同：只监听匿名回复队列，不声明Agent队列"""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.received = []
+
+    async def start(self):
+        await self.transport.connect(10)
+        self.reply_queue = await self.transport.declare_queue(exclusive=True)
+        await self.transport.consume(self.reply_queue, self.on_message, no_ack=True)
+
+    async def on_message(self, incoming):
+        self.received.append((incoming.correlation_id, json.loads(incoming.body)))
+
+    async def request(self, request_id, data):
+        message = {'source': 'api_gateway', 'target': 'core_scheduler', 'type': 'user_request',
+                   'data': {'id': request_id, **data}}
+        await self.transport.publish(
+            aio_pika.Message(body=json.dumps(message).encode('utf-8'), content_type='application/json',
+                             reply_to=self.reply_queue, correlation_id=request_id),
+            routing_key='agent.core_scheduler'
+        )
+
+
+class TestPartialRelay(unittest.TestCase):
+    def test_partials_reach_user_before_result(self):
+        bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'none'}):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        worker = StreamingWorker('content_gen_agent', InMemoryTransport(bus))
+        gateway = Recorder('api_gateway', InMemoryTransport(bus))
+
+        async def run():
+            for agent in (scheduler, worker, gateway):
+                await agent.startup()
+            try:
+                # 通过队列发送的请求：增量内容和结果都发给请求来源
+                await gateway.publish('core_scheduler', 'user_request', {
+                    'id': 'r1', 'type': 'generate_content', 'topic': 'AI', 'format': 'article', 'stream': True
+                })
+                # RPC调用：增量内容作为中间回复交给on_partial，调用在收到最终结果后返回
+                partials = []
+
+                async def on_partial(message):
+                    partials.append(message)
+
+                reply = await gateway.call('core_scheduler', 'user_request', {
+                    'id': 'r2', 'type': 'generate_content', 'topic': 'AI写作', 'format': 'article', 'stream': True
+                }, timeout=5, on_partial=on_partial)
+                self.assertEqual(reply['type'], 'content_gen_result')
+                self.assertEqual(reply['data']['content'], '第一段第二段')
+                self.assertEqual([(message['type'], message['data']['delta']) for message in partials],
+                                 [('content_partial', '第一段'), ('content_partial', '第二段')])
+                await asyncio.sleep(0.1)
+            finally:
+                for agent in (gateway, worker, scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+        messages = [(kind, data) for kind, data in gateway.received if data['request_id'] == 'r1']
+        self.assertEqual([kind for kind, _ in messages], ['content_partial', 'content_partial', 'content_result'])
+        self.assertEqual([data['seq'] for _, data in messages[:2]], [0, 1])
+        self.assertEqual(''.join(data['delta'] for _, data in messages[:2]), messages[2][1]['content'])
+        self.assertEqual([data for kind, data in gateway.received if data['request_id'] == 'r2'], [])
+        self.assertEqual(scheduler.task_store.get('r2')['status'], 'done')
+
+    def test_partials_reach_rpc_only_caller(self):
+        bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'none'}):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        worker = StreamingWorker('content_gen_agent', InMemoryTransport(bus))
+        gateway = RPCOnlyGateway(InMemoryTransport(bus))
+
+        async def run():
+            for agent in (scheduler, worker):
+                await agent.startup()
+            await gateway.start()
+            try:
+                await gateway.request('r3', {'type': 'generate_content', 'topic': 'AI', 'format': 'article', 'stream': True})
+                for _ in range(50):
+                    if any(message['type'] != 'content_partial' for _, message in gateway.received):
+                        break
+                    await asyncio.sleep(0.02)
+            finally:
+                await gateway.transport.close()
+                for agent in (worker, scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+        # 增量内容和最终结果都发到网关的回复队列，带请求的correlation_id
+        self.assertEqual([correlation_id for correlation_id, _ in gateway.received], ['r3'] * 3)
+        self.assertEqual([message['type'] for _, message in gateway.received],
+                         ['content_partial', 'content_partial', 'content_gen_result'])
+        self.assertEqual(''.join(message['data']['delta'] for _, message in gateway.received[:2]),
+                         gateway.received[2][1]['data']['content'])
+        self.assertEqual(scheduler.task_store.get('r3')['status'], 'done')
+
+
+if __name__ == '__main__':
+    unittest.main()
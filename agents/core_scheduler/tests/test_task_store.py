@@ -0,0 +1,157 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import uuid
+from unittest.mock import patch
+
+import aio_pika
+
+from a2a.transport import InMemoryBus, InMemoryTransport
+from main import CoreSchedulerAgent
+from task_store import DISPATCHED, DONE, ERROR, QUEUED, SQLiteBackend, TaskStore, create_backend
+from test_workflow import StubWorker
+
+
+class TestTaskStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tasks.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_transitions_are_written_in_batches(self):
+        store = TaskStore(SQLiteBackend(self.path), flush_interval=60)
+        store.transition('r1', QUEUED, user_id='u1', task_type='generate_content')
+        store.transition('r1', DISPATCHED)
+        store.transition('r2', QUEUED, user_id='u1', task_type='analyze_data')
+        store.transition('r2', ERROR, error='数据集为空')
+
+        # 写入数据库前即可从内存索引查询
+        self.assertEqual(store.get('r1')['status'], DISPATCHED)
+        self.assertIsNone(store.backend.get('r1'))
+        # 同一请求的多次变更合并为一条待写入记录
+        self.assertEqual(len(store.pending), 2)
+
+        store.flush()
+        stored = store.backend.get('r2')
+        self.assertEqual(stored['status'], ERROR)
+        self.assertEqual(stored['error'], '数据集为空')
+        self.assertLessEqual(stored['created_at'], stored['finished_at'])
+        self.assertEqual([task['request_id'] for task in store.list_by_user('u1')], ['r2', 'r1'])
+        store.close()
+
+    def test_evicted_tasks_fall_back_to_backend(self):
+        store = TaskStore(SQLiteBackend(self.path), flush_interval=60, cache_size=2)
+        for n in range(3):
+            store.transition(f'r{n}', QUEUED, user_id='u1', task_type='generate_content')
+        store.flush()
+        self.assertNotIn('r0', store.tasks)
+        self.assertEqual(store.get('r0')['status'], QUEUED)
+
+        # 淘汰后的状态变更不覆盖已写入的用户和创建时间
+        store.transition('r0', DONE)
+        store.flush()
+        stored = store.get('r0')
+        self.assertEqual((stored['status'], stored['user_id'], stored['type']), (DONE, 'u1', 'generate_content'))
+        self.assertIsNotNone(stored['created_at'])
+        self.assertEqual(len(store.list_by_user('u1')), 3)
+        store.close()
+
+    def test_close_flushes_pending_records(self):
+        store = TaskStore(SQLiteBackend(self.path), flush_interval=60)
+        store.transition('r1', QUEUED, user_id='u1')
+        store.close()
+
+        reopened = TaskStore(SQLiteBackend(self.path), flush_interval=60)
+        self.assertEqual(reopened.get('r1')['status'], QUEUED)
+        reopened.close()
+
+    def test_create_backend(self):
+        self.assertIsNone(create_backend('none'))
+        self.assertIsInstance(create_backend('sqlite:///:memory:'), SQLiteBackend)
+        with self.assertRaises(ValueError):
+            create_backend('postgres://localhost/tasks')
+
+    def test_failed_flush_is_logged_and_retried(self):
+        store = TaskStore(SQLiteBackend(self.path), flush_interval=0.02)
+        write = store.backend.write
+        failures = []
+
+        def flaky_write(batch):
+            if not failures:
+                failures.append(len(batch))
+                raise OSError('磁盘已满')
+            write(batch)
+
+        before = store.flush_failures._value.get()
+        with patch.object(store.backend, 'write', side_effect=flaky_write), \
+                self.assertLogs('a2a.core_scheduler', level='WARNING') as logs:
+            store.transition('r1', QUEUED, user_id='u1', task_type='generate_content')
+            for _ in range(100):
+                if failures and not store.pending:
+                    break
+                time.sleep(0.02)
+        store.close()
+        self.assertEqual(store.flush_failures._value.get(), before + 1)
+        self.assertIn('磁盘已满', logs.output[0])
+        # 失败的记录在下次写入时保存
+        reopened = TaskStore(SQLiteBackend(self.path), flush_interval=60)
+        self.assertEqual(reopened.get('r1')['status'], QUEUED)
+        reopened.close()
+
+    def test_write_throughput(self):
+        store = TaskStore(SQLiteBackend(self.path), flush_interval=0.05)
+        start = time.time()
+        for n in range(5000):
+            request_id = uuid.uuid4().hex
+            store.transition(request_id, QUEUED, user_id=f'u{n % 50}', task_type='generate_content')
+            store.transition(request_id, DISPATCHED)
+        elapsed = time.time() - start
+        store.close()
+        # 状态变更只修改内存，写入由后台线程批量完成
+        self.assertLess(elapsed, 1.0)
+
+
+class TestSchedulerTaskTracking(unittest.TestCase):
+    def test_direct_replies_report_completion(self):
+        bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'sqlite:///:memory:'}):
+            scheduler = CoreSchedulerAgent(InMemoryTransport(bus))
+        content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(bus), delay=0)
+
+        async def run():
+            await scheduler.startup()
+            await content.startup()
+            gateway = StubWorker('api_gateway', 'content_gen_result', InMemoryTransport(bus))
+            await gateway.startup()
+            try:
+                reply = await gateway.call('core_scheduler', 'user_request', {
+                    'id': 'req-1', 'type': 'generate_content', 'topic': 'AI', 'format': 'summary'
+                }, timeout=5)
+                self.assertEqual(reply['type'], 'content_gen_result')
+
+                # 处理方直接回复网关，完成通知随后到达调度器
+                for _ in range(50):
+                    status = await gateway.call('core_scheduler', 'task_query', {'request_id': 'req-1'}, timeout=5)
+                    if status['data']['task']['status'] == DONE:
+                        break
+                    await asyncio.sleep(0.02)
+                task = status['data']['task']
+                self.assertEqual((task['status'], task['user_id'], task['type']), (DONE, 'api_gateway', 'generate_content'))
+                self.assertIsNotNone(task['dispatched_at'])
+
+                listing = await gateway.call('core_scheduler', 'task_query', {'user_id': 'api_gateway'}, timeout=5)
+                self.assertEqual([t['request_id'] for t in listing['data']['tasks']], ['req-1'])
+            finally:
+                for agent in (gateway, content, scheduler):
+                    await agent.close()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import aio_pika
+
+from a2a import AgentRuntime
+from a2a.transport import InMemoryBus, InMemoryTransport
+from main import CoreSchedulerAgent
+from workflow import Workflow, WorkflowError, import_n8n, render
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..')
+
+
+class StubWorker(AgentRuntime):
+    """延迟一段时间后回复请求的工作Agent"""
+
+    def __init__(self, agent_id, result_type, transport, delay=0.1):
+        super().__init__(agent_id, transport)
+        self.result_type = result_type
+        self.delay = delay
+        self.requests = []
+        self.deadlines = []
+
+    async def handle_message(self, message):
+        self.requests.append(message['data'])
+        self.deadlines.append(message.get('deadline'))
+        await asyncio.sleep(self.delay)
+        data = message['data']
+        # 与真实的工作Agent一样在结果中带回user_id
+        reply = {'request_id': data['request_id'], 'user_id': data.get('user_id')}
+        if data.get('fail') or data.get('requirements', {}).get('fail'):
+            await self.reply(message, 'error', dict(reply, error='生成失败'))
+        elif self.result_type == 'data_analysis_result':
+            await self.reply(message, self.result_type, dict(reply, result={'trend': 'up'}))
+        else:
+            await self.reply(message, self.result_type, dict(reply, content=f"{data['format']}:{data['topic']}"))
+
+
+class TestWorkflowDefinition(unittest.TestCase):
+    def test_import_n8n_example(self):
+        with open(os.path.join(REPO_ROOT, 'content_workflow_example.json'), encoding='utf-8') as f:
+            data = json.load(f)
+
+        # 每日和每周两个流程各有触发器，必须指定执行哪一个
+        with self.assertRaisesRegex(WorkflowError, '多个触发器'):
+            import_n8n(data)
+        # 示例中的 .map() 等JavaScript表达式无法转换，不会原样发给工具
+        with self.assertRaisesRegex(WorkflowError, 'tags.map'):
+            import_n8n(data, '每日灵感收集触发器')
+        with self.assertRaisesRegex(WorkflowError, '没有连接'):
+            import_n8n(data, '开始')
+
+    def test_import_n8n_runs_only_the_selected_trigger(self):
+        def node(name, node_type, parameters=None):
+            return {'name': name, 'type': f'n8n-nodes-base.{node_type}', 'parameters': parameters or {}}
+
+        def link(target):
+            return {'main': [[{'node': target, 'type': 'main', 'index': 0}]]}
+
+        data = {
+            'name': '两个流程',
+            'nodes': [
+                node('每日', 'cron', {'scheduleExpression': '0 9 * * *'}),
+                node('获取', 'httpRequest', {'headers': {'Authorization': 'Bearer {{$secrets.key}}'}}),
+                node('保存', 'notion', {'标题': "={{$node['获取'].json.items[0]['title']}}"}),
+                node('每周', 'cron', {'scheduleExpression': '0 20 * * 0'}),
+                node('评估', 'openAi', {'prompt': '评估选题'}),
+                node('通知', 'discord', {'content': "结果：{{$node['评估'].json.choices[0].message.content}}"}),
+            ],
+            'connections': {'每日': link('获取'), '获取': link('保存'), '每周': link('评估'), '评估': link('通知')}
+        }
+
+        daily = import_n8n(data, '每日')
+        weekly = import_n8n(data, '每周')
+
+        self.assertEqual(list(daily.nodes), ['获取', '保存'])
+        self.assertEqual(daily.triggers, [{'name': '每日', 'type': 'cron', 'scheduleExpression': '0 9 * * *'}])
+        self.assertEqual(daily.nodes['保存']['depends_on'], ['获取'])
+        self.assertEqual(daily.nodes['保存']['params']['标题'], '{{获取.items.0.title}}')
+        # 不引用节点数据的表达式原样保留
+        self.assertIn('$secrets.key', daily.nodes['获取']['params']['headers']['Authorization'])
+        self.assertEqual(list(weekly.nodes), ['评估', '通知'])
+        self.assertEqual(weekly.nodes['评估']['type'], 'content_gen_request')
+        self.assertEqual(weekly.nodes['通知']['params']['content'], '结果：{{评估.choices.0.message.content}}')
+        self.assertEqual(render(weekly.nodes['通知']['params']['content'],
+                                {'评估': {'choices': [{'message': {'content': '选题A'}}]}}), '结果：选题A')
+
+    def test_render(self):
+        outputs = {'input': {'topic': 'AI'}, 'analysis': {'trend': 'up', 'values': [1, 2]}}
+        self.assertEqual(render('{{analysis.values}}', outputs), [1, 2])
+        self.assertEqual(render({'t': '{{input.topic}}趋势{{analysis.trend}}'}, outputs), {'t': 'AI趋势up'})
+        self.assertEqual(render('{{$secrets.key}}', outputs), '{{$secrets.key}}')
+        with self.assertRaises(WorkflowError):
+            render('{{analysis.missing}}', outputs)
+
+    def test_invalid_definitions(self):
+        with self.assertRaises(WorkflowError):
+            Workflow('cycle', [{'id': 'a', 'type': 'tool', 'tool': 'x', 'depends_on': ['b']},
+                               {'id': 'b', 'type': 'tool', 'tool': 'x', 'depends_on': ['a']}])
+        with self.assertRaises(WorkflowError):
+            Workflow('missing', [{'id': 'a', 'type': 'tool', 'tool': 'x', 'depends_on': ['nope']}])
+        with self.assertRaises(WorkflowError):
+            Workflow('type', [{'id': 'a', 'type': 'n8n-nodes-base.function'}])
+
+    def test_references_must_be_upstream(self):
+        def tool(node_id, params, depends_on=()):
+            return {'id': node_id, 'type': 'tool', 'tool': 'x', 'params': params, 'depends_on': list(depends_on)}
+
+        with self.assertRaisesRegex(WorkflowError, '不存在的节点 x'):
+            Workflow('unknown', [tool('a', {'text': '{{x.y}}'})])
+        # b 与 a 并行执行，引用 a 的结果取决于完成的先后
+        with self.assertRaisesRegex(WorkflowError, '不是它的上游节点'):
+            Workflow('sibling', [tool('a', {}), tool('b', {'text': ['前缀{{a.y}}']})])
+        # input、间接上游和n8n表达式都可以引用
+        workflow = Workflow('chain', [tool('a', {}), tool('b', {}, ['a']),
+                                      tool('c', {'text': '{{a.y}}{{input.topic}}{{$secrets.key}}'}, ['b'])])
+        self.assertEqual(workflow.order, ['a', 'b', 'c'])
+
+
+class TestWorkflowExecution(unittest.TestCase):
+    def setUp(self):
+        self.bus = InMemoryBus()
+        with patch('main.start_http_server'), patch.dict(os.environ, {'TASK_STORE_URL': 'sqlite:///:memory:'}):
+            self.scheduler = CoreSchedulerAgent(InMemoryTransport(self.bus))
+        self.analysis = StubWorker('data_analysis_agent', 'data_analysis_result', InMemoryTransport(self.bus))
+        self.content = StubWorker('content_gen_agent', 'content_gen_result', InMemoryTransport(self.bus))
+
+    def run_request(self, request):
+        async def run():
+            for agent in (self.scheduler, self.analysis, self.content):
+                await agent.startup()
+            results = asyncio.Queue()
+            gateway = InMemoryTransport(self.bus)
+
+            async def on_result(incoming):
+                await incoming.ack()
+                results.put_nowait(json.loads(incoming.body))
+
+            queue = await gateway.declare_queue('gateway')
+            await gateway.bind(queue, 'agent.api_gateway')
+            await gateway.consume(queue, on_result)
+            message = {'source': 'api_gateway', 'target': 'core_scheduler', 'type': 'user_request',
+                       'data': request, 'timestamp': time.time()}
+            await gateway.publish(aio_pika.Message(body=json.dumps(message).encode('utf-8')), 'agent.core_scheduler')
+            try:
+                return await asyncio.wait_for(results.get(), 5)
+            finally:
+                for agent in (self.scheduler, self.analysis, self.content):
+                    await agent.close()
+        return asyncio.run(run())
+
+    def test_branches_run_in_parallel(self):
+        start = time.time()
+        result = self.run_request({
+            'id': 'wf-1',
+            'type': 'content_workflow',
+            'workflow_id': 'content_pipeline',
+            'data': {'topic': 'AI产品经理', 'dataset': [{'date': '2023-01-01', 'views': 1}]}
+        })
+        elapsed = time.time() - start
+
+        self.assertEqual(result['type'], 'workflow_result')
+        outputs = result['data']['outputs']
+        self.assertEqual(outputs['analysis'], {'trend': 'up'})
+        self.assertEqual(outputs['article'], 'article:AI产品经理')
+        self.assertEqual(outputs['social'], 'social_media:AI产品经理')
+        # 分析结果传给下游节点
+        article_request = next(r for r in self.content.requests if r['format'] == 'article')
+        self.assertEqual(article_request['requirements']['数据趋势'], 'up')
+        self.assertEqual(article_request['request_id'], 'wf-1:article')
+        # 三个内容节点并发执行：关键路径为两个0.1秒的节点
+        self.assertLess(elapsed, 0.35)
+
+    def test_failed_node_reports_error(self):
+        result = self.run_request({
+            'id': 'wf-2',
+            'type': 'content_workflow',
+            'workflow': {'nodes': [
+                {'id': 'ok', 'type': 'content_gen_request', 'params': {'topic': 'a', 'format': 'summary'}},
+                {'id': 'bad', 'type': 'content_gen_request', 'params': {'topic': 'b', 'format': 'summary', 'fail': True}}
+            ]}
+        })
+
+        self.assertEqual(result['type'], 'error')
+        self.assertIn('bad', result['data']['error'])
+        self.assertIn('生成失败', result['data']['error'])
+
+    def test_unknown_workflow(self):
+        result = self.run_request({'id': 'wf-3', 'type': 'content_workflow', 'workflow_id': 'no_such_workflow'})
+
+        self.assertEqual(result['type'], 'error')
+        self.assertIn('加载工作流失败', result['data']['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,357 @@
+"""核心调度Agent内置的DAG工作流引擎
+
+工作流定义：
+    {
+        "name": "内容流水线",
+        "nodes": [
+            {"id": "analysis", "type": "data_analysis_request",
+             "params": {"dataset": "{{input.dataset}}", "analysis_type": "trend_analysis"}},
+            {"id": "article", "type": "content_gen_request", "depends_on": ["analysis"],
+             "params": {"topic": "{{input.topic}}", "format": "article",
+                        "requirements": {"趋势": "{{analysis.trend}}"}}},
+            {"id": "notify", "type": "tool", "tool": "discord", "depends_on": ["article"],
+             "params": {"content": "新文章：{{article}}"}}
+        ]
+    }
+
+节点类型为 data_analysis_request、content_gen_request（经A2A调用对应Agent）或 tool（MCP工具调用）。
+参数中的 {{节点ID.字段}} 引用上游节点（depends_on 中直接或间接依赖的节点）的输出，
+{{input.字段}} 引用请求中的data，加载时拒绝其他引用；整个字符串只有一个引用时保留原始类型。依赖全部完成的节点立即并发执行，
+因此工作流的耗时取决于关键路径而不是节点总数。
+"""
+import asyncio
+import json
+import re
+import time
+
+from a2a import metrics
+from a2a.deadline import remaining_time
+
+NODE_TYPES = ('data_analysis_request', 'content_gen_request', 'tool')
+# A2A节点：目标Agent（调度器agents中的键）、结果消息类型、结果字段
+AGENT_NODES = {
+    'data_analysis_request': ('data_analysis', 'data_analysis_result', 'result'),
+    'content_gen_request': ('content_generation', 'content_gen_result', 'content'),
+}
+INPUT_NODE = 'input'
+TEMPLATE = re.compile(r'\{\{\s*([^.{}\s]+(?:\s+[^.{}\s]+)*)((?:\.[^.{}\s]+)*)\s*\}\}')
+
+
+class WorkflowError(Exception):
+    """工作流定义无效或执行失败"""
+
+
+class Workflow:
+    """经过校验的工作流：节点按拓扑顺序保存"""
+
+    def __init__(self, name, nodes, triggers=None):
+        self.name = name
+        self.nodes = {}
+        for node in nodes:
+            node_id = node.get('id')
+            if not node_id or node_id == INPUT_NODE or node_id in self.nodes:
+                raise WorkflowError(f'节点ID无效或重复: {node_id}')
+            if node.get('type') not in NODE_TYPES:
+                raise WorkflowError(f'节点 {node_id} 的类型不受支持: {node.get("type")}')
+            if node['type'] == 'tool' and not node.get('tool'):
+                raise WorkflowError(f'工具节点 {node_id} 缺少tool')
+            self.nodes[node_id] = dict(node, depends_on=list(node.get('depends_on', [])), params=node.get('params', {}))
+        for node in self.nodes.values():
+            for dependency in node['depends_on']:
+                if dependency not in self.nodes:
+                    raise WorkflowError(f'节点 {node["id"]} 依赖不存在的节点 {dependency}')
+        self.order = self.topological_order()
+        self.check_references()
+        self.triggers = triggers or []
+
+    @classmethod
+    def from_dict(cls, definition, trigger=None):
+        """从字典创建工作流，n8n导出的JSON（含connections）先经 import_n8n 转换，trigger选择其中的触发器"""
+        if 'connections' in definition:
+            return import_n8n(definition, trigger)
+        return cls(definition.get('name', ''), definition.get('nodes', []), definition.get('triggers'))
+
+    def topological_order(self):
+        remaining = {node_id: len(node['depends_on']) for node_id, node in self.nodes.items()}
+        order = [node_id for node_id, count in remaining.items() if count == 0]
+        for node_id in order:
+            for child in self.children(node_id):
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    order.append(child)
+        if len(order) != len(self.nodes):
+            raise WorkflowError('工作流中存在循环依赖')
+        return order
+
+    def check_references(self):
+        """参数中的 {{节点.字段}} 只能引用 input 或（间接）依赖的上游节点，否则结果取决于节点完成的先后"""
+        ancestors = {}
+        for node_id in self.order:
+            node = self.nodes[node_id]
+            ancestors[node_id] = set(node['depends_on']).union(*(ancestors[dependency] for dependency in node['depends_on']))
+            for reference in template_references(node['params']):
+                if reference == INPUT_NODE or reference in ancestors[node_id] or reference.startswith('$'):
+                    # $开头的是保留的n8n表达式（如 {{$secrets.key}}），不是节点引用
+                    continue
+                if reference in self.nodes:
+                    raise WorkflowError(f'节点 {node_id} 引用的节点 {reference} 不是它的上游节点，请加入depends_on')
+                raise WorkflowError(f'节点 {node_id} 引用了不存在的节点 {reference}')
+
+    def children(self, node_id):
+        return [child for child, node in self.nodes.items() if node_id in node['depends_on']]
+
+    def to_dict(self):
+        return {'name': self.name, 'nodes': list(self.nodes.values()), 'triggers': self.triggers}
+
+
+def load_workflow(path, trigger=None):
+    """读取工作流文件（原生格式或n8n导出格式）"""
+    with open(path, encoding='utf-8') as f:
+        return Workflow.from_dict(json.load(f), trigger)
+
+
+def lookup(value, path):
+    for key in path:
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            raise WorkflowError(f'引用的字段不存在: {key}')
+    return value
+
+
+def template_references(value):
+    """参数中 {{节点.字段}} 引用的节点ID"""
+    if isinstance(value, dict):
+        return {reference for item in value.values() for reference in template_references(item)}
+    if isinstance(value, list):
+        return {reference for item in value for reference in template_references(item)}
+    if not isinstance(value, str):
+        return set()
+    return {match.group(1) for match in TEMPLATE.finditer(value)}
+
+
+def render(value, outputs):
+    """把参数中的 {{节点.字段}} 替换为上游输出；节点引用已在加载时校验，$开头的n8n表达式原样保留"""
+    if isinstance(value, dict):
+        return {key: render(item, outputs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, outputs) for item in value]
+    if not isinstance(value, str) or '{{' not in value:
+        return value
+
+    def resolve(match):
+        return lookup(outputs[match.group(1)], [key for key in match.group(2).split('.') if key])
+
+    whole = TEMPLATE.fullmatch(value.strip())
+    if whole and whole.group(1) in outputs:
+        return resolve(whole)
+
+    def substitute(match):
+        if match.group(1) not in outputs:
+            return match.group(0)
+        resolved = resolve(match)
+        return resolved if isinstance(resolved, str) else json.dumps(resolved, ensure_ascii=False)
+    return TEMPLATE.sub(substitute, value)
+
+
+class WorkflowEngine:
+    """在核心调度Agent的事件循环中执行工作流"""
+
+    def __init__(self, scheduler, node_timeout=300):
+        self.scheduler = scheduler
+        self.node_timeout = node_timeout
+        self.workflow_runs = metrics.counter('workflow_runs_total', 'Workflow runs by status', ['status'])
+        self.workflow_latency = metrics.histogram('workflow_latency_seconds', 'End-to-end workflow duration',
+                                                  buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+        self.node_latency = metrics.histogram('workflow_node_latency_seconds', 'Workflow node duration by type', ['node_type'],
+                                              buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+    async def run(self, workflow, request_id, user_id, inputs=None):
+        """执行工作流，返回 {节点ID: 输出}；任一节点失败时取消其余节点并抛出 WorkflowError"""
+        start_time = time.time()
+        outputs = {INPUT_NODE: inputs or {}}
+        waiting = {node_id: set(node['depends_on']) for node_id, node in workflow.nodes.items()}
+        running = {}
+
+        def launch_ready():
+            for node_id in [node_id for node_id, deps in waiting.items() if not deps]:
+                del waiting[node_id]
+                running[asyncio.ensure_future(self.run_node(workflow.nodes[node_id], outputs, request_id, user_id))] = node_id
+
+        status = 'error'
+        try:
+            launch_ready()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = running.pop(task)
+                    outputs[node_id] = task.result()
+                    for deps in waiting.values():
+                        deps.discard(node_id)
+                launch_ready()
+            status = 'success'
+        finally:
+            # 失败或被取消时停止仍在执行的节点
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            self.workflow_runs.labels(status=status).inc()
+        self.workflow_latency.observe(time.time() - start_time)
+        del outputs[INPUT_NODE]
+        return outputs
+
+    async def run_node(self, node, outputs, request_id, user_id):
+        start_time = time.time()
+        try:
+            params = render(node['params'], outputs)
+            result = await self.execute(node, params, f"{request_id}:{node['id']}", user_id)
+        except asyncio.TimeoutError as e:
+            raise WorkflowError(f"节点 {node['id']} 超时") from e
+        except Exception as e:
+            raise WorkflowError(f"节点 {node['id']} 失败: {e}") from e
+        self.node_latency.labels(node_type=node['type']).observe(time.time() - start_time)
+        return result
+
+    async def execute(self, node, params, request_id, user_id):
+        """执行单个节点"""
+        # 节点超时不超过工作流的截止时间
+        timeout = remaining_time(node.get('timeout', self.node_timeout))
+        if node['type'] == 'tool':
+            call = self.scheduler.loop.run_in_executor(self.scheduler.executor, self.scheduler.call_external_tool, node['tool'],
+                                                       params, timeout)
+            return await asyncio.wait_for(call, timeout)
+        agent, result_type, result_field = AGENT_NODES[node['type']]
+        target = self.scheduler.agents[agent]
+        key = f"{request_id}:{node['id']}"
+        try:
+            reply = await self.scheduler.call(
+                target,
+                node['type'],
+                dict(params, request_id=request_id, user_id=user_id),
+                timeout=timeout,
+                instance=self.scheduler.balancer.pick(target, key)
+            )
+        finally:
+            self.scheduler.balancer.done(key)
+        if reply['type'] != result_type:
+            raise WorkflowError(reply['data'].get('error', f"意外的回复类型: {reply['type']}"))
+        return self.scheduler.resolve(reply['data'][result_field])
+
+
+# n8n节点类型到工作流节点的映射，未列出的类型作为同名MCP工具调用
+N8N_TRIGGERS = ('n8n-nodes-base.start', 'n8n-nodes-base.cron', 'n8n-nodes-base.manualTrigger',
+                'n8n-nodes-base.scheduleTrigger', 'n8n-nodes-base.webhook')
+# $node['名称'].json 之后的 .字段、[序号]、['字段'] 访问链
+N8N_REFERENCE = re.compile(r"""\$node\[\s*['"]([^'"]+)['"]\s*\]\.json((?:\.\w+|\[\d+\]|\[\s*['"][^'"]+['"]\s*\])*)""")
+N8N_ACCESS = re.compile(r"""\.(\w+)|\[(\d+)\]|\[\s*['"]([^'"]+)['"]\s*\]""")
+# 引用上游节点数据的n8n表达式，无法转换时不能原样发给工具
+N8N_DATA = re.compile(r'\$(node|json|input|items)\b')
+
+
+def convert_reference(reference):
+    """$node['名称'].json.a[0]['b'] -> {{名称.a.0.b}}，字段名无法用模板表示时返回None"""
+    keys = [field or index or key for field, index, key in N8N_ACCESS.findall(reference.group(2))]
+    if any(re.search(r'[.{}\s]', key) for key in keys):
+        return None
+    return '{{' + '.'.join([reference.group(1)] + keys) + '}}'
+
+
+def convert_expression(value, node_name=''):
+    """把n8n表达式中的 $node['名称'].json.字段 改写为 {{名称.字段}}
+
+    不引用节点数据的表达式（如 $secrets）原样保留；引用了节点数据但无法转换的表达式
+    （如 .map()）抛出 WorkflowError，避免把原始表达式发给工具。
+    """
+    if isinstance(value, dict):
+        return {key: convert_expression(item, node_name) for key, item in value.items()}
+    if isinstance(value, list):
+        return [convert_expression(item, node_name) for item in value]
+    if not isinstance(value, str):
+        return value
+    if value.startswith('={{'):
+        value = value[1:]
+
+    def rewrite(match):
+        expression = match.group(1).strip()
+        reference = N8N_REFERENCE.fullmatch(expression)
+        converted = convert_reference(reference) if reference else None
+        if converted is not None:
+            return converted
+        if N8N_DATA.search(expression):
+            raise WorkflowError(f'节点 {node_name} 的n8n表达式无法转换: {expression}')
+        return match.group(0)
+    return re.sub(r'\{\{(.*?)\}\}', rewrite, value, flags=re.S)
+
+
+def n8n_reachable(connections, start):
+    """从start出发经connections可到达的节点名"""
+    reached = set()
+    pending = [start]
+    while pending:
+        for branch in connections.get(pending.pop(), {}).get('main', []):
+            for target in branch:
+                if target['node'] not in reached:
+                    reached.add(target['node'])
+                    pending.append(target['node'])
+    return reached
+
+
+def select_n8n_trigger(triggers, connections, trigger):
+    """返回要执行的触发器名；未指定时只有一个触发器连接了下游节点才能自动选择，都没有时返回None"""
+    names = [item['name'] for item in triggers]
+    if trigger is not None:
+        if trigger not in names:
+            raise WorkflowError(f'工作流中没有触发器 {trigger}，可用的触发器: {", ".join(names)}')
+        return trigger
+    connected = [name for name in names if n8n_reachable(connections, name)]
+    if len(connected) > 1:
+        raise WorkflowError(f'工作流有多个触发器，请用 trigger 指定其中一个: {", ".join(connected)}')
+    return connected[0] if connected else None
+
+
+def import_n8n(data, trigger=None):
+    """导入n8n导出的工作流JSON（我们使用的子集）
+
+    n8n中每个触发器启动各自的流程，因此只导入 trigger 指定的触发器可到达的节点；未指定时
+    要求只有一个触发器连接了下游节点（没有时导入全部节点）。触发器节点不执行，记录在 triggers 中；
+    openAi节点转换为 content_gen_request，其余节点作为同名MCP工具调用（如 httpRequest、notion、discord）。
+    """
+    connections = data.get('connections', {})
+    triggers = [item for item in data.get('nodes', []) if item['type'] in N8N_TRIGGERS]
+    selected = select_n8n_trigger(triggers, connections, trigger)
+    reachable = n8n_reachable(connections, selected) if selected is not None else None
+    if reachable is not None and not reachable:
+        raise WorkflowError(f'触发器 {selected} 没有连接任何节点')
+    nodes = []
+    names = set()
+    for item in data.get('nodes', []):
+        if item['type'] in N8N_TRIGGERS or (reachable is not None and item['name'] not in reachable):
+            continue
+        names.add(item['name'])
+        params = convert_expression(item.get('parameters', {}), item['name'])
+        node_type = item['type'].rsplit('.', 1)[-1]
+        if node_type == 'openAi':
+            nodes.append({
+                'id': item['name'],
+                'type': 'content_gen_request',
+                'params': {'topic': params.get('prompt', ''), 'format': params.get('format', 'article')}
+            })
+        else:
+            nodes.append({'id': item['name'], 'type': 'tool', 'tool': node_type, 'params': params})
+
+    depends_on = {name: [] for name in names}
+    for source, outputs in connections.items():
+        if source not in names:
+            continue
+        for branch in outputs.get('main', []):
+            for target in branch:
+                if target['node'] in depends_on and source not in depends_on[target['node']]:
+                    depends_on[target['node']].append(source)
+    for node in nodes:
+        node['depends_on'] = depends_on[node['id']]
+    return Workflow(data.get('name', ''), nodes, [
+        {'name': item['name'], 'type': item['type'].rsplit('.', 1)[-1], **item.get('parameters', {})}
+        for item in triggers if selected is None or item['name'] == selected
+    ])
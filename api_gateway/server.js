@@ -44,6 +44,7 @@ const io = new Server(server, {
 // RabbitMQ连接配置
 let rabbitmqConnection = null;
 let channel = null;
+let responseQueueName = null;
 const EXCHANGE_NAME = 'a2a_bus';
 const CORE_SCHEDULER_QUEUE = 'core_scheduler';
 
@@ -63,12 +64,26 @@ async function connectRabbitMQ() {
 
     // 声明响应队列
     const responseQueue = await channel.assertQueue('', { exclusive: true });
+    responseQueueName = responseQueue.queue;
 
-    // 监听响应队列
+    // 监听响应队列（Agent通过reply_to直接回复，correlationId即请求ID）
     channel.consume(responseQueue.queue, (msg) => {
       if (msg) {
         const content = JSON.parse(msg.content.toString());
-        const requestId = content.request_id;
+        const requestId = msg.properties.correlationId || content.request_id;
+
+        if (content.type === 'content_partial') {
+          // 流式生成的增量内容：转发给客户端，任务保持处理中，等待最终结果
+          if (content.data && content.data.seq === 0) {
+            pool.execute('UPDATE tasks SET status = ? WHERE id = ?', ['processing', requestId])
+              .catch((error) => logger.error('更新任务状态失败', { error, taskId: requestId }));
+          }
+          if (requestMap.has(requestId)) {
+            io.to(requestMap.get(requestId)).emit('task_partial', content);
+          }
+          channel.ack(msg);
+          return;
+        }
 
         // 更新任务状态到数据库
         try {
@@ -142,16 +157,24 @@ app.post('/requests', authenticateJWT, authorizeRoles(ROLES.USER, ROLES.ADMIN),
       data: {
         id: requestId,
         type,
-        ...data
+        ...data,
+        // 调度器按用户和等级做准入控制，放在最后以免被请求体覆盖
+        user_id: userId,
+        tier: req.user.tier || req.user.role
       },
       timestamp: Date.now()
     };
 
-    // 发送消息到核心调度器
+    // 发送消息到核心调度器，结果直接回复到本进程的响应队列
     channel.publish(
       EXCHANGE_NAME,
       `agent.${CORE_SCHEDULER_QUEUE}`,
-      Buffer.from(JSON.stringify(message))
+      Buffer.from(JSON.stringify(message)),
+      {
+        contentType: 'application/json',
+        replyTo: responseQueueName,
+        correlationId: requestId
+      }
     );
 
     res.json({